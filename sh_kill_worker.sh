@@ -2,4 +2,21 @@
 
 ps aux | grep temporal_worker
 
-pkill -f temporal_worker
\ No newline at end of file
+if pgrep -f src.worker_launcher > /dev/null; then
+  # SIGTERM, the launcher stops its worker processes (each drains its running activities) and exits, the workers
+  # killed directly would be started again by the launcher (see src/worker_launcher.py)
+  pkill -f src.worker_launcher
+  process=src.worker_launcher
+else
+  # SIGTERM, the workers stop polling and wait for the running activities (see src/worker_shutdown.py)
+  pkill -f temporal_worker
+  process=temporal_worker
+fi
+
+# wait for the drain (graceful_shutdown_timeout, --drain-timeout of the launcher) and kill the processes still running
+for _ in $(seq 1 65); do
+  pgrep -f $process > /dev/null || break
+  sleep 1
+done
+pkill -9 -f src.worker_launcher
+pkill -9 -f temporal_worker
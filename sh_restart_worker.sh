@@ -1,4 +1,10 @@
 #!/bin/bash
 
-source sh_kill_worker.sh
-source sh_start_worker.sh
+if pgrep -f src.worker_launcher > /dev/null; then
+  # Rolling restart of the worker processes started with sh_start_workers.sh (src.worker_launcher),
+  # one process at a time, each process finishes its running activities before being replaced.
+  pkill -HUP -f src.worker_launcher
+else
+  source sh_kill_worker.sh
+  source sh_start_worker.sh
+fi
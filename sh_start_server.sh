@@ -2,5 +2,6 @@
 
 # https://docs.temporal.io/cli
 # https://github.com/temporalio/cli
-temporal server start-dev
+# PatchCompletedSteps is used to publish the progress of SystemPatchWorkflow_V7 (publishProgress=True)
+temporal server start-dev --search-attribute PatchCompletedSteps=KeywordList
 
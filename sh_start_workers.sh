@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# temporal_worker_v8 processes on ports 8086, 8087... (see src/worker_launcher.py)
+python3 -m src.worker_launcher --processes 2
+
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import time
+
+import temporalio.converter
+
+from src.codec import CompressionCodec
+from src.workflow.types import GetClusterHostsActivityOutput, SystemPatchWorkflowInput
+
+# Measures the bytes saved by CompressionCodec and its CPU cost per payload, e.g.
+#   python3 -m src.bench.codec_benchmark --algorithms zlib zstd
+
+
+def sample_payloads():
+    payload_converter = temporalio.converter.default().payload_converter
+    samples = {}
+    for host_count in [10, 100, 1000, 10000]:
+        samples[f"GetClusterHostsActivityOutput({host_count} hosts)"] = GetClusterHostsActivityOutput(
+            hostnames=[f"cluster1_host{i}" for i in range(host_count)])
+    samples["SystemPatchWorkflowInput(50 clusters, 20 services)"] = SystemPatchWorkflowInput(
+        targetClusters=[f"cluster{i}" for i in range(50)],
+        serviceList=[f"service{i}" for i in range(20)],
+        approverEmails=[f"approver{i}@example.com" for i in range(10)],
+    )
+    return {name: payload_converter.to_payloads([value])[0] for name, value in samples.items()}
+
+
+async def measure(codec: CompressionCodec, payload, iterations: int):
+    started = time.process_time()
+    for _ in range(iterations):
+        encoded = await codec.encode([payload])
+    encode_cpu = (time.process_time() - started) / iterations
+
+    started = time.process_time()
+    for _ in range(iterations):
+        decoded = await codec.decode(encoded)
+    decode_cpu = (time.process_time() - started) / iterations
+
+    assert decoded[0] == payload
+    return encoded[0].ByteSize(), encode_cpu, decode_cpu
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Payload compression codec benchmark")
+    parser.add_argument("--algorithms", nargs="+", default=["zlib"])
+    parser.add_argument("--threshold", type=int, default=1024, help="min payload size to compress (bytes)")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    payloads = sample_payloads()
+    print(f"{'payload':<52} {'codec':<6} {'bytes':>8} {'encoded':>8} {'saved':>7} {'encode':>10} {'decode':>10}")
+    for algorithm in args.algorithms:
+        codec = CompressionCodec(algorithm, args.threshold)
+        for name, payload in payloads.items():
+            size = payload.ByteSize()
+            encoded_size, encode_cpu, decode_cpu = await measure(codec, payload, args.iterations)
+            print(f"{name:<52} {algorithm:<6} {size:>8} {encoded_size:>8} {1 - encoded_size / size:>7.1%} "
+                  f"{encode_cpu * 1e6:>8.1f}us {decode_cpu * 1e6:>8.1f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import temporalio.converter
+from google.protobuf.duration_pb2 import Duration
+from google.protobuf.timestamp_pb2 import Timestamp
+from temporalio.api.common.v1 import Payloads, WorkflowType
+from temporalio.api.enums.v1 import EventType
+from temporalio.api.history.v1 import HistoryEvent, WorkflowExecutionStartedEventAttributes, \
+    WorkflowTaskScheduledEventAttributes, WorkflowTaskStartedEventAttributes
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.client import WorkflowHistory
+from temporalio.worker import Replayer
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner
+
+from src.temporal_worker_v8 import workflows
+from src.workflow.sandbox import workflow_runner
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_Host_V7, SystemPatchWorkflow_HostInput
+
+# Cold start of a workflow: the first workflow task of a SystemPatchWorkflow_Host_V7 that is not in the worker cache,
+# which creates the workflow sandbox and imports the workflow modules in it.
+#
+# Replays a history with only the first workflow task (no server needed), every replay is a new workflow run,
+# with the default sandbox and with the passthrough modules of src/workflow/sandbox.py, e.g.
+#   python3 -m src.bench.cold_start_benchmark --runs 50
+
+
+def first_workflow_task_history() -> WorkflowHistory:
+    now = Timestamp()
+    now.GetCurrentTime()
+    task_queue = TaskQueue(name="cold-start-benchmark")
+    wf_input = temporalio.converter.default().payload_converter.to_payloads(
+        [SystemPatchWorkflow_HostInput(host="cluster1_host1")])
+
+    return WorkflowHistory("cold-start-benchmark", [
+        HistoryEvent(
+            event_id=1,
+            event_time=now,
+            event_type=EventType.EVENT_TYPE_WORKFLOW_EXECUTION_STARTED,
+            workflow_execution_started_event_attributes=WorkflowExecutionStartedEventAttributes(
+                workflow_type=WorkflowType(name=SystemPatchWorkflow_Host_V7.__name__),
+                task_queue=task_queue,
+                input=Payloads(payloads=wf_input),
+                workflow_task_timeout=Duration(seconds=10),
+                original_execution_run_id="cold-start-benchmark-run",
+                first_execution_run_id="cold-start-benchmark-run",
+                attempt=1,
+            ),
+        ),
+        HistoryEvent(
+            event_id=2,
+            event_time=now,
+            event_type=EventType.EVENT_TYPE_WORKFLOW_TASK_SCHEDULED,
+            workflow_task_scheduled_event_attributes=WorkflowTaskScheduledEventAttributes(
+                task_queue=task_queue,
+                start_to_close_timeout=Duration(seconds=10),
+                attempt=1,
+            ),
+        ),
+        HistoryEvent(
+            event_id=3,
+            event_time=now,
+            event_type=EventType.EVENT_TYPE_WORKFLOW_TASK_STARTED,
+            workflow_task_started_event_attributes=WorkflowTaskStartedEventAttributes(scheduled_event_id=2),
+        ),
+    ])
+
+
+async def measure(runner: SandboxedWorkflowRunner, history: WorkflowHistory, runs: int) -> list:
+    replayer = Replayer(workflows=workflows, workflow_runner=runner)
+    # the first replay also imports the passthrough modules outside of the sandbox, not measured
+    await replayer.replay_workflow(history)
+
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await replayer.replay_workflow(history)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(name: str, latencies: list) -> None:
+    print(f"{name:<20} runs={len(latencies)} "
+          f"mean={statistics.mean(latencies) * 1000:.2f}ms "
+          f"median={statistics.median(latencies) * 1000:.2f}ms "
+          f"min={min(latencies) * 1000:.2f}ms max={max(latencies) * 1000:.2f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SystemPatchWorkflow_Host_V7 cold start benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    history = first_workflow_task_history()
+    default_latencies = await measure(SandboxedWorkflowRunner(), history, args.runs)
+    passthrough_latencies = await measure(workflow_runner(), history, args.runs)
+
+    report("default sandbox", default_latencies)
+    report("passthrough modules", passthrough_latencies)
+    print(f"difference (median)  "
+          f"{(statistics.median(default_latencies) - statistics.median(passthrough_latencies)) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+import argparse
+import dataclasses
+import inspect
+import time
+import typing
+
+import temporalio.converter
+
+import src.workflow.types
+from src.converter import MsgPackDataConverter
+
+# Checks that every dataclass in src/workflow/types.py round-trips through the msgpack converter and
+# compares its encode/decode time and payload size with the default JSON converter, e.g.
+#   python3 -m src.bench.converter_benchmark --iterations 2000
+
+
+def sample(cls, list_size: int = 5):
+    # instance of cls with the lists filled, so the payloads are not only default values
+    hints = typing.get_type_hints(cls)
+    values = {}
+    for f in dataclasses.fields(cls):
+        hint = hints[f.name]
+        args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+        if typing.get_origin(hint) is typing.Union:
+            hint = args[0]
+            args = list(typing.get_args(hint))
+        if typing.get_origin(hint) is list and args and dataclasses.is_dataclass(args[0]):
+            values[f.name] = [sample(args[0], list_size) for _ in range(list_size)]
+        elif typing.get_origin(hint) is list and args and args[0] in (int, float):
+            # e.g. waveSizes, waveSuccessThresholds
+            values[f.name] = [args[0](i + 1) for i in range(list_size)]
+        elif typing.get_origin(hint) is list:
+            values[f.name] = [f"{f.name}-{i}" for i in range(list_size)]
+        elif dataclasses.is_dataclass(hint):
+            values[f.name] = sample(hint, list_size)
+    return cls(**values)
+
+
+def types_module_dataclasses():
+    return [cls for _, cls in inspect.getmembers(src.workflow.types, inspect.isclass)
+            if dataclasses.is_dataclass(cls) and cls.__module__ == src.workflow.types.__name__]
+
+
+def measure(payload_converter, value, iterations: int):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        payloads = payload_converter.to_payloads([value])
+    encode = (time.perf_counter() - started) / iterations
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        decoded = payload_converter.from_payloads(payloads, [type(value)])[0]
+    decode = (time.perf_counter() - started) / iterations
+
+    if decoded != value:
+        raise AssertionError(f"{type(value).__name__} doesn't round-trip: {value} != {decoded}")
+    return payloads[0].ByteSize(), encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs msgpack payload converter benchmark")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    converters = {
+        "json": temporalio.converter.default().payload_converter,
+        "msgpack": MsgPackDataConverter.payload_converter,
+    }
+
+    totals = {name: [0, 0.0, 0.0] for name in converters}
+    print(f"{'type':<44} {'json bytes':>10} {'msgpack':>8} {'json enc':>9} {'msgpack':>8} "
+          f"{'json dec':>9} {'msgpack':>8}")
+    for cls in types_module_dataclasses():
+        for value in [cls(), sample(cls)]:
+            results = {name: measure(converter, value, args.iterations) for name, converter in converters.items()}
+            for name, result in results.items():
+                totals[name] = [total + r for total, r in zip(totals[name], result)]
+            json_result, msgpack_result = results["json"], results["msgpack"]
+            print(f"{cls.__name__:<44} {json_result[0]:>10} {msgpack_result[0]:>8} "
+                  f"{json_result[1] * 1e6:>7.1f}us {msgpack_result[1] * 1e6:>6.1f}us "
+                  f"{json_result[2] * 1e6:>7.1f}us {msgpack_result[2] * 1e6:>6.1f}us")
+
+    json_total, msgpack_total = totals["json"], totals["msgpack"]
+    print(f"{'total':<44} {json_total[0]:>10} {msgpack_total[0]:>8} "
+          f"{json_total[1] * 1e6:>7.1f}us {msgpack_total[1] * 1e6:>6.1f}us "
+          f"{json_total[2] * 1e6:>7.1f}us {msgpack_total[2] * 1e6:>6.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from temporalio.client import Client, WorkflowHistory
+
+from src.bench.histories import fetch_histories
+from src.tracing import Span, critical_path, top_contributors
+
+# Where the time of a rollout went, from the histories of a SystemPatchWorkflow run and all its child workflows
+# (the numbers behind doc/execution_tree.png):
+# - the critical path: the chain of workflow tasks, activities, timers and child workflows that the run waited for,
+#   walking back from its end (see critical_path in src/tracing.py), and its top contributors
+# - per step, the queue wait (scheduled -> started) and the execution time (started -> closed)
+# - the parallelism reached over time: running activities and child workflows
+#
+#   python3 -m src.bench.critical_path --workflow-id <id>       fetches the histories from the server
+#   python3 -m src.bench.critical_path --histories <directory>  loads the JSON histories of a directory
+#                                                                (e.g. test/histories/<scenario>)
+#
+# The queue wait of an activity includes its failed attempts and their retry backoff, the history only records
+# the start of the last attempt. Local activities are not in the history, their time is in the workflow tasks.
+
+WORKFLOW_TASK = "WorkflowTask"
+
+
+def _time(event) -> float:
+    return event.event_time.ToMicroseconds() / 1_000_000
+
+
+def history_spans(history: WorkflowHistory, trace_id: str) -> List[Span]:
+    # the spans of one workflow run, the run id is the span id of the run
+    started = history.events[0].workflow_execution_started_event_attributes
+    workflow_type = started.workflow_type.name
+    run_id = started.original_execution_run_id
+    parent_id = started.parent_workflow_execution.run_id or None
+    attributes = {"workflowId": history.workflow_id}
+
+    spans = [Span(traceId=trace_id, spanId=run_id, parentId=parent_id, name="RunWorkflow:" + workflow_type,
+                  startTime=_time(history.events[0]), endTime=_time(history.events[-1]), attributes=attributes)]
+
+    def add(name: str, start: float, end: float) -> None:
+        spans.append(Span(traceId=trace_id, spanId=run_id + ":" + str(len(spans)), parentId=run_id, name=name,
+                          startTime=start, endTime=end, attributes=attributes))
+
+    # scheduled or initiated event id -> (name, time) of the steps that are not closed yet
+    scheduled: Dict[int, Tuple[str, float]] = {}
+    # scheduled event id -> started time
+    running: Dict[int, float] = {}
+
+    for event in history.events:
+        if event.HasField("workflow_task_scheduled_event_attributes"):
+            scheduled[event.event_id] = (WORKFLOW_TASK, _time(event))
+        elif event.HasField("workflow_task_started_event_attributes"):
+            scheduled_id = event.workflow_task_started_event_attributes.scheduled_event_id
+            add("ScheduleToStart:" + WORKFLOW_TASK, scheduled[scheduled_id][1], _time(event))
+            running[scheduled_id] = _time(event)
+        elif event.HasField("workflow_task_completed_event_attributes"):
+            scheduled_id = event.workflow_task_completed_event_attributes.scheduled_event_id
+            add("Run:" + WORKFLOW_TASK, running.pop(scheduled_id), _time(event))
+        elif event.HasField("activity_task_scheduled_event_attributes"):
+            attributes_ = event.activity_task_scheduled_event_attributes
+            scheduled[event.event_id] = (attributes_.activity_type.name, _time(event))
+        elif event.HasField("activity_task_started_event_attributes"):
+            scheduled_id = event.activity_task_started_event_attributes.scheduled_event_id
+            name, scheduled_time = scheduled[scheduled_id]
+            add("ScheduleToStart:" + name, scheduled_time, _time(event))
+            running[scheduled_id] = _time(event)
+        elif event.HasField("activity_task_completed_event_attributes") \
+                or event.HasField("activity_task_failed_event_attributes") \
+                or event.HasField("activity_task_timed_out_event_attributes") \
+                or event.HasField("activity_task_canceled_event_attributes"):
+            scheduled_id = getattr(event, event.WhichOneof("attributes")).scheduled_event_id
+            name, scheduled_time = scheduled.pop(scheduled_id)
+            # an activity can time out before it starts
+            add("RunActivity:" + name, running.pop(scheduled_id, scheduled_time), _time(event))
+        elif event.HasField("timer_started_event_attributes"):
+            scheduled[event.event_id] = ("Timer", _time(event))
+        elif event.HasField("timer_fired_event_attributes"):
+            name, started_time = scheduled.pop(event.timer_fired_event_attributes.started_event_id)
+            add(name, started_time, _time(event))
+        elif event.HasField("start_child_workflow_execution_initiated_event_attributes"):
+            attributes_ = event.start_child_workflow_execution_initiated_event_attributes
+            scheduled[event.event_id] = (attributes_.workflow_type.name, _time(event))
+        elif event.HasField("child_workflow_execution_started_event_attributes"):
+            initiated_id = event.child_workflow_execution_started_event_attributes.initiated_event_id
+            # the child workflow run is a span of its own history
+            name, initiated_time = scheduled.pop(initiated_id)
+            add("StartWorkflow:" + name, initiated_time, _time(event))
+
+    return spans
+
+
+def run_spans(histories: List[WorkflowHistory]) -> List[Span]:
+    # the histories of one run: the workflow, its continued-as-new runs and all its child workflows
+    return [span for history in histories for span in history_spans(history, histories[0].workflow_id)]
+
+
+def step_latencies(spans: List[Span]) -> Dict[str, Tuple[List[float], List[float]]]:
+    # step (workflow task, activity or child workflow type) -> (queue waits, execution times),
+    # the queue wait of a child workflow is the time to start it
+    steps = defaultdict(lambda: ([], []))
+    for span in spans:
+        kind, _, step = span.name.partition(":")
+        if kind in ("ScheduleToStart", "StartWorkflow"):
+            steps[step][0].append(span.duration)
+        elif kind in ("Run", "RunActivity", "RunWorkflow"):
+            steps[step][1].append(span.duration)
+    return steps
+
+
+def parallelism(spans: List[Span], start: float, end: float, buckets: int) -> List[Tuple[float, int]]:
+    # (average, max) number of spans running in each of `buckets` intervals of [start, end]
+    width = max(end - start, 1e-6) / buckets
+    area = [0.0] * buckets
+    peak = [0] * buckets
+
+    def bucket(t: float) -> int:
+        return min(buckets - 1, int((t - start) / width))
+
+    running = 0
+    last = start
+    # at the same time the spans that end are counted before the ones that start
+    for t, delta in sorted([(s.startTime, 1) for s in spans] + [(s.endTime, -1) for s in spans]):
+        t = min(max(t, start), end)
+        # spread the spans running between the last event and this one over the buckets
+        b = bucket(last)
+        while last < t:
+            until = t if b == buckets - 1 else min(t, start + (b + 1) * width)
+            area[b] += running * (until - last)
+            peak[b] = max(peak[b], running)
+            last = until
+            b = min(buckets - 1, b + 1)
+        running += delta
+        peak[bucket(t)] = max(peak[bucket(t)], running)
+
+    return [(area[b] / width, peak[b]) for b in range(buckets)]
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def report(spans: List[Span], top: int, buckets: int) -> None:
+    path = critical_path(spans)
+    started = min(span.startTime for span in spans)
+    ended = max(span.endTime for span in spans)
+    total = ended - started
+    runs = [span for span in spans if span.name.startswith("RunWorkflow:")]
+
+    print(f"{len(runs)} workflow runs, {total:.3f}s")
+    print()
+    print(f"{'critical path':<80} {'start':>9} {'duration':>9} {'self':>9}")
+    for step in path:
+        # the workflow tasks, queue waits and timers of a run are listed with the run
+        name = "  " * step.depth + step.span.name
+        if step.span.name.startswith("RunWorkflow:"):
+            name += " " + step.span.attributes["workflowId"]
+        print(f"{name[:80]:<80} {step.span.startTime - started:>8.3f}s "
+              f"{step.span.duration:>8.3f}s {step.selfTime:>8.3f}s")
+
+    print()
+    print(f"{'top contributors':<80} {'self':>9} {'share':>7}")
+    for name, seconds in top_contributors(path, top):
+        print(f"{name:<80} {seconds:>8.3f}s {seconds * 100 / total:>6.1f}%")
+
+    print()
+    print(f"{'step':<50} {'count':>6} {'queue wait':>11} {'max':>9} {'execution':>10} {'max':>9}")
+    for step, (waits, executions) in sorted(step_latencies(spans).items()):
+        print(f"{step:<50} {len(executions):>6} {_mean(waits):>10.3f}s {max(waits, default=0):>8.3f}s "
+              f"{_mean(executions):>9.3f}s {max(executions, default=0):>8.3f}s")
+
+    print()
+    activities = parallelism([s for s in spans if s.name.startswith("RunActivity:")], started, ended, buckets)
+    children = parallelism([s for s in runs if s.parentId], started, ended, buckets)
+    print(f"{'time':>9} {'activities avg':>15} {'max':>5} {'child workflows avg':>20} {'max':>5}")
+    for b in range(buckets):
+        print(f"{b * total / buckets:>8.1f}s {activities[b][0]:>15.1f} {activities[b][1]:>5} "
+              f"{children[b][0]:>20.1f} {children[b][1]:>5}")
+
+
+def load_histories(directory: str) -> List[WorkflowHistory]:
+    return [WorkflowHistory.from_json(path.stem, path.read_text()) for path in sorted(Path(directory).glob("*.json"))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Critical path, queue waits and parallelism of a workflow run")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--workflow-id", help="fetch the histories of this workflow and its child workflows")
+    source.add_argument("--histories", help="directory with the JSON histories of a run")
+    parser.add_argument("--run-id", help="run of --workflow-id, default the latest")
+    parser.add_argument("--top", type=int, default=10, help="number of top contributors")
+    parser.add_argument("--buckets", type=int, default=20, help="number of intervals of the parallelism report")
+    args = parser.parse_args()
+
+    if args.workflow_id:
+        client = await Client.connect("localhost:7233")
+        histories = await fetch_histories(client, args.workflow_id, args.run_id)
+    else:
+        histories = load_histories(args.histories)
+    if not histories:
+        source = args.histories + "/*.json" if args.histories else "workflow " + args.workflow_id
+        parser.error("no workflow histories found in " + source)
+
+    report(run_spans(histories), args.top, args.buckets)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+from typing import List, Optional
+
+from temporalio.client import Client, WorkflowHistory
+
+
+async def fetch_histories(client: Client, workflow_id: str, run_id: Optional[str] = None) -> List[WorkflowHistory]:
+    # the history of the workflow run, its continued-as-new runs and all its child workflows
+    history = await client.get_workflow_handle(workflow_id, run_id=run_id).fetch_history()
+    histories = [history]
+    for event in history.events:
+        if event.HasField("child_workflow_execution_started_event_attributes"):
+            execution = event.child_workflow_execution_started_event_attributes.workflow_execution
+            histories += await fetch_histories(client, execution.workflow_id, execution.run_id)
+        elif event.HasField("workflow_execution_continued_as_new_event_attributes"):
+            histories += await fetch_histories(
+                client, workflow_id, event.workflow_execution_continued_as_new_event_attributes.new_execution_run_id)
+    return histories
+
+
+def workflow_task_count(history: WorkflowHistory) -> int:
+    return sum(1 for event in history.events if event.HasField("workflow_task_completed_event_attributes"))
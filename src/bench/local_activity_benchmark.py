@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import dataclasses
+import statistics
+import time
+import uuid
+
+from temporalio.client import Client
+from temporalio.worker import Worker
+
+from src.bench.mock_activities import mock_activities
+from src.temporal_worker_v8 import workflows
+from src.workflow.sandbox import workflow_runner
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_V7
+from src.workflow.types import SystemPatchWorkflowInput
+
+# Measures the end-to-end latency of one SystemPatchWorkflow_V7 run with the cheap steps
+# executed as regular activities vs local activities.
+# The activities are the mocks of mock_activities.py, they complete right away and never fail: the random duration
+# and failures of the activities_v7 ones would hide the difference, the task queue round trips of each activity.
+#
+# Start the temporal server (sh_start_server.sh) and run:
+#   python3 -m src.bench.local_activity_benchmark --runs 5
+
+queue = "system_patch-local-activity-benchmark-task-queue"
+
+local_activities = [
+    "send_approval_request_activity",
+    "vault_client_activity",
+    "send_start_notification_activity",
+    "send_success_notification_activity",
+    "send_failure_alert_activity",
+    "send_final_success_notification_activity",
+]
+
+
+async def run_workflow(client: Client, wf_input: SystemPatchWorkflowInput) -> float:
+    started = time.perf_counter()
+    workflow_handle = await client.start_workflow(
+        SystemPatchWorkflow_V7.run,
+        wf_input,
+        id="local-activity-benchmark-" + str(uuid.uuid4()),
+        task_queue=queue,
+    )
+    await workflow_handle.signal(SystemPatchWorkflow_V7.approve_request)
+    await workflow_handle.result()
+    return time.perf_counter() - started
+
+
+async def measure(client: Client, runs: int, wf_input: SystemPatchWorkflowInput) -> list:
+    # runs are sequential, so they don't compete for worker slots
+    return [await run_workflow(client, wf_input) for _ in range(runs)]
+
+
+def report(name: str, latencies: list) -> None:
+    print(f"{name:<20} runs={len(latencies)} "
+          f"mean={statistics.mean(latencies):.3f}s "
+          f"median={statistics.median(latencies):.3f}s "
+          f"min={min(latencies):.3f}s max={max(latencies):.3f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SystemPatchWorkflow_V7 local activity benchmark")
+    parser.add_argument("--address", default="localhost:7233")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--clusters", nargs="+", default=["cluster1"])
+    parser.add_argument("--hosts", type=int, default=5, help="hosts per cluster")
+    args = parser.parse_args()
+
+    client = await Client.connect(args.address)
+
+    worker = Worker(
+        client,
+        task_queue=queue,
+        workflows=workflows,
+        activities=mock_activities(args.hosts),
+        workflow_runner=workflow_runner(),
+    )
+
+    wf_input = SystemPatchWorkflowInput(targetClusters=args.clusters, pilotHostCount=1)
+
+    async with worker:
+        activity_latencies = await measure(client, args.runs, wf_input)
+        local_activity_latencies = await measure(
+            client, args.runs, dataclasses.replace(wf_input, localActivities=local_activities)
+        )
+
+    report("activities", activity_latencies)
+    report("local activities", local_activity_latencies)
+    print(f"difference (median)  "
+          f"{statistics.median(activity_latencies) - statistics.median(local_activity_latencies):.3f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
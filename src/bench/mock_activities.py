@@ -0,0 +1,171 @@
+from typing import List
+
+from temporalio import activity
+
+from src.workflow.types import CheckPreconditionsActivityInput, VaultResponse, \
+    VaultClientActivityInput, SendSuccessNotificationActivityInput, SendFailureAlertActivityInput, \
+    CheckServiceHealthActivityInput, RunPostUpdateScriptsActivityInput, StartServicesActivityInput, \
+    PerformUpdateActivityInput, RunPreUpdateScriptsActivityInput, WaitForWorkloadDrainActivityInput, \
+    StopServicesActivityInput, SetMaintenanceModeActivityInput, RunPreDowntimeScriptsActivityInput, \
+    SendStartNotificationActivityInput, CheckHostPreconditionsActivityInput, GetClusterHostsActivityInput, \
+    SendApprovalRequestActivityInput, SendFinalSuccessNotificationActivityInput, GetClusterHostsActivityOutput, \
+    CheckHostPreconditionsActivityOutput, HostResult, HostBatchActivityOutput, HostPreconditionsResult, \
+    CheckHostPreconditionsBatchActivityInput, CheckHostPreconditionsBatchActivityOutput, \
+    RunPreDowntimeScriptsBatchActivityInput, PerformUpdateBatchActivityInput, CheckServiceHealthBatchActivityInput, \
+    SendSuccessNotificationBatchActivityInput
+
+
+# Activities with the same names and types as the ones in activity_definitions.py that complete right away and never
+# fail, to run every version of the workflows (in the time-skipping test environment) in milliseconds, e.g. to record
+# histories for replay tests or to benchmark the workflows alone.
+
+
+def mock_activities(host_count: int = 5):
+    my_activities = MockActivities(host_count)
+
+    return [
+        my_activities.check_preconditions_activity,
+        my_activities.send_approval_request_activity,
+        my_activities.vault_client_activity,
+        my_activities.get_cluster_hosts_activity,
+        my_activities.check_host_preconditions_activity,
+        my_activities.run_post_update_scripts_activity,
+        my_activities.run_pre_downtime_scripts_activity,
+        my_activities.run_pre_update_scripts_activity,
+        my_activities.perform_update_activity,
+        my_activities.send_failure_alert_activity,
+        my_activities.send_final_success_notification_activity,
+        my_activities.send_start_notification_activity,
+        my_activities.send_success_notification_activity,
+        my_activities.check_service_health_activity,
+        my_activities.set_maintenance_mode_activity,
+        my_activities.stop_services_activity,
+        my_activities.start_services_activity,
+        my_activities.wait_for_workload_drain_activity,
+        my_activities.check_host_preconditions_batch_activity,
+        my_activities.run_pre_downtime_scripts_batch_activity,
+        my_activities.perform_update_batch_activity,
+        my_activities.check_service_health_batch_activity,
+        my_activities.send_success_notification_batch_activity,
+    ]
+
+
+class MockActivities:
+    def __init__(self, host_count: int = 5) -> None:
+        # number of hosts per cluster
+        self.host_count = host_count
+
+    @activity.defn
+    async def check_preconditions_activity(self, activity_input: CheckPreconditionsActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def vault_client_activity(self, activity_input: VaultClientActivityInput) -> VaultResponse:
+        return VaultResponse()
+
+    @activity.defn
+    async def send_approval_request_activity(self, activity_input: SendApprovalRequestActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def get_cluster_hosts_activity(self,
+                                         activity_input: GetClusterHostsActivityInput) -> GetClusterHostsActivityOutput:
+        hostnames = [activity_input.targetCluster + "_host" + str(i + 1) for i in range(self.host_count)]
+
+        if activity_input.pageSize <= 0:
+            return GetClusterHostsActivityOutput(hostnames, totalHostCount=len(hostnames))
+
+        page_end = activity_input.cursor + activity_input.pageSize
+        return GetClusterHostsActivityOutput(
+            hostnames[activity_input.cursor:page_end],
+            page_end if page_end < len(hostnames) else None,
+            len(hostnames),
+        )
+
+    @activity.defn
+    async def check_host_preconditions_activity(self,
+                                                activity_input: CheckHostPreconditionsActivityInput) -> CheckHostPreconditionsActivityOutput:
+        return CheckHostPreconditionsActivityOutput(True, "ssh-private-key")
+
+    @activity.defn
+    async def send_start_notification_activity(self, activity_input: SendStartNotificationActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def run_pre_downtime_scripts_activity(self, activity_input: RunPreDowntimeScriptsActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def set_maintenance_mode_activity(self, activity_input: SetMaintenanceModeActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def stop_services_activity(self, activity_input: StopServicesActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def wait_for_workload_drain_activity(self, activity_input: WaitForWorkloadDrainActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def run_pre_update_scripts_activity(self, activity_input: RunPreUpdateScriptsActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def perform_update_activity(self, activity_input: PerformUpdateActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def start_services_activity(self, activity_input: StartServicesActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def run_post_update_scripts_activity(self, activity_input: RunPostUpdateScriptsActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def check_service_health_activity(self, activity_input: CheckServiceHealthActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def send_success_notification_activity(self, activity_input: SendSuccessNotificationActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def send_failure_alert_activity(self, activity_input: SendFailureAlertActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def send_final_success_notification_activity(self,
+                                                       activity_input: SendFinalSuccessNotificationActivityInput) -> bool:
+        return True
+
+    @activity.defn
+    async def check_host_preconditions_batch_activity(self,
+                                                      activity_input: CheckHostPreconditionsBatchActivityInput) -> CheckHostPreconditionsBatchActivityOutput:
+        return CheckHostPreconditionsBatchActivityOutput(
+            [HostPreconditionsResult(hostname, True, "ssh-private-key") for hostname in activity_input.hostnames]
+        )
+
+    @activity.defn
+    async def run_pre_downtime_scripts_batch_activity(self,
+                                                      activity_input: RunPreDowntimeScriptsBatchActivityInput) -> HostBatchActivityOutput:
+        return self._all_succeeded(activity_input.hostnames)
+
+    @activity.defn
+    async def perform_update_batch_activity(self,
+                                            activity_input: PerformUpdateBatchActivityInput) -> HostBatchActivityOutput:
+        return self._all_succeeded(activity_input.hostnames)
+
+    @activity.defn
+    async def check_service_health_batch_activity(self,
+                                                  activity_input: CheckServiceHealthBatchActivityInput) -> HostBatchActivityOutput:
+        return self._all_succeeded(activity_input.hostnames)
+
+    @activity.defn
+    async def send_success_notification_batch_activity(self,
+                                                       activity_input: SendSuccessNotificationBatchActivityInput) -> HostBatchActivityOutput:
+        return self._all_succeeded(activity_input.hostnames)
+
+    def _all_succeeded(self, hostnames: List[str]) -> HostBatchActivityOutput:
+        return HostBatchActivityOutput([HostResult(hostname, True) for hostname in hostnames])
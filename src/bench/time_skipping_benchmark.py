@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List
+
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+from src.bench.histories import fetch_histories, workflow_task_count
+from src.bench.local_activity_benchmark import local_activities
+from src.bench.mock_activities import mock_activities
+from src.temporal_worker_v8 import workflows
+from src.workflow.sandbox import workflow_runner
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_V7
+from src.workflow.types import SystemPatchWorkflowInput
+
+# Orchestration overhead of SystemPatchWorkflow_V7, without the activity execution time.
+#
+# Runs the workflow against N clusters x M hosts in the time-skipping test environment with mock activities
+# (src/bench/mock_activities.py) and reports, per host, the workflow tasks, the history events (of the workflow
+# and all its child and continued-as-new runs), the wall time and the CPU time of this process (worker and client),
+# e.g.
+#   python3 -m src.bench.time_skipping_benchmark --clusters 3 --hosts 20 --runs 3 --host-batch-size 5
+#
+# The test server is downloaded on first use.
+
+queue = "system_patch-time-skipping-benchmark-task-queue"
+
+
+@dataclass
+class RunStats:
+    executions: int
+    workflow_tasks: int
+    history_events: int
+    wall_seconds: float
+    cpu_seconds: float
+
+
+async def run_workflow(client: Client, wf_input: SystemPatchWorkflowInput) -> RunStats:
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    handle = await client.start_workflow(
+        SystemPatchWorkflow_V7.run,
+        wf_input,
+        id="time-skipping-benchmark-" + str(uuid.uuid4()),
+        task_queue=queue,
+        start_signal="approve_request",
+    )
+    await handle.result()
+    wall_seconds = time.perf_counter() - wall_started
+    cpu_seconds = time.process_time() - cpu_started
+
+    histories = await fetch_histories(client, handle.id, handle.result_run_id)
+    return RunStats(
+        executions=len(histories),
+        workflow_tasks=sum(workflow_task_count(history) for history in histories),
+        history_events=sum(len(history.events) for history in histories),
+        wall_seconds=wall_seconds,
+        cpu_seconds=cpu_seconds,
+    )
+
+
+def report(runs: List[RunStats], host_count: int) -> None:
+    print(f"{'run':<6} {'workflows':>9} {'wf tasks':>9} {'events':>8} {'wall':>9} {'cpu':>9} "
+          f"{'wf tasks/host':>14} {'events/host':>12} {'wall/host':>10} {'cpu/host':>10}")
+    for i, run in enumerate(runs):
+        print(f"{i + 1:<6} {run.executions:>9} {run.workflow_tasks:>9} {run.history_events:>8} "
+              f"{run.wall_seconds:>8.3f}s {run.cpu_seconds:>8.3f}s "
+              f"{run.workflow_tasks / host_count:>14.2f} {run.history_events / host_count:>12.2f} "
+              f"{run.wall_seconds * 1000 / host_count:>8.2f}ms {run.cpu_seconds * 1000 / host_count:>8.2f}ms")
+
+    print(f"median wall/host={statistics.median(r.wall_seconds for r in runs) * 1000 / host_count:.2f}ms "
+          f"cpu/host={statistics.median(r.cpu_seconds for r in runs) * 1000 / host_count:.2f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SystemPatchWorkflow_V7 time-skipping benchmark")
+    parser.add_argument("--clusters", type=int, default=3, help="number of clusters")
+    parser.add_argument("--hosts", type=int, default=10, help="number of hosts per cluster")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pilot-hosts", type=int, default=1)
+    parser.add_argument("--max-in-flight-hosts", type=int, default=0)
+    parser.add_argument("--host-page-size", type=int, default=0)
+    parser.add_argument("--host-batch-size", type=int, default=0)
+    parser.add_argument("--local-activities", action="store_true",
+                        help="run the notifications and the vault client as local activities")
+    args = parser.parse_args()
+
+    wf_input = SystemPatchWorkflowInput(
+        targetClusters=["cluster" + str(i + 1) for i in range(args.clusters)],
+        pilotHostCount=args.pilot_hosts,
+        maxInFlightHosts=args.max_in_flight_hosts,
+        hostPageSize=args.host_page_size,
+        hostBatchSize=args.host_batch_size,
+        localActivities=local_activities if args.local_activities else [],
+    )
+
+    async with await WorkflowEnvironment.start_time_skipping() as env:
+        worker = Worker(
+            env.client,
+            task_queue=queue,
+            workflows=workflows,
+            activities=mock_activities(args.hosts),
+            workflow_runner=workflow_runner(),
+        )
+        async with worker:
+            # runs are sequential, so they don't compete for worker slots
+            runs = [await run_workflow(env.client, wf_input) for _ in range(args.runs)]
+
+    report(runs, args.clusters * args.hosts)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+
+from src.tracing import Span, critical_path, read_spans, top_contributors
+
+# Critical path of one traced workflow run and its top latency contributors, from the spans of src/tracing.py
+# (client and workers started with --trace-file), e.g.
+#   python3 -m src.temporal_worker_v8 --trace-file /tmp/spans.jsonl
+#   python3 -m src.temporal_client_v8 --count 1 --trace-file /tmp/spans.jsonl
+#   python3 -m src.bench.trace_report --spans /tmp/spans.jsonl
+#
+# Without --trace-id the report is for the trace that ended last.
+
+
+def traces(spans: List[Span]) -> Dict[str, List[Span]]:
+    by_trace = defaultdict(list)
+    for span in spans:
+        by_trace[span.traceId].append(span)
+    return by_trace
+
+
+def report(spans: List[Span], count: int) -> None:
+    path = critical_path(spans)
+    started = min(span.startTime for span in spans)
+    total = max(span.endTime for span in spans) - started
+
+    print(f"trace {spans[0].traceId}: {len(spans)} spans, {total:.3f}s")
+    print()
+    print(f"{'critical path':<80} {'start':>9} {'duration':>9} {'self':>9}")
+    for step in path:
+        name = "  " * step.depth + step.span.name
+        workflow_id = step.span.attributes.get("workflowId", "")
+        print(f"{(name + ' ' + workflow_id)[:80]:<80} {step.span.startTime - started:>8.3f}s "
+              f"{step.span.duration:>8.3f}s {step.selfTime:>8.3f}s")
+
+    print()
+    print(f"{'top contributors':<80} {'self':>9} {'share':>7}")
+    for name, seconds in top_contributors(path, count):
+        print(f"{name:<80} {seconds:>8.3f}s {seconds * 100 / total:>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Critical path of a traced workflow run")
+    parser.add_argument("--spans", required=True, help="span file written by --trace-file")
+    parser.add_argument("--trace-id", help="trace to report, default the trace that ended last")
+    parser.add_argument("--top", type=int, default=10, help="number of top contributors")
+    args = parser.parse_args()
+
+    by_trace = traces(read_spans(args.spans))
+    if args.trace_id:
+        spans = by_trace[args.trace_id]
+    else:
+        spans = max(by_trace.values(), key=lambda trace: max(span.endTime for span in trace))
+
+    report(spans, args.top)
+
+
+if __name__ == "__main__":
+    main()
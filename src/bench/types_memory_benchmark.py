@@ -0,0 +1,76 @@
+import argparse
+import dataclasses
+import gc
+import tracemalloc
+
+from src.workflow.types import SystemPatchWorkflowInput, GetClusterHostsActivityOutput, VaultResponse, \
+    CheckHostPreconditionsActivityInput, CheckHostPreconditionsActivityOutput, RunPreDowntimeScriptsActivityInput, \
+    PerformUpdateActivityInput, CheckServiceHealthActivityInput, SendSuccessNotificationActivityInput
+
+# Memory used by the types.py instances that a cached workflow keeps alive, with the slotted and frozen
+# dataclasses of types.py vs the same dataclasses without slots, e.g.
+#   python3 -m src.bench.types_memory_benchmark --workflows 1000 10000
+
+
+state_types = [
+    SystemPatchWorkflowInput,
+    VaultResponse,
+    GetClusterHostsActivityOutput,
+    CheckHostPreconditionsActivityInput,
+    CheckHostPreconditionsActivityOutput,
+    RunPreDowntimeScriptsActivityInput,
+    PerformUpdateActivityInput,
+    CheckServiceHealthActivityInput,
+    SendSuccessNotificationActivityInput,
+]
+
+
+def plain_dataclass(cls):
+    # same fields as cls, as a regular dataclass with a per-instance __dict__
+    return dataclasses.make_dataclass(cls.__name__, [(f.name, f.type, f) for f in dataclasses.fields(cls)])
+
+
+def workflow_state(types, i: int):
+    # the inputs and results referenced by a SystemPatchWorkflow_V7 execution and one of its host workflows
+    host = f"cluster1_host{i}"
+    return [
+        types[SystemPatchWorkflowInput](targetClusters=["cluster1", "cluster2", "cluster3"], pilotHostCount=3),
+        types[VaultResponse](),
+        types[GetClusterHostsActivityOutput](hostnames=[f"cluster1_host{h}" for h in range(5)]),
+        types[CheckHostPreconditionsActivityInput](hostname=host),
+        types[CheckHostPreconditionsActivityOutput](preconditionsMet=True, sshPrivateKey="ssh-private-key"),
+        types[RunPreDowntimeScriptsActivityInput](hostname=host),
+        types[PerformUpdateActivityInput](hostname=host),
+        types[CheckServiceHealthActivityInput](hostname=host),
+        types[SendSuccessNotificationActivityInput](hostname=host),
+    ]
+
+
+def measure(types, workflows: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    state = [workflow_state(types, i) for i in range(workflows)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="types.py memory per cached workflow")
+    parser.add_argument("--workflows", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    slotted = {cls: cls for cls in state_types}
+    plain = {cls: plain_dataclass(cls) for cls in state_types}
+
+    print(f"{'workflows':>10} {'plain':>12} {'slotted':>12} {'plain/wf':>10} {'slotted/wf':>11} {'saved':>7}")
+    for workflows in args.workflows:
+        plain_bytes = measure(plain, workflows)
+        slotted_bytes = measure(slotted, workflows)
+        print(f"{workflows:>10} {plain_bytes:>12} {slotted_bytes:>12} {plain_bytes / workflows:>10.0f} "
+              f"{slotted_bytes / workflows:>11.0f} {1 - slotted_bytes / plain_bytes:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
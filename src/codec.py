@@ -0,0 +1,92 @@
+import dataclasses
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import temporalio.converter
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter, PayloadCodec
+
+# Payloads (workflow/activity inputs and results, signals, queries...) bigger than `threshold_bytes`
+# are compressed before being sent to the server, which reduces the history size and the gRPC traffic
+# when the host lists grow. Smaller payloads are sent as they are, compressing them is not worth the CPU.
+#
+# Every client and worker of the task queue has to use the codec, the payloads compressed by one
+# can't be decoded by the others otherwise.
+#
+# Set TEMPORAL_PAYLOAD_COMPRESSION=zlib (or zstd, requires `pip install zstandard`) to enable it in
+# temporal_worker_v8 and temporal_client_v8 (see `data_converter_from_env` in src/converter.py).
+
+
+def _zstd() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstd compression requires zstandard, install it with `pip install zstandard`") from e
+    return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+
+
+def _zlib() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    return zlib.compress, zlib.decompress
+
+
+# algorithm -> (compress, decompress) factory
+_algorithms = {
+    "zlib": _zlib,
+    "zstd": _zstd,
+}
+
+
+class CompressionCodec(PayloadCodec):
+    def __init__(self, algorithm: str = "zlib", threshold_bytes: int = 1024) -> None:
+        if algorithm not in _algorithms:
+            raise ValueError("unknown compression algorithm: " + algorithm)
+        self.encoding = ("binary/" + algorithm).encode()
+        self.compress, _ = _algorithms[algorithm]()
+        self.threshold_bytes = threshold_bytes
+        # decompressors are created on first use, payloads compressed with another algorithm can still be decoded
+        self.decompressors: Dict[bytes, Callable[[bytes], bytes]] = {}
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        return [self._encode(payload) for payload in payloads]
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        return [self._decode(payload) for payload in payloads]
+
+    def _encode(self, payload: Payload) -> Payload:
+        data = payload.SerializeToString()
+        if len(data) < self.threshold_bytes:
+            return payload
+
+        compressed = self.compress(data)
+        if len(compressed) >= len(data):
+            # not compressible
+            return payload
+
+        return Payload(metadata={"encoding": self.encoding}, data=compressed)
+
+    def _decode(self, payload: Payload) -> Payload:
+        encoding = payload.metadata.get("encoding", b"")
+        decompress = self._decompressor(encoding)
+        if decompress is None:
+            return payload
+
+        return Payload.FromString(decompress(payload.data))
+
+    def _decompressor(self, encoding: bytes) -> Optional[Callable[[bytes], bytes]]:
+        if encoding in self.decompressors:
+            return self.decompressors[encoding]
+
+        # other encodings of the default converter (e.g. binary/plain, json/plain) are not compressed
+        algorithm = encoding.decode(errors="replace").split("/", 1)[-1]
+        if not encoding.startswith(b"binary/") or algorithm not in _algorithms:
+            return None
+
+        _, self.decompressors[encoding] = _algorithms[algorithm]()
+        return self.decompressors[encoding]
+
+
+def compression_data_converter(algorithm: str, threshold_bytes: int = 1024) -> DataConverter:
+    return dataclasses.replace(
+        temporalio.converter.default(),
+        payload_codec=CompressionCodec(algorithm, threshold_bytes),
+    )
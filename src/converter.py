@@ -0,0 +1,125 @@
+import dataclasses
+import os
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+import temporalio.converter
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (CompositePayloadConverter, DataConverter, DefaultPayloadConverter,
+                                  EncodingPayloadConverter)
+
+from src.codec import CompressionCodec
+
+try:
+    import msgpack
+except ImportError:  # optional dependency, only needed by MsgPackDataConverter
+    msgpack = None
+
+# Compact binary encoding for the dataclasses in src/workflow/types.py (and the workflow inputs).
+#
+# A dataclass is encoded as a msgpack array with the values of its fields, in declaration order,
+# the field names are not sent. The schema is derived from the dataclass when the payload is decoded,
+# using the type hint of the workflow/activity parameter or return value.
+#
+# - new fields have to be added at the end and have a default value, payloads encoded before the change
+#   are decoded with the default value (and new payloads with the extra value are decoded by old code)
+# - values that are not dataclasses (str, lists, dicts...) are encoded by the default converters (JSON)
+# - without type hint (e.g. `activity.info().heartbeat_details`) a dataclass is decoded as a list of values
+#
+# Every client and worker of the task queue has to use the converter.
+#
+# Set TEMPORAL_PAYLOAD_CONVERTER=msgpack (requires `pip install msgpack`) to enable it in
+# temporal_worker_v8 and temporal_client_v8.
+
+CONVERTER_ENV_VAR = "TEMPORAL_PAYLOAD_CONVERTER"
+COMPRESSION_ENV_VAR = "TEMPORAL_PAYLOAD_COMPRESSION"
+
+# (field name, type hint) of each dataclass, in declaration order
+_schemas: Dict[type, List[Tuple[str, Any]]] = {}
+
+
+def _schema(cls: type) -> List[Tuple[str, Any]]:
+    schema = _schemas.get(cls)
+    if schema is None:
+        hints = typing.get_type_hints(cls)
+        schema = _schemas[cls] = [(f.name, hints.get(f.name, Any)) for f in dataclasses.fields(cls) if f.init]
+    return schema
+
+
+def to_compact(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return [to_compact(getattr(value, name)) for name, _ in _schema(type(value))]
+    if isinstance(value, (list, tuple)):
+        return [to_compact(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_compact(v) for k, v in value.items()}
+    return value
+
+
+def from_compact(value: Any, type_hint: Any) -> Any:
+    if value is None or type_hint is None or type_hint is Any:
+        return value
+
+    if dataclasses.is_dataclass(type_hint):
+        # missing values (payloads encoded before new fields were added) get the field default
+        return type_hint(*[from_compact(v, hint) for v, (_, hint) in zip(value, _schema(type_hint))])
+
+    origin = typing.get_origin(type_hint)
+    args = typing.get_args(type_hint)
+    if origin is typing.Union:
+        # Optional[X]
+        non_none = [arg for arg in args if arg is not type(None)]
+        return from_compact(value, non_none[0]) if len(non_none) == 1 else value
+    if origin in (list, List) and args:
+        return [from_compact(v, args[0]) for v in value]
+    if origin in (dict, Dict) and len(args) == 2:
+        return {k: from_compact(v, args[1]) for k, v in value.items()}
+    return value
+
+
+class MsgPackDataclassPayloadConverter(EncodingPayloadConverter):
+    @property
+    def encoding(self) -> str:
+        return "binary/msgpack"
+
+    def to_payload(self, value: Any) -> Optional[Payload]:
+        if not dataclasses.is_dataclass(value) or isinstance(value, type):
+            # not a dataclass, let the next converter encode it
+            return None
+        return Payload(
+            metadata={"encoding": self.encoding.encode()},
+            data=msgpack.packb(to_compact(value)),
+        )
+
+    def from_payload(self, payload: Payload, type_hint: Optional[Type] = None) -> Any:
+        return from_compact(msgpack.unpackb(payload.data), type_hint)
+
+
+class MsgPackPayloadConverter(CompositePayloadConverter):
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise RuntimeError("the msgpack converter requires msgpack, install it with `pip install msgpack`")
+
+        # same converters as the default one, dataclasses are encoded with msgpack before falling back to JSON
+        converters = list(DefaultPayloadConverter.default_encoding_payload_converters)
+        converters.insert(len(converters) - 1, MsgPackDataclassPayloadConverter())
+        super().__init__(*converters)
+
+
+MsgPackDataConverter = DataConverter(payload_converter_class=MsgPackPayloadConverter)
+
+# name -> data converter factory
+_payload_converters: Dict[str, Callable[[], DataConverter]] = {
+    "json": temporalio.converter.default,
+    "msgpack": lambda: MsgPackDataConverter,
+}
+
+
+def data_converter_from_env() -> DataConverter:
+    data_converter = _payload_converters[os.environ.get(CONVERTER_ENV_VAR) or "json"]()
+
+    algorithm = os.environ.get(COMPRESSION_ENV_VAR)
+    if algorithm:
+        data_converter = dataclasses.replace(data_converter, payload_codec=CompressionCodec(algorithm))
+
+    return data_converter
@@ -1,8 +1,9 @@
 import asyncio
 
-from temporalio.client import Client
+from temporalio.client import Client, WorkflowHandle
 from temporalio.common import WorkflowIDReusePolicy
 
+from src.temporal_progress import ProgressSubscriber
 from src.temporal_worker import queue
 from src.workflow.system_patch_workflow_v1 import SystemPatchWorkflow_V1
 from src.workflow.system_patch_workflow_v2 import SystemPatchWorkflow_V2
@@ -32,7 +33,8 @@ async def main():
         id_reuse_policy=WorkflowIDReusePolicy.TERMINATE_IF_RUNNING
     )
 
-    #asyncio.create_task(query_workflow(workflow_handle))
+    # the progress is published by SystemPatchWorkflow_V7 started with publishProgress=True
+    #progress = watch_progress(client, workflow_handle)
 
     print("Workflow started with workflow_id:", workflow_handle.id)
 
@@ -42,11 +44,15 @@ async def main():
     print("Result:", await workflow_handle.result())
 
 
-async def query_workflow(workflow_handle):
-    while True:
-        state = await workflow_handle.query(SystemPatchWorkflow.get_completed_steps)
-        print("Querying workflow state:", state)
-        await asyncio.sleep(3)
+def watch_progress(client: Client, workflow_handle: WorkflowHandle) -> ProgressSubscriber:
+    # lists the completed steps from the visibility store (PatchCompletedSteps search attribute) instead of
+    # querying the workflow, the workers don't have to load it
+    progress = ProgressSubscriber(client)
+    progress.subscribe(
+        workflow_handle.id,
+        lambda workflow_id, completed_steps, status: print("Workflow progress:", completed_steps, status),
+        run_id=workflow_handle.result_run_id)
+    return progress
 
 
 if __name__ == "__main__":
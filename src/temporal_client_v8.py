@@ -1,55 +1,388 @@
+import argparse
 import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
 
-from temporalio.client import Client
+from temporalio.client import Client, WorkflowExecutionStatus, WorkflowHandle
+from temporalio.service import RPCError, RPCStatusCode
 
+from src.converter import data_converter_from_env
+from src.temporal_progress import ProgressSubscriber
 from src.temporal_worker import queue
 from src.temporal_worker_v8 import init_runtime_with_prometheus
+from src.tracing import FileSpanExporter, LatencyTracingInterceptor
 from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_V7
+from src.workflow.task_queues import ACTIVITY_TASK_QUEUES
 from src.workflow.types import SystemPatchWorkflowInput
+from src.workflow.waves import check_waves
 
 SystemPatchWorkflow = SystemPatchWorkflow_V7
 
 
-async def start_workflow(client, i):
-    workflow_id = "my-business-id-SystemPatchWorkflow_" + str(i)
-    workflow_handle = await client.start_workflow(
-        SystemPatchWorkflow.run,
-        SystemPatchWorkflowInput(
-            targetClusters=["cluster1", "cluster2", "cluster3"],
-            pilotHostCount=3
-        ),
-        id=workflow_id,
-        task_queue=queue,
+# Load generator, starts `count` workflows at `rate` workflows per second and reports
+# the start latency, completion latency and throughput, e.g.
+#   python3 -m src.temporal_client_v8 --count 100 --rate 5 --concurrency 50 --ramp-up 10 --signal-delay uniform:1:3
 
+
+@dataclass
+class WorkflowRunOptions:
+    # the input of the workflows, built once from the command line (see workflow_input)
+    wf_input: SystemPatchWorkflowInput
+    # send the approval with the start request instead of a signal
+    pre_approved: bool = False
+    # follows the completed steps of the workflows, wf_input.publishProgress has to be set
+    progress: Optional[ProgressSubscriber] = None
+
+
+@dataclass
+class LoadStats:
+    start_latencies: List[float] = field(default_factory=list)
+    completion_latencies: List[float] = field(default_factory=list)
+    failures: int = 0
+
+
+def parse_delay_distribution(spec: str) -> Callable[[], float]:
+    # fixed:<seconds> | uniform:<min>:<max> | exponential:<mean>
+    name, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if name == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if name == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if name == "exponential" and len(values) == 1:
+        return lambda: random.expovariate(1 / values[0]) if values[0] > 0 else 0
+    raise argparse.ArgumentTypeError("invalid signal delay distribution: " + spec)
+
+
+def parse_positive_int(spec: str) -> int:
+    # --count, --concurrency: at least 1
+    try:
+        value = int(spec)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid integer: " + spec)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"invalid value {value}, it has to be at least 1")
+    return value
+
+
+def parse_positive_float(spec: str) -> float:
+    # --rate: greater than 0
+    try:
+        value = float(spec)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid number: " + spec)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"invalid value {value}, it has to be greater than 0")
+    return value
+
+
+def parse_int_list(spec: str) -> List[int]:
+    # 1,5,25
+    try:
+        return [int(value) for value in spec.split(",") if value]
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid list of integers: " + spec)
+
+
+def parse_wave_sizes(spec: str) -> List[int]:
+    wave_sizes = parse_int_list(spec)
+    try:
+        check_waves(wave_sizes, [])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return wave_sizes
+
+
+def parse_wave_success_thresholds(spec: str) -> List[int]:
+    success_thresholds = parse_int_list(spec)
+    try:
+        check_waves([], success_thresholds)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return success_thresholds
+
+
+def current_rate(rate: float, ramp_up_seconds: float, elapsed: float) -> float:
+    if ramp_up_seconds <= 0:
+        return rate
+    # linear ramp up from rate/10 to rate
+    return rate * min(1.0, max(0.1, elapsed / ramp_up_seconds))
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return math.nan
+    # nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def start_workflow_with_backoff(client: Client, workflow_id: str, wf_input: SystemPatchWorkflowInput,
+                                      max_attempts: int = 5, initial_backoff: float = 0.5,
+                                      max_backoff: float = 10, pre_approved: bool = False) -> WorkflowHandle:
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return await client.start_workflow(
+                SystemPatchWorkflow.run,
+                wf_input,
+                id=workflow_id,
+                task_queue=queue,
+                # signal-with-start, the approval is delivered with the start request.
+                # The workflow doesn't wait for a separate signal request.
+                start_signal="approve_request" if pre_approved else None,
+            )
+        except RPCError as e:
+            # the server is rate limiting the requests, retry later
+            if e.status != RPCStatusCode.RESOURCE_EXHAUSTED or attempt == max_attempts:
+                raise
+            # exponential backoff with full jitter, so the retries of many starts don't hit the server at once
+            await asyncio.sleep(random.uniform(0, min(max_backoff, initial_backoff * 2 ** (attempt - 1))))
+
+
+async def bulk_start_workflows(client: Client,
+                               workflow_inputs: Iterable[Tuple[str, SystemPatchWorkflowInput]],
+                               concurrency: int = 10,
+                               max_attempts: int = 5,
+                               pre_approved: bool = False,
+                               on_start_failed: Optional[Callable[[str, Exception], None]] = None
+                               ) -> AsyncIterator[WorkflowHandle]:
+    # Starts a workflow per (workflow_id, wf_input), with at most `concurrency` start requests in flight.
+    # The inputs are consumed lazily and the handles are yielded as soon as each workflow is started.
+    # A start that fails (after the retries) is passed to on_start_failed and the other starts go on.
+    in_flight = asyncio.Semaphore(concurrency)
+    pending = set()
+
+    async def start(workflow_id, wf_input):
+        try:
+            return await start_workflow_with_backoff(client, workflow_id, wf_input, max_attempts,
+                                                     pre_approved=pre_approved)
+        except Exception as e:
+            if on_start_failed:
+                on_start_failed(workflow_id, e)
+            else:
+                print("Workflow start failed:", workflow_id, e)
+            return None
+        finally:
+            in_flight.release()
+
+    try:
+        for workflow_id, wf_input in workflow_inputs:
+            await in_flight.acquire()
+            pending.add(asyncio.create_task(start(workflow_id, wf_input)))
+
+            done = {task for task in pending if task.done()}
+            pending -= done
+            for task in done:
+                if task.result():
+                    yield task.result()
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result():
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def workflow_id_for(i: int) -> str:
+    return "my-business-id-SystemPatchWorkflow_" + str(i)
+
+
+async def start_workflow(client, i, options: WorkflowRunOptions, signal_delay: float = 3,
+                         stats: Optional[LoadStats] = None):
+    stats = stats or LoadStats()
+
+    started = time.perf_counter()
+    workflow_handle = await start_workflow_with_backoff(
+        client,
+        workflow_id_for(i),
+        options.wf_input,
+        pre_approved=options.pre_approved,
     )
+    stats.start_latencies.append(time.perf_counter() - started)
+
+    await follow_workflow(workflow_handle, options, signal_delay, stats, started)
 
-    # asyncio.create_task(query_workflow(workflow_handle))
+
+async def follow_workflow(workflow_handle: WorkflowHandle, options: WorkflowRunOptions, signal_delay: float,
+                          stats: LoadStats, started: float):
+    # approves the started workflow and waits for its result, started is the time the start was requested
+    if options.progress:
+        options.progress.subscribe(workflow_handle.id, print_progress, workflow_handle.result_run_id)
 
     print("Workflow started with workflow_id:", workflow_handle.id)
 
-    await asyncio.sleep(3)
-    await workflow_handle.signal(SystemPatchWorkflow.approve_request)
+    if not options.pre_approved:
+        await asyncio.sleep(signal_delay)
+        await workflow_handle.signal(SystemPatchWorkflow.approve_request)
+
+    try:
+        print("Result:", await workflow_handle.result())
+        stats.completion_latencies.append(time.perf_counter() - started)
+    except Exception as e:
+        print("Workflow failed with workflow_id:", workflow_handle.id, e)
+        stats.failures += 1
+
+
+async def generate_load(client: Client, options: WorkflowRunOptions, count: int, rate: float, concurrency: int,
+                        ramp_up_seconds: float, signal_delay: Callable[[], float]) -> LoadStats:
+    stats = LoadStats()
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async def run_workflow(i):
+        try:
+            await start_workflow(client, i, options, signal_delay(), stats)
+        except Exception as e:
+            print("Workflow start failed:", i, e)
+            stats.failures += 1
+        finally:
+            in_flight.release()
+
+    tasks = []
+    load_started = time.perf_counter()
+    next_start = 0.0
+    for i in range(count):
+        # wait for the next start slot of the target rate
+        await asyncio.sleep(max(0.0, next_start - (time.perf_counter() - load_started)))
+        next_start += 1 / current_rate(rate, ramp_up_seconds, next_start)
+
+        # don't start more workflows while `concurrency` workflows are running
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(run_workflow(i)))
+
+    await asyncio.gather(*tasks)
+    report(stats, count, time.perf_counter() - load_started)
+    return stats
+
+
+async def bulk_load(client: Client, options: WorkflowRunOptions, count: int, concurrency: int,
+                    signal_delay: Callable[[], float]) -> LoadStats:
+    # Starts the `count` workflows as fast as the server accepts them, with `concurrency` start requests in flight
+    # (see bulk_start_workflows). The start latency includes the wait for a start request slot.
+    stats = LoadStats()
+    # workflow id -> time the start was requested
+    requested = {}
+
+    def workflow_inputs():
+        for i in range(count):
+            requested[workflow_id_for(i)] = time.perf_counter()
+            yield workflow_id_for(i), options.wf_input
+
+    def on_start_failed(workflow_id: str, e: Exception) -> None:
+        print("Workflow start failed:", workflow_id, e)
+        stats.failures += 1
 
-    print("Result:", await workflow_handle.result())
+    async def run_workflow(workflow_handle: WorkflowHandle):
+        started = requested.pop(workflow_handle.id)
+        stats.start_latencies.append(time.perf_counter() - started)
+        try:
+            await follow_workflow(workflow_handle, options, signal_delay(), stats, started)
+        except Exception as e:
+            print("Workflow failed with workflow_id:", workflow_handle.id, e)
+            stats.failures += 1
 
+    tasks = []
+    load_started = time.perf_counter()
+    async for workflow_handle in bulk_start_workflows(client, workflow_inputs(), concurrency,
+                                                      pre_approved=options.pre_approved,
+                                                      on_start_failed=on_start_failed):
+        tasks.append(asyncio.create_task(run_workflow(workflow_handle)))
+
+    await asyncio.gather(*tasks)
+    report(stats, count, time.perf_counter() - load_started)
+    return stats
+
+
+def print_progress(workflow_id: str, completed_steps: List[str], status: WorkflowExecutionStatus) -> None:
+    print("Workflow", workflow_id, status.name, "completed steps:", completed_steps)
+
+
+def report(stats: LoadStats, count: int, elapsed: float) -> None:
+    print()
+    print(f"workflows: {count}, completed: {len(stats.completion_latencies)}, failed: {stats.failures}, "
+          f"elapsed: {elapsed:.2f}s")
+    for name, latencies in [("start latency", stats.start_latencies),
+                            ("completion latency", stats.completion_latencies)]:
+        print(f"{name:<20} p50={percentile(latencies, 50):.3f}s p90={percentile(latencies, 90):.3f}s "
+              f"p99={percentile(latencies, 99):.3f}s max={percentile(latencies, 100):.3f}s")
+    print(f"throughput: {len(stats.completion_latencies) / elapsed:.2f} workflows/s")
+
+
+def workflow_input(args) -> SystemPatchWorkflowInput:
+    # the workflow options of the command line, a new option only has to be added here
+    return SystemPatchWorkflowInput(
+        targetClusters=["cluster1", "cluster2", "cluster3"],
+        pilotHostCount=3,
+        publishProgress=args.watch_progress,
+        activityTaskQueues=ACTIVITY_TASK_QUEUES if args.activity_task_queues else {},
+        waveSizes=args.wave_sizes,
+        waveSuccessThresholds=args.wave_success_thresholds,
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="SystemPatchWorkflow load generator")
+    parser.add_argument("--count", type=parse_positive_int, default=4, help="total number of workflows to start")
+    parser.add_argument("--rate", type=parse_positive_float, default=4, help="target workflow starts per second")
+    parser.add_argument("--concurrency", type=parse_positive_int, default=100,
+                        help="max number of workflows running at a time, or of start requests with --bulk-start")
+    parser.add_argument("--bulk-start", action="store_true",
+                        help="start the workflows as fast as the server accepts them (RESOURCE_EXHAUSTED is retried "
+                             "with backoff), --rate and --ramp-up are ignored")
+    parser.add_argument("--ramp-up", type=float, default=0,
+                        help="seconds to ramp up linearly from 10%% to 100%% of the target rate")
+    parser.add_argument("--signal-delay", type=parse_delay_distribution, default="fixed:3",
+                        help="delay before sending the approval: fixed:<s>, uniform:<min>:<max> or exponential:<mean>")
+    parser.add_argument("--pre-approved", action="store_true",
+                        help="send the approval with the start request (signal-with-start), --signal-delay is ignored")
+    parser.add_argument("--watch-progress", action="store_true",
+                        help="print the completed steps of the workflows, requires the PatchCompletedSteps "
+                             "search attribute (see sh_start_server.sh)")
+    parser.add_argument("--activity-task-queues", action="store_true",
+                        help="run the slow and fast activities in their own task queues "
+                             "(see src/workflow/task_queues.py), start the workers with --activity-task-queues too")
+    parser.add_argument("--wave-sizes", type=parse_wave_sizes, default=[],
+                        help="hosts of each rollout wave per cluster, e.g. 1,5,25 (the remaining hosts are the last "
+                             "wave), by default the pilot hosts then the rest")
+    parser.add_argument("--wave-success-thresholds", type=parse_wave_success_thresholds, default=[],
+                        help="percentage of the hosts of each wave that have to be patched to start the next one, "
+                             "e.g. 100,100,90,90 (the last one for the remaining hosts), 100 when not set")
+    parser.add_argument("--trace-file",
+                        help="append the latency spans of the workflows to this file, the workers have to trace to the "
+                             "same file (see src/tracing.py)")
+    return parser.parse_args(argv)
 
 
 async def main():
+    args = parse_args()
+
     runtime = init_runtime_with_prometheus(8085)
     # Connect client
     client = await Client.connect(
         "localhost:7233",
         runtime=runtime,
+        # TEMPORAL_PAYLOAD_CONVERTER and TEMPORAL_PAYLOAD_COMPRESSION select the payload encoding
+        data_converter=data_converter_from_env(),
+        interceptors=[LatencyTracingInterceptor(FileSpanExporter(args.trace_file))] if args.trace_file else [],
     )
 
-    tasks = [asyncio.create_task(
-        start_workflow(client, i)
-    ) for i in range(1,5)]
-    
+    progress = ProgressSubscriber(client) if args.watch_progress else None
+    options = WorkflowRunOptions(workflow_input(args), args.pre_approved, progress)
 
-    await asyncio.gather(*tasks)
+    if args.bulk_start:
+        await bulk_load(client, options, args.count, args.concurrency, args.signal_delay)
+    else:
+        await generate_load(client, options, args.count, args.rate, args.concurrency, args.ramp_up,
+                            args.signal_delay)
+
+    if progress:
+        await progress.close()
 
 
 if __name__ == "__main__":
     asyncio.run(main())
-
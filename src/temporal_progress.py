@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from temporalio.client import Client, WorkflowExecution, WorkflowExecutionStatus
+from temporalio.service import RPCError
+
+from src.workflow.search_attributes import PATCH_COMPLETED_STEPS
+
+ProgressCallback = Callable[[str, List[str], WorkflowExecutionStatus], None]
+
+
+class ProgressSubscriber:
+    # Follows the progress of many SystemPatchWorkflow_V7 executions (started with publishProgress=True)
+    # from a single loop. Every `interval` seconds it lists the subscribed workflows from the visibility store
+    # and calls the callback of the workflows whose completed steps changed.
+    #
+    # Unlike querying `get_completed_steps` per workflow, the list requests are served by the server
+    # and don't need the workers to load or replay the workflows.
+    # Note that visibility is eventually consistent, the progress can be reported with a small delay.
+    # When a list request fails the poll is retried with exponential backoff, up to `max_backoff` seconds.
+
+    def __init__(self, client: Client, interval: float = 3, max_ids_per_request: int = 100,
+                 max_backoff: float = 60) -> None:
+        self.client = client
+        self.interval = interval
+        self.max_ids_per_request = max_ids_per_request
+        self.max_backoff = max_backoff
+
+        self.callbacks: Dict[str, ProgressCallback] = {}
+        self.run_ids: Dict[str, Optional[str]] = {}
+        self.completed_steps: Dict[str, List[str]] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self, workflow_id: str, callback: ProgressCallback, run_id: Optional[str] = None) -> None:
+        # if run_id is set the other runs of the workflow id (e.g. previous executions) are ignored
+        self.callbacks[workflow_id] = callback
+        self.run_ids[workflow_id] = run_id
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, workflow_id: str) -> None:
+        self.callbacks.pop(workflow_id, None)
+        self.run_ids.pop(workflow_id, None)
+        self.completed_steps.pop(workflow_id, None)
+
+    async def close(self) -> None:
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        failures = 0
+        while self.callbacks:
+            workflow_ids = list(self.callbacks)
+            try:
+                for i in range(0, len(workflow_ids), self.max_ids_per_request):
+                    await self._poll(workflow_ids[i:i + self.max_ids_per_request])
+                failures = 0
+            except RPCError as e:
+                failures += 1
+                logging.warning("Listing the workflow progress failed %s times in a row, retrying: %s", failures, e)
+            await asyncio.sleep(min(self.max_backoff, self.interval * 2 ** failures))
+
+    async def _poll(self, workflow_ids: List[str]) -> None:
+        query = "WorkflowId IN (" + ", ".join("'" + workflow_id + "'" for workflow_id in workflow_ids) + ")"
+        async for execution in self.client.list_workflows(query):
+            self._notify(execution)
+
+    def _notify(self, execution: WorkflowExecution) -> None:
+        callback = self.callbacks.get(execution.id)
+        if callback is None:
+            return
+
+        run_id = self.run_ids.get(execution.id)
+        if run_id and run_id != execution.run_id:
+            return
+
+        completed_steps = list(execution.typed_search_attributes.get(PATCH_COMPLETED_STEPS) or [])
+        running = execution.status == WorkflowExecutionStatus.RUNNING
+        if completed_steps != self.completed_steps.get(execution.id) or not running:
+            self.completed_steps[execution.id] = completed_steps
+            callback(execution.id, completed_steps, execution.status)
+
+        if not running:
+            # the workflow is closed, there won't be more progress
+            self.unsubscribe(execution.id)
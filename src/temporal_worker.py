@@ -1,12 +1,15 @@
+import argparse
 import asyncio
 import logging
 
 from temporalio.client import Client
 from temporalio.worker import Worker
 
-#from src.workflow.activities import activities
+from src.worker_shutdown import graceful_shutdown_timeout, shutdown_on_sigterm
+# from src.workflow.activities import activities
 # from src.workflow.activities_v4 import activities
-from src.workflow.activities import activities
+# the batch activities of SystemPatchWorkflow_HostBatch_V7 are only in activities_v7
+from src.workflow.activities_v7 import activities
 from src.workflow.system_patch_workflow_v1 import SystemPatchWorkflow_V1
 from src.workflow.system_patch_workflow_v2 import SystemPatchWorkflow_V2
 from src.workflow.system_patch_workflow_v3 import SystemPatchWorkflow_V3
@@ -15,8 +18,10 @@ from src.workflow.system_patch_workflow_v5 import SystemPatchWorkflow_V5
 from src.workflow.system_patch_workflow_v6 import SystemPatchWorkflow_V6, SystemPatchWorkflow_Cluster_V6, \
     SystemPatchWorkflow_Host_V6
 from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_Host_V7, SystemPatchWorkflow_Cluster_V7, \
-    SystemPatchWorkflow_V7
-from src.workflow.types import MyVaultClient
+    SystemPatchWorkflow_V7, SystemPatchWorkflow_HostBatch_V7
+from src.workflow.task_queues import activities_for_task_queue, fast_activities_queue, slow_activities_queue
+from src.workflow.sandbox import workflow_runner
+from src.workflow.vault_client import MyVaultClient
 
 queue = "system_patch-task-queue"
 
@@ -32,10 +37,20 @@ workflows = [
     SystemPatchWorkflow_V7,
     SystemPatchWorkflow_Cluster_V7,
     SystemPatchWorkflow_Host_V7,
+    SystemPatchWorkflow_HostBatch_V7,
 ]
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="SystemPatchWorkflow worker")
+    parser.add_argument("--activity-task-queues", action="store_true",
+                        help="also run a worker for each activity task queue, for the workflows started with "
+                             "src.temporal_client_v8 --activity-task-queues (see src/workflow/task_queues.py)")
+    return parser.parse_args()
+
+
 async def main():
+    args = parse_args()
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(name)s  - %(message)s"
@@ -43,16 +58,42 @@ async def main():
 
     client = await Client.connect("localhost:7233")
 
+    all_activities = activities(MyVaultClient())
+
     # Run a worker for the workflow
     worker = Worker(
         client,
         task_queue=queue,
         workflows=workflows,
-        activities=activities(MyVaultClient())
+        activities=all_activities,
+        # the types and activity definitions are not re-imported in the sandbox of every workflow run
+        workflow_runner=workflow_runner(),
+        graceful_shutdown_timeout=graceful_shutdown_timeout,
     )
 
+    workers = [worker]
+
+    # and a worker per activity task queue used by SystemPatchWorkflow_V7 (SystemPatchWorkflowInput.activityTaskQueues)
+    if args.activity_task_queues:
+        slow_activities_worker = Worker(
+            client,
+            task_queue=slow_activities_queue,
+            activities=activities_for_task_queue(all_activities, slow_activities_queue),
+            max_concurrent_activities=20,
+            graceful_shutdown_timeout=graceful_shutdown_timeout,
+        )
+        fast_activities_worker = Worker(
+            client,
+            task_queue=fast_activities_queue,
+            activities=activities_for_task_queue(all_activities, fast_activities_queue),
+            graceful_shutdown_timeout=graceful_shutdown_timeout,
+        )
+        workers += [slow_activities_worker, fast_activities_worker]
+
+    shutdown_on_sigterm(workers)
+
     logging.info("Starting worker")
-    await worker.run()
+    await asyncio.gather(*[w.run() for w in workers])
 
 
 if __name__ == "__main__":
@@ -1,16 +1,26 @@
+import argparse
 import asyncio
 import logging
+from datetime import timedelta
 
 from temporalio.client import Client
 from temporalio.runtime import Runtime, TelemetryConfig, PrometheusConfig
 from temporalio.worker import Worker
 
+from src.converter import data_converter_from_env
+from src.tracing import FileSpanExporter, LatencyTracingInterceptor
+from src.worker_shutdown import graceful_shutdown_timeout, shutdown_on_sigterm
+from src.worker_tuning import LatencyFeedbackSlotSupplier, ScheduleToStartLatencyInterceptor, \
+    latency_feedback_tuner, resource_based_tuner
 # from src.workflow.activities import activities
 # from src.workflow.activities_v4 import activities
-from src.workflow.activities import activities
+from src.workflow.activities_v7 import activities
+from src.workflow.metrics import HISTOGRAM_BUCKETS, PatchMetricsInterceptor
 from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_Host_V7, SystemPatchWorkflow_Cluster_V7, \
-    SystemPatchWorkflow_V7
-from src.workflow.types import MyVaultClient
+    SystemPatchWorkflow_V7, SystemPatchWorkflow_HostBatch_V7
+from src.workflow.task_queues import activities_for_task_queue, fast_activities_queue, slow_activities_queue
+from src.workflow.sandbox import workflow_runner
+from src.workflow.vault_client import MyVaultClient
 
 queue = "system_patch-task-queue"
 
@@ -18,6 +28,7 @@ workflows = [
     SystemPatchWorkflow_V7,
     SystemPatchWorkflow_Cluster_V7,
     SystemPatchWorkflow_Host_V7,
+    SystemPatchWorkflow_HostBatch_V7,
 ]
 
 
@@ -27,38 +38,125 @@ def init_runtime_with_prometheus(port: int) -> Runtime:
         telemetry=TelemetryConfig(
             metrics=PrometheusConfig(
                 bind_address=f"127.0.0.1:{port}",
+                # buckets of the patch step latency histograms, see src/workflow/metrics.py
+                histogram_bucket_overrides=HISTOGRAM_BUCKETS,
             )
         )
     )
 
 
+def activity_slot_options(args, runtime: Runtime, task_queue: str, max_concurrent_activities: int,
+                          maximum_activity_slots: int):
+    # (slot options, interceptors, latency feedback slot supplier) of the worker of task_queue: fixed slots
+    # (max_concurrent_activities) or a tuner between --min-activity-slots and maximum_activity_slots.
+    # The tuner replaces max_concurrent_activities and max_concurrent_workflow_tasks, they can't be set together.
+    if args.tuner == "resource":
+        return dict(tuner=resource_based_tuner(args.min_activity_slots, maximum_activity_slots)), [], None
+    if args.tuner == "latency":
+        slot_supplier = LatencyFeedbackSlotSupplier(
+            args.min_activity_slots, maximum_activity_slots,
+            metric_meter=runtime.metric_meter.with_additional_attributes({"task_queue": task_queue}))
+        return dict(tuner=latency_feedback_tuner(slot_supplier)), [ScheduleToStartLatencyInterceptor(slot_supplier)], \
+            slot_supplier
+    return dict(max_concurrent_activities=max_concurrent_activities, max_concurrent_workflow_tasks=100), [], None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SystemPatchWorkflow worker")
+    parser.add_argument("--tuner", choices=["fixed", "resource", "latency"], default="fixed",
+                        help="activity slots: fixed (max_concurrent_activities), resource (host CPU and memory usage) "
+                             "or latency (schedule-to-start latency and host usage), see src/worker_tuning.py")
+    parser.add_argument("--min-activity-slots", type=int, default=5, help="min activity slots of the tuners")
+    parser.add_argument("--max-activity-slots", type=int, default=100, help="max activity slots of the tuners")
+    parser.add_argument("--prometheus-port", type=int, default=8086,
+                        help="port of the prometheus endpoint, set by src/worker_launcher.py for each process")
+    parser.add_argument("--graceful-shutdown-timeout", type=float,
+                        default=graceful_shutdown_timeout.total_seconds(),
+                        help="seconds the running activities have to complete after SIGTERM before being cancelled")
+    parser.add_argument("--activity-task-queues", action="store_true",
+                        help="also run a worker for each activity task queue, for the workflows started with "
+                             "src.temporal_client_v8 --activity-task-queues (see src/workflow/task_queues.py)")
+    parser.add_argument("--slow-activity-slots", type=int, default=20,
+                        help="max concurrent activities of the slow activities task queue worker (max activity slots "
+                             "of its tuner)")
+    parser.add_argument("--fast-activity-slots", type=int, default=100,
+                        help="max concurrent activities of the fast activities task queue worker (max activity slots "
+                             "of its tuner)")
+    parser.add_argument("--trace-file",
+                        help="append the latency spans of the workflows and activities to this file "
+                             "(see src/tracing.py)")
+    return parser.parse_args()
+
+
 async def main():
+    args = parse_args()
+
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(name)s  - %(message)s"
     )
 
-    runtime = init_runtime_with_prometheus(8086)
+    runtime = init_runtime_with_prometheus(args.prometheus_port)
 
     client = await Client.connect(
         "localhost:7233",
-        runtime=runtime)
+        runtime=runtime,
+        # TEMPORAL_PAYLOAD_CONVERTER and TEMPORAL_PAYLOAD_COMPRESSION select the payload encoding
+        data_converter=data_converter_from_env())
+
+    # interceptors of all the workers, each worker adds the one of its latency tuner
+    common_interceptors = [PatchMetricsInterceptor()]
+    if args.trace_file:
+        common_interceptors.append(LatencyTracingInterceptor(FileSpanExporter(args.trace_file)))
+
+    all_activities = activities(MyVaultClient(metric_meter=runtime.metric_meter))
 
     # Run a worker for the workflow
+    slot_options, interceptors, slot_supplier = activity_slot_options(
+        args, runtime, queue, max_concurrent_activities=5, maximum_activity_slots=args.max_activity_slots)
     worker = Worker(
         client,
         task_queue=queue,
         workflows=workflows,
-        activities=activities(MyVaultClient()),
-        max_concurrent_activities=5,  # default 100
-        max_concurrent_workflow_tasks=100,  # default 100
+        activities=all_activities,
+        # the types and activity definitions are not re-imported in the sandbox of every workflow run
+        workflow_runner=workflow_runner(),
+        interceptors=common_interceptors + interceptors,
         max_cached_workflows=1000,  # default 1000
         max_concurrent_workflow_task_polls=5,  # default 5
         max_concurrent_activity_task_polls=5,  # default 5
+        graceful_shutdown_timeout=timedelta(seconds=args.graceful_shutdown_timeout),
+        **slot_options,
     )
+    workers = [worker]
+    slot_suppliers = [slot_supplier]
+
+    # A worker pool per activity task queue (SystemPatchWorkflowInput.activityTaskQueues), the slow activities
+    # can't take the slots of the fast ones
+    activity_task_queues = [(slow_activities_queue, args.slow_activity_slots),
+                            (fast_activities_queue, args.fast_activity_slots)] if args.activity_task_queues else []
+    for task_queue, activity_slots in activity_task_queues:
+        slot_options, interceptors, slot_supplier = activity_slot_options(
+            args, runtime, task_queue, max_concurrent_activities=activity_slots, maximum_activity_slots=activity_slots)
+        workers.append(Worker(
+            client,
+            task_queue=task_queue,
+            activities=activities_for_task_queue(all_activities, task_queue),
+            interceptors=common_interceptors + interceptors,
+            graceful_shutdown_timeout=timedelta(seconds=args.graceful_shutdown_timeout),
+            **slot_options,
+        ))
+        slot_suppliers.append(slot_supplier)
+
+    shutdown_on_sigterm(workers)
 
-    logging.info("Starting worker")
-    await worker.run()
+    logging.info("Starting worker, tuner: %s", args.tuner)
+    adjust_tasks = [asyncio.create_task(supplier.run()) for supplier in slot_suppliers if supplier]
+    try:
+        await asyncio.gather(*[w.run() for w in workers])
+    finally:
+        for adjust_task in adjust_tasks:
+            adjust_task.cancel()
 
 
 if __name__ == "__main__":
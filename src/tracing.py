@@ -0,0 +1,325 @@
+import dataclasses
+import json
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Type
+
+import temporalio.client
+import temporalio.converter
+import temporalio.worker
+from temporalio import activity, workflow
+from temporalio.api.common.v1 import Payload
+from temporalio.client import OutboundInterceptor, StartWorkflowInput, WorkflowHandle
+from temporalio.worker import ActivityInboundInterceptor, ContinueAsNewInput, ExecuteActivityInput, \
+    ExecuteWorkflowInput, StartActivityInput, StartChildWorkflowInput, StartLocalActivityInput, \
+    WorkflowInboundInterceptor, WorkflowInterceptorClassInput, WorkflowOutboundInterceptor
+
+# Latency tracing of a workflow run, from the client start request to the completion of the last host child workflow.
+#
+# LatencyTracingInterceptor is a client and a worker interceptor, the trace context (trace id, parent span and the time
+# a workflow start was requested) is propagated in the `latency-trace` header of the workflows and activities.
+# Spans, all the times are epoch seconds:
+# - StartWorkflowRequest:<workflow>  client, round trip of the start request
+# - StartWorkflow:<workflow>         start requested (client or parent workflow) -> workflow execution started
+# - RunWorkflow:<workflow>           workflow execution started -> workflow completed (or continued as new)
+# - FirstWorkflowTask:<workflow>     workflow execution started -> first workflow task started, the task queue wait
+# - ScheduleToStart:<activity>       activity attempt scheduled -> started, the activity task queue wait
+# - RunActivity:<activity>           activity attempt started -> completed
+#
+# The workflow spans are exported when the workflow completes, not when it is replayed. The times of the workflow
+# spans come from the server (the workflow clock), the times of the activity and client spans from the processes that
+# run them.
+#
+# The spans are exported to memory (tests) or appended to a JSON lines file, shared by the client and the workers,
+# `python3 -m src.bench.trace_report --spans <file>` prints the critical path of a run and its top latency contributors.
+
+HEADER = "latency-trace"
+
+
+@dataclass
+class Span:
+    traceId: str
+    spanId: str
+    parentId: Optional[str]
+    name: str
+    startTime: float
+    endTime: float
+    attributes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.endTime - self.startTime
+
+
+class InMemorySpanExporter:
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+class FileSpanExporter:
+    # one span per line, appended, the client and the worker processes can share the file
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, span: Span) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(dataclasses.asdict(span)) + "\n")
+
+
+def read_spans(path: str) -> List[Span]:
+    with open(path) as f:
+        return [Span(**json.loads(line)) for line in f if line.strip()]
+
+
+def _encode_context(context: Dict[str, Any]) -> Payload:
+    return temporalio.converter.default().payload_converter.to_payload(context)
+
+
+def _decode_context(headers: Mapping[str, Payload]) -> Dict[str, Any]:
+    payload = headers.get(HEADER)
+    if payload is None:
+        return {}
+    return temporalio.converter.default().payload_converter.from_payload(payload, dict)
+
+
+class LatencyTracingInterceptor(temporalio.client.Interceptor, temporalio.worker.Interceptor):
+
+    def __init__(self, exporter) -> None:
+        self.exporter = exporter
+
+    def intercept_client(self, next: OutboundInterceptor) -> OutboundInterceptor:
+        return _LatencyTracingClientOutboundInterceptor(next, self.exporter)
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _LatencyTracingActivityInboundInterceptor(next, self.exporter)
+
+    def workflow_interceptor_class(self, input: WorkflowInterceptorClassInput) -> Type[WorkflowInboundInterceptor]:
+        exporter = self.exporter
+
+        # the worker creates the workflow interceptors from their class, in the sandbox of each workflow run
+        class _WorkflowInboundInterceptor(_LatencyTracingWorkflowInboundInterceptor):
+            def __init__(self, next: WorkflowInboundInterceptor) -> None:
+                super().__init__(next, exporter)
+
+        return _WorkflowInboundInterceptor
+
+
+class _LatencyTracingClientOutboundInterceptor(OutboundInterceptor):
+    def __init__(self, next: OutboundInterceptor, exporter) -> None:
+        super().__init__(next)
+        self.exporter = exporter
+
+    async def start_workflow(self, input: StartWorkflowInput) -> WorkflowHandle:
+        trace_id = str(uuid.uuid4())
+        started = time.time()
+        input.headers = {**input.headers, HEADER: _encode_context({"traceId": trace_id, "scheduledTime": started})}
+        handle = await super().start_workflow(input)
+        self.exporter.export(Span(
+            traceId=trace_id,
+            spanId=str(uuid.uuid4()),
+            parentId=None,
+            name="StartWorkflowRequest:" + input.workflow,
+            startTime=started,
+            endTime=time.time(),
+            attributes={"workflowId": input.id},
+        ))
+        return handle
+
+
+class _LatencyTracingActivityInboundInterceptor(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, exporter) -> None:
+        super().__init__(next)
+        self.exporter = exporter
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        context = _decode_context(input.headers)
+        if not context:
+            return await super().execute_activity(input)
+
+        info = activity.info()
+        attributes = {"workflowId": info.workflow_id, "attempt": str(info.attempt)}
+        if not info.is_local:
+            # local activities don't wait in a task queue
+            self.exporter.export(Span(
+                traceId=context["traceId"],
+                spanId=str(uuid.uuid4()),
+                parentId=context["parentId"],
+                name="ScheduleToStart:" + info.activity_type,
+                startTime=info.current_attempt_scheduled_time.timestamp(),
+                endTime=info.started_time.timestamp(),
+                attributes=attributes,
+            ))
+
+        started = time.time() if info.is_local else info.started_time.timestamp()
+        try:
+            return await super().execute_activity(input)
+        except BaseException as e:
+            attributes = {**attributes, "error": type(e).__name__}
+            raise
+        finally:
+            self.exporter.export(Span(
+                traceId=context["traceId"],
+                spanId=str(uuid.uuid4()),
+                parentId=context["parentId"],
+                name="RunActivity:" + info.activity_type,
+                startTime=started,
+                endTime=time.time(),
+                attributes=attributes,
+            ))
+
+
+class _LatencyTracingWorkflowInboundInterceptor(WorkflowInboundInterceptor):
+    def __init__(self, next: WorkflowInboundInterceptor, exporter) -> None:
+        super().__init__(next)
+        self.exporter = exporter
+        # context of the spans of this workflow run, set by execute_workflow
+        self.context: Dict[str, Any] = {}
+
+    def init(self, outbound: WorkflowOutboundInterceptor) -> None:
+        super().init(_LatencyTracingWorkflowOutboundInterceptor(outbound, self))
+
+    async def execute_workflow(self, input: ExecuteWorkflowInput) -> Any:
+        info = workflow.info()
+        context = _decode_context(input.headers)
+        # the ids have to be the same when the workflow is replayed, they are sent in the headers of its commands
+        self.context = {
+            "traceId": context.get("traceId", info.workflow_id),
+            "parentId": context.get("parentId"),
+            "spanId": info.run_id,
+        }
+
+        try:
+            result = await super().execute_workflow(input)
+        except workflow.ContinueAsNewError:
+            self._export_spans(context, None)
+            raise
+        except Exception as e:
+            # not BaseException, the eviction of a cached workflow must not export the spans
+            self._export_spans(context, type(e).__name__)
+            raise
+
+        self._export_spans(context, None)
+        return result
+
+    def _export_spans(self, context: Dict[str, Any], error: Optional[str]) -> None:
+        if workflow.unsafe.is_replaying():
+            return
+
+        info = workflow.info()
+        execution_started = info.workflow_start_time.timestamp()
+        attributes = {"workflowId": info.workflow_id, "runId": info.run_id}
+        spans = [
+            Span(
+                traceId=self.context["traceId"],
+                spanId=info.run_id,
+                parentId=self.context["parentId"],
+                name="RunWorkflow:" + info.workflow_type,
+                startTime=execution_started,
+                endTime=workflow.now().timestamp(),
+                attributes={**attributes, "error": error} if error else attributes,
+            ),
+            Span(
+                traceId=self.context["traceId"],
+                spanId=info.run_id + ":first-workflow-task",
+                parentId=info.run_id,
+                name="FirstWorkflowTask:" + info.workflow_type,
+                startTime=execution_started,
+                endTime=info.start_time.timestamp(),
+                attributes=attributes,
+            ),
+        ]
+        if "scheduledTime" in context:
+            spans.append(Span(
+                traceId=self.context["traceId"],
+                spanId=info.run_id + ":start",
+                parentId=self.context["parentId"],
+                name="StartWorkflow:" + info.workflow_type,
+                startTime=context["scheduledTime"],
+                endTime=execution_started,
+                attributes=attributes,
+            ))
+
+        # the exporters write files, which the sandbox doesn't allow in workflow code
+        with workflow.unsafe.sandbox_unrestricted():
+            for span in spans:
+                self.exporter.export(span)
+
+
+class _LatencyTracingWorkflowOutboundInterceptor(WorkflowOutboundInterceptor):
+    def __init__(self, next: WorkflowOutboundInterceptor, inbound: _LatencyTracingWorkflowInboundInterceptor) -> None:
+        super().__init__(next)
+        self.inbound = inbound
+
+    def _child_context(self) -> Dict[str, Any]:
+        return {"traceId": self.inbound.context["traceId"], "parentId": self.inbound.context["spanId"]}
+
+    def start_activity(self, input: StartActivityInput) -> workflow.ActivityHandle:
+        input.headers = {**input.headers, HEADER: _encode_context(self._child_context())}
+        return super().start_activity(input)
+
+    def start_local_activity(self, input: StartLocalActivityInput) -> workflow.ActivityHandle:
+        input.headers = {**input.headers, HEADER: _encode_context(self._child_context())}
+        return super().start_local_activity(input)
+
+    async def start_child_workflow(self, input: StartChildWorkflowInput) -> workflow.ChildWorkflowHandle:
+        context = {**self._child_context(), "scheduledTime": workflow.now().timestamp()}
+        input.headers = {**input.headers, HEADER: _encode_context(context)}
+        return await super().start_child_workflow(input)
+
+    def continue_as_new(self, input: ContinueAsNewInput):
+        # the next run is a sibling of this one, under the same parent
+        context = {"traceId": self.inbound.context["traceId"], "parentId": self.inbound.context["parentId"]}
+        input.headers = {**input.headers, HEADER: _encode_context(context)}
+        return super().continue_as_new(input)
+
+
+@dataclass
+class CriticalPathStep:
+    span: Span
+    depth: int
+    # seconds of the span that are not covered by its steps on the critical path
+    selfTime: float
+
+
+def critical_path(spans: List[Span]) -> List[CriticalPathStep]:
+    # spans of one trace, the spans without a parent in the trace are the top level spans
+    span_ids = {span.spanId for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        children[span.parentId if span.parentId in span_ids else None].append(span)
+
+    path: List[CriticalPathStep] = []
+
+    def add_steps(siblings: List[Span], end: float, depth: int) -> float:
+        # walking back from the end: the span that ends last, then the span that ends last before it started...
+        chain = []
+        for span in sorted(siblings, key=lambda s: s.endTime, reverse=True):
+            if span.endTime <= end:
+                chain.append(span)
+                end = span.startTime
+
+        covered = 0.0
+        for span in reversed(chain):
+            step = CriticalPathStep(span=span, depth=depth, selfTime=span.duration)
+            path.append(step)
+            # the clocks of the workers and the server differ, a span can seem to start before its parent
+            step.selfTime = max(0.0, step.selfTime - add_steps(children[span.spanId], span.endTime, depth + 1))
+            covered += span.duration
+        return covered
+
+    add_steps(children[None], max(span.endTime for span in spans), 0)
+    return path
+
+
+def top_contributors(path: List[CriticalPathStep], count: int = 10) -> List[Tuple[str, float]]:
+    # (span name, seconds on the critical path), activities and child workflows are grouped by type
+    contributors = defaultdict(float)
+    for step in path:
+        contributors[step.span.name] += step.selfTime
+    return sorted(contributors.items(), key=lambda item: item[1], reverse=True)[:count]
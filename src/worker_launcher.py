@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from typing import List, Optional
+
+# Runs `--processes` worker processes on the same task queue, workflow tasks (sandbox and replay) are CPU bound
+# and one process only uses one core. Process i exports its metrics on `--prometheus-port` + i.
+#
+#   python3 -m src.worker_launcher --processes 4
+#
+# - SIGHUP restarts the processes one at a time (rolling restart, see sh_restart_worker.sh). Each process is stopped
+#   with SIGTERM and drains its in-flight tasks (src/worker_shutdown.py) while the other processes keep polling, the
+#   next one is restarted once the new process is up. The launcher only sends the signals, the drain is the worker's.
+# - SIGTERM/SIGINT stop all the processes.
+# - A process that exits on its own is started again.
+
+
+class WorkerProcess:
+    def __init__(self, index: int, module: str, prometheus_port: int, worker_args: List[str]) -> None:
+        self.index = index
+        self.module = module
+        self.prometheus_port = prometheus_port
+        self.worker_args = worker_args
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.stopping = False
+
+    async def start(self, ready_timeout: float) -> None:
+        self.stopping = False
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", self.module, "--prometheus-port", str(self.prometheus_port), *self.worker_args)
+        logging.info("Started worker %s (pid %s, prometheus port %s)", self.index, self.process.pid,
+                     self.prometheus_port)
+        await self._wait_ready(ready_timeout)
+
+    async def stop(self, drain_timeout: float) -> None:
+        if self.process is None or self.process.returncode is not None:
+            return
+
+        self.stopping = True
+        logging.info("Stopping worker %s (pid %s)", self.index, self.process.pid)
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self.process.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Worker %s didn't stop after %ss, killing it", self.index, drain_timeout)
+            self.process.kill()
+            await self.process.wait()
+
+    async def _wait_ready(self, timeout: float) -> None:
+        # the prometheus endpoint is served once the worker runtime is created
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline and self.process.returncode is None:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", self.prometheus_port)
+                writer.close()
+                return
+            except OSError:
+                await asyncio.sleep(0.2)
+        logging.warning("Worker %s not ready after %ss", self.index, timeout)
+
+
+class WorkerLauncher:
+    def __init__(self, processes: int, module: str, prometheus_port: int, worker_args: List[str],
+                 drain_timeout: float = 60, ready_timeout: float = 30) -> None:
+        self.workers = [WorkerProcess(i, module, prometheus_port + i, worker_args) for i in range(processes)]
+        self.drain_timeout = drain_timeout
+        self.ready_timeout = ready_timeout
+        self.restart_lock = asyncio.Lock()
+        self.stopped = asyncio.Event()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.create_task(self.rolling_restart()))
+        loop.add_signal_handler(signal.SIGTERM, self.stopped.set)
+        loop.add_signal_handler(signal.SIGINT, self.stopped.set)
+
+        await asyncio.gather(*[worker.start(self.ready_timeout) for worker in self.workers])
+        supervisors = [asyncio.create_task(self._supervise(worker)) for worker in self.workers]
+
+        await self.stopped.wait()
+        for supervisor in supervisors:
+            supervisor.cancel()
+        await asyncio.gather(*[worker.stop(self.drain_timeout) for worker in self.workers])
+        logging.info("All workers stopped")
+
+    async def rolling_restart(self) -> None:
+        async with self.restart_lock:
+            logging.info("Rolling restart of %s workers", len(self.workers))
+            for worker in self.workers:
+                if self.stopped.is_set():
+                    return
+                await worker.stop(self.drain_timeout)
+                await worker.start(self.ready_timeout)
+            logging.info("Rolling restart completed")
+
+    async def _supervise(self, worker: WorkerProcess) -> None:
+        while True:
+            process = worker.process
+            returncode = await process.wait()
+            if worker.stopping:
+                # stopped by a rolling restart, wait for the new process
+                while worker.process is process or worker.stopping:
+                    await asyncio.sleep(0.5)
+                continue
+
+            logging.warning("Worker %s exited with code %s, starting it again", worker.index, returncode)
+            await asyncio.sleep(1)
+            await worker.start(self.ready_timeout)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Runs several worker processes on the same task queue",
+                                     epilog="arguments after -- are passed to the worker processes")
+    parser.add_argument("--processes", type=int, default=2, help="number of worker processes")
+    parser.add_argument("--worker", default="src.temporal_worker_v8", help="worker module")
+    parser.add_argument("--prometheus-port", type=int, default=8086,
+                        help="prometheus port of the first process, the next processes use the next ports")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="seconds to wait for a process to finish its in-flight tasks before killing it")
+    parser.add_argument("--ready-timeout", type=float, default=30,
+                        help="seconds to wait for a new process during a rolling restart")
+    parser.add_argument("worker_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    if args.worker_args[:1] == ["--"]:
+        args.worker_args = args.worker_args[1:]
+    return args
+
+
+async def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s  - %(message)s"
+    )
+
+    args = parse_args()
+    launcher = WorkerLauncher(args.processes, args.worker, args.prometheus_port, args.worker_args,
+                              args.drain_timeout, args.ready_timeout)
+    await launcher.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
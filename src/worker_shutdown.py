@@ -0,0 +1,29 @@
+import asyncio
+import logging
+import signal
+from datetime import timedelta
+from typing import List
+
+from temporalio.worker import Worker
+
+# Graceful shutdown of the worker entry points.
+#
+# On SIGTERM (sh_kill_worker.sh, src/worker_launcher.py) the workers stop polling and the running activities get
+# `graceful_shutdown_timeout` to complete. The activities still running after that are cancelled, they are retried
+# by another worker right away, starting from their last heartbeat details, instead of waiting for their
+# start-to-close or heartbeat timeout. A second SIGTERM terminates the process.
+
+graceful_shutdown_timeout = timedelta(seconds=30)
+
+
+def shutdown_on_sigterm(workers: List[Worker]) -> None:
+    loop = asyncio.get_running_loop()
+    shutdown_tasks = []
+
+    def shutdown():
+        logging.info("SIGTERM received, waiting for the running activities to complete")
+        loop.remove_signal_handler(signal.SIGTERM)
+        # worker.run() returns once the shutdown is completed
+        shutdown_tasks.extend(loop.create_task(worker.shutdown()) for worker in workers)
+
+    loop.add_signal_handler(signal.SIGTERM, shutdown)
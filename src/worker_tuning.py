@@ -0,0 +1,209 @@
+import asyncio
+import inspect
+import logging
+import os
+import threading
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from temporalio import activity
+from temporalio.common import MetricMeter
+from temporalio.worker import (ActivityInboundInterceptor, CustomSlotSupplier, ExecuteActivityInput,
+                               FixedSizeSlotSupplier, Interceptor, ResourceBasedSlotConfig, SlotMarkUsedContext,
+                               SlotPermit, SlotReleaseContext, SlotReserveContext, WorkerTuner)
+
+# Activity slot tuning for temporal_worker_v8.
+#
+# - `resource`: the SDK resource based tuner, hands out slots while the host CPU and memory usage are under target.
+# - `latency`: LatencyFeedbackSlotSupplier, moves the number of activity slots between a minimum and a maximum
+#   from the schedule-to-start latency observed by the worker and the host CPU and memory usage.
+
+
+def resource_based_tuner(minimum_activity_slots: int, maximum_activity_slots: int,
+                         target_cpu_usage: float = 0.9, target_memory_usage: float = 0.8) -> WorkerTuner:
+    return WorkerTuner.create_resource_based(
+        target_cpu_usage=target_cpu_usage,
+        target_memory_usage=target_memory_usage,
+        activity_config=ResourceBasedSlotConfig(
+            minimum_slots=minimum_activity_slots,
+            maximum_slots=maximum_activity_slots,
+        ),
+    )
+
+
+def latency_feedback_tuner(activity_supplier: "LatencyFeedbackSlotSupplier",
+                           max_concurrent_workflow_tasks: int = 100,
+                           max_concurrent_local_activities: int = 100) -> WorkerTuner:
+    suppliers = dict(
+        workflow_supplier=FixedSizeSlotSupplier(max_concurrent_workflow_tasks),
+        activity_supplier=activity_supplier,
+        local_activity_supplier=FixedSizeSlotSupplier(max_concurrent_local_activities),
+    )
+    # newer SDK versions also require a supplier for nexus tasks
+    if "nexus_supplier" in inspect.signature(WorkerTuner.create_composite).parameters:
+        suppliers["nexus_supplier"] = FixedSizeSlotSupplier(100)
+    return WorkerTuner.create_composite(**suppliers)
+
+
+def host_usage() -> Tuple[Optional[float], Optional[float]]:
+    # (cpu, memory) usage of the host between 0 and 1, None if it can't be read
+    cpu = None
+    if hasattr(os, "getloadavg"):
+        cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+
+    memory = None
+    try:
+        with open("/proc/meminfo") as meminfo:
+            values = {line.split(":")[0]: int(line.split()[1]) for line in meminfo}
+        memory = 1 - values["MemAvailable"] / values["MemTotal"]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return cpu, memory
+
+
+class LatencyFeedbackSlotSupplier(CustomSlotSupplier):
+    # Every `adjust_interval`:
+    # - the limit is lowered by `step` if the host CPU or memory usage is above target
+    # - otherwise it is raised by `step` if all the slots were used and the mean schedule-to-start latency
+    #   is above target, the activity tasks are waiting in the task queue for a free slot
+    # - otherwise it is lowered by `step` if less than half of the slots were used, the capacity is not needed
+    #
+    # The decisions are logged and exported as metrics (activity_slot_limit, activity_slot_adjustments).
+
+    def __init__(self,
+                 minimum_slots: int,
+                 maximum_slots: int,
+                 target_schedule_to_start_latency: timedelta = timedelta(seconds=1),
+                 target_cpu_usage: float = 0.9,
+                 target_memory_usage: float = 0.8,
+                 adjust_interval: timedelta = timedelta(seconds=5),
+                 step: int = 5,
+                 metric_meter: Optional[MetricMeter] = None) -> None:
+        self.minimum_slots = minimum_slots
+        self.maximum_slots = maximum_slots
+        self.target_schedule_to_start_latency = target_schedule_to_start_latency
+        self.target_cpu_usage = target_cpu_usage
+        self.target_memory_usage = target_memory_usage
+        self.adjust_interval = adjust_interval
+        self.step = step
+
+        self.limit = minimum_slots
+        # slots reserved, and the max reserved since the last adjustment
+        self.reserved = 0
+        self.max_reserved = 0
+        self.latencies: List[float] = []
+
+        # try_reserve_slot and release_slot can be called from the SDK core threads
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.slot_released: Optional[asyncio.Event] = None
+
+        self.limit_gauge = None
+        self.adjustments_counter = None
+        if metric_meter:
+            self.limit_gauge = metric_meter.create_gauge(
+                "activity_slot_limit", "Activity slots handed out by the latency feedback slot supplier")
+            self.adjustments_counter = metric_meter.create_counter(
+                "activity_slot_adjustments", "Changes of the activity slot limit")
+            self.limit_gauge.set(self.limit)
+
+    async def reserve_slot(self, ctx: SlotReserveContext) -> SlotPermit:
+        if self.slot_released is None:
+            self.loop = asyncio.get_running_loop()
+            self.slot_released = asyncio.Event()
+
+        while True:
+            # cleared before checking the slots, so a release after the check is not missed
+            self.slot_released.clear()
+            permit = self.try_reserve_slot(ctx)
+            if permit:
+                return permit
+            await self.slot_released.wait()
+
+    def try_reserve_slot(self, ctx: SlotReserveContext) -> Optional[SlotPermit]:
+        with self.lock:
+            if self.reserved >= self.limit:
+                return None
+            self.reserved += 1
+            self.max_reserved = max(self.max_reserved, self.reserved)
+            return SlotPermit()
+
+    def mark_slot_used(self, ctx: SlotMarkUsedContext) -> None:
+        pass
+
+    def release_slot(self, ctx: SlotReleaseContext) -> None:
+        with self.lock:
+            self.reserved -= 1
+        self._notify_slot_released()
+
+    def record_schedule_to_start_latency(self, latency: timedelta) -> None:
+        with self.lock:
+            self.latencies.append(latency.total_seconds())
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.adjust_interval.total_seconds())
+            self.adjust(*host_usage())
+
+    def adjust(self, cpu_usage: Optional[float], memory_usage: Optional[float]) -> None:
+        with self.lock:
+            latencies, self.latencies = self.latencies, []
+            max_reserved, self.max_reserved = self.max_reserved, self.reserved
+            limit = self.limit
+
+        mean_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        target_latency = self.target_schedule_to_start_latency.total_seconds()
+
+        if (cpu_usage or 0) > self.target_cpu_usage or (memory_usage or 0) > self.target_memory_usage:
+            reason = "host_usage_above_target"
+            new_limit = max(self.minimum_slots, limit - self.step)
+        elif max_reserved >= limit and mean_latency > target_latency:
+            reason = "schedule_to_start_latency_above_target"
+            new_limit = min(self.maximum_slots, limit + self.step)
+        elif max_reserved < limit / 2:
+            reason = "slots_not_used"
+            new_limit = max(self.minimum_slots, limit - self.step)
+        else:
+            return
+
+        if new_limit == limit:
+            return
+
+        logging.info("Activity slot limit %s -> %s (%s, schedule-to-start latency %.3fs, cpu %s, memory %s)",
+                     limit, new_limit, reason, mean_latency, cpu_usage, memory_usage)
+        with self.lock:
+            self.limit = new_limit
+        if self.limit_gauge:
+            self.limit_gauge.set(new_limit)
+        if self.adjustments_counter:
+            self.adjustments_counter.with_additional_attributes({"reason": reason}).add(1)
+        if new_limit > limit:
+            self._notify_slot_released()
+
+    def _notify_slot_released(self) -> None:
+        if self.loop and self.slot_released:
+            self.loop.call_soon_threadsafe(self.slot_released.set)
+
+
+class ScheduleToStartLatencyInterceptor(Interceptor):
+    # reports the schedule-to-start latency of every activity task to the slot supplier
+
+    def __init__(self, slot_supplier: LatencyFeedbackSlotSupplier) -> None:
+        self.slot_supplier = slot_supplier
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ScheduleToStartLatencyActivityInboundInterceptor(next, self.slot_supplier)
+
+
+class _ScheduleToStartLatencyActivityInboundInterceptor(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, slot_supplier: LatencyFeedbackSlotSupplier) -> None:
+        super().__init__(next)
+        self.slot_supplier = slot_supplier
+
+    async def execute_activity(self, input: ExecuteActivityInput):
+        info = activity.info()
+        if not info.is_local:
+            self.slot_supplier.record_schedule_to_start_latency(
+                info.started_time - info.current_attempt_scheduled_time)
+        return await super().execute_activity(input)
@@ -10,7 +10,8 @@ from src.workflow.types import CheckPreconditionsActivityInput, VaultResponse, \
     StopServicesActivityInput, SetMaintenanceModeActivityInput, RunPreDowntimeScriptsActivityInput, \
     SendStartNotificationActivityInput, CheckHostPreconditionsActivityInput, GetClusterHostsActivityInput, \
     SendApprovalRequestActivityInput, SendFinalSuccessNotificationActivityInput, GetClusterHostsActivityOutput, \
-    CheckHostPreconditionsActivityOutput, MyVaultClient
+    CheckHostPreconditionsActivityOutput
+from src.workflow.vault_client import MyVaultClient
 
 
 def activities(vault_client):
@@ -1,6 +1,7 @@
 import asyncio
 import random
 from random import uniform
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
 
 from temporalio import activity
 from temporalio.exceptions import ApplicationError
@@ -12,11 +13,28 @@ from src.workflow.types import CheckPreconditionsActivityInput, VaultResponse, \
     StopServicesActivityInput, SetMaintenanceModeActivityInput, RunPreDowntimeScriptsActivityInput, \
     SendStartNotificationActivityInput, CheckHostPreconditionsActivityInput, GetClusterHostsActivityInput, \
     SendApprovalRequestActivityInput, SendFinalSuccessNotificationActivityInput, GetClusterHostsActivityOutput, \
-    CheckHostPreconditionsActivityOutput, MyVaultClient
+    CheckHostPreconditionsActivityOutput, HostResult, HostBatchActivityOutput, HostPreconditionsResult, \
+    CheckHostPreconditionsBatchActivityInput, CheckHostPreconditionsBatchActivityOutput, \
+    RunPreDowntimeScriptsBatchActivityInput, PerformUpdateBatchActivityInput, CheckServiceHealthBatchActivityInput, \
+    SendSuccessNotificationBatchActivityInput
+from src.workflow.checkpoint import ActivityCheckpoint
+from src.workflow.ssh import SimulatedSshConnector, SshSessionPool
+from src.workflow.vault_client import MyVaultClient
 
+T = TypeVar("T")
 
-def activities(vault_client):
-    my_activities = MyActivities(vault_client)
+
+def update_stages(update_command: str) -> List[Tuple[str, str]]:
+    # (stage, command) run by perform_update_activity
+    return [
+        ("download", update_command + " --download-only"),
+        ("install", update_command),
+        ("verify", update_command + " --verify"),
+    ]
+
+
+def activities(vault_client, ssh_pool: Optional[SshSessionPool] = None):
+    my_activities = MyActivities(vault_client, ssh_pool)
 
     return [
         my_activities.send_approval_request_activity,
@@ -36,12 +54,19 @@ def activities(vault_client):
         my_activities.stop_services_activity,
         my_activities.start_services_activity,
         my_activities.wait_for_workload_drain_activity,
+        my_activities.check_host_preconditions_batch_activity,
+        my_activities.run_pre_downtime_scripts_batch_activity,
+        my_activities.perform_update_batch_activity,
+        my_activities.check_service_health_batch_activity,
+        my_activities.send_success_notification_batch_activity,
     ]
 
 
 class MyActivities:
-    def __init__(self, client: MyVaultClient) -> None:
+    def __init__(self, client: MyVaultClient, ssh_pool: Optional[SshSessionPool] = None) -> None:
         self.client = client
+        # the ssh sessions are shared by all the host activities of the worker process
+        self.ssh_pool = ssh_pool or SshSessionPool(SimulatedSshConnector())
 
     @activity.defn
     async def check_preconditions_activity(self, activity_input: CheckPreconditionsActivityInput) -> bool:
@@ -55,9 +80,8 @@ class MyActivities:
 
     @activity.defn
     async def vault_client_activity(self, activity_input: VaultClientActivityInput) -> VaultResponse:
-        await self.simulate_activity_execution()
-
-        return VaultResponse()
+        # the token is shared by all the activities of the worker process, until it expires
+        return await self.client.get_token(activity_input.vaultAddress)
 
     @activity.defn
     async def send_approval_request_activity(self, activity_input: SendApprovalRequestActivityInput) -> bool:
@@ -75,15 +99,28 @@ class MyActivities:
         if activity.info().attempt == 1 and cluster == "cluster1":
             raise Exception("Simulated failure in get_cluster_hosts_activity")
 
-        return GetClusterHostsActivityOutput([cluster + "_host1",
-                                              cluster + "_host2",
-                                              cluster + "_host3",
-                                              cluster + "_host4",
-                                              cluster + "_host5"])
+        hostnames = [cluster + "_host1",
+                     cluster + "_host2",
+                     cluster + "_host3",
+                     cluster + "_host4",
+                     cluster + "_host5"]
+
+        if activity_input.pageSize <= 0:
+            return GetClusterHostsActivityOutput(hostnames, totalHostCount=len(hostnames))
+
+        page_end = activity_input.cursor + activity_input.pageSize
+        return GetClusterHostsActivityOutput(
+            hostnames[activity_input.cursor:page_end],
+            page_end if page_end < len(hostnames) else None,
+            len(hostnames),
+        )
 
     @activity.defn
     async def check_host_preconditions_activity(self,
                                                 activity_input: CheckHostPreconditionsActivityInput) -> CheckHostPreconditionsActivityOutput:
+        return await self._check_host_preconditions(activity_input.hostname)
+
+    async def _check_host_preconditions(self, hostname: str) -> CheckHostPreconditionsActivityOutput:
 
         await asyncio.sleep(uniform(6, 10))
 
@@ -100,7 +137,11 @@ class MyActivities:
 
     @activity.defn
     async def run_pre_downtime_scripts_activity(self, activity_input: RunPreDowntimeScriptsActivityInput) -> bool:
-        await self.simulate_activity_execution()
+        return await self._run_pre_downtime_scripts(activity_input.hostname)
+
+    async def _run_pre_downtime_scripts(self, hostname: str) -> bool:
+        async with self.ssh_pool.session(hostname) as ssh:
+            await ssh.run("run-pre-downtime-scripts")
         return True
 
     @activity.defn
@@ -110,7 +151,8 @@ class MyActivities:
 
     @activity.defn
     async def stop_services_activity(self, activity_input: StopServicesActivityInput) -> bool:
-        await self.simulate_activity_execution()
+        async with self.ssh_pool.session(activity_input.hostname) as ssh:
+            await ssh.run("systemctl stop " + " ".join(activity_input.serviceList))
         return True
 
     @activity.defn
@@ -125,30 +167,29 @@ class MyActivities:
 
     @activity.defn
     async def perform_update_activity(self, activity_input: PerformUpdateActivityInput) -> bool:
+        # the stages completed by a previous attempt (recorded in the heartbeat details) are skipped
+        return await self._perform_update(activity_input.hostname, activity_input.updateCommand, ActivityCheckpoint())
+
+    async def _perform_update(self, hostname: str, update_command: str,
+                              checkpoint: Optional[ActivityCheckpoint] = None) -> bool:
 
         # activity.logger.info("***Starting perform_update_activity***")
 
         # Exersice 3.1 Start to close timeout
         # await asyncio.sleep(11)
 
-        # Init Exersice 3.2 Heartbeat
-        # details = activity.info().heartbeat_details
-        # init = 1
-        # if details:
-        #     init = int(details[0])
-        # for i in range(init, 9):
-        #     heartbeat_info = str(i)
-        #     activity.logger.info("****about to heartbeat :" + heartbeat_info)
-        #     activity.heartbeat(heartbeat_info)
-        #     await asyncio.sleep(1)
-        # End Exersice 3.2 Heartbeat
-
-        await self.simulate_activity_execution()
+        async with self.ssh_pool.session(hostname) as ssh:
+            for stage, command in update_stages(update_command):
+                if checkpoint:
+                    await checkpoint.run_stage(stage, lambda: ssh.run(command))
+                else:
+                    await ssh.run(command)
         return True
 
     @activity.defn
     async def start_services_activity(self, activity_input: StartServicesActivityInput) -> bool:
-        await self.simulate_activity_execution()
+        async with self.ssh_pool.session(activity_input.hostname) as ssh:
+            await ssh.run("systemctl start " + " ".join(activity_input.serviceList))
         return True
 
     @activity.defn
@@ -158,16 +199,22 @@ class MyActivities:
 
     @activity.defn
     async def check_service_health_activity(self, activity_input: CheckServiceHealthActivityInput) -> bool:
+        return await self._check_service_health(activity_input.hostname, activity_input.serviceList)
+
+    async def _check_service_health(self, hostname: str, service_list: List[str]) -> bool:
         await self.simulate_activity_execution()
 
         # Simulate a health check failure
-        if activity_input.hostname == "cluster1_host1" and activity.info().attempt == 1:
-            raise Exception("Service health check failed: " + str(activity_input))
+        if hostname == "cluster1_host1" and activity.info().attempt == 1:
+            raise Exception("Service health check failed: " + hostname)
 
         return True
 
     @activity.defn
     async def send_success_notification_activity(self, activity_input: SendSuccessNotificationActivityInput) -> bool:
+        return await self._send_success_notification(activity_input.hostname, activity_input.requesterEmail)
+
+    async def _send_success_notification(self, hostname: str, requester_email: str) -> bool:
         await self.simulate_activity_execution()
         return True
 
@@ -182,6 +229,86 @@ class MyActivities:
         await self.simulate_activity_execution()
         return True
 
+    @activity.defn
+    async def check_host_preconditions_batch_activity(self,
+                                                      activity_input: CheckHostPreconditionsBatchActivityInput) -> CheckHostPreconditionsBatchActivityOutput:
+        async def check_host(hostname: str) -> HostPreconditionsResult:
+            output = await self._check_host_preconditions(hostname)
+            return HostPreconditionsResult(hostname, output.preconditionsMet, output.sshPrivateKey)
+
+        return CheckHostPreconditionsBatchActivityOutput(
+            await self._run_batch(activity_input.hostnames, check_host, HostPreconditionsResult)
+        )
+
+    @activity.defn
+    async def run_pre_downtime_scripts_batch_activity(self,
+                                                      activity_input: RunPreDowntimeScriptsBatchActivityInput) -> HostBatchActivityOutput:
+        async def run_scripts(hostname: str) -> HostResult:
+            return HostResult(hostname, await self._run_pre_downtime_scripts(hostname))
+
+        return HostBatchActivityOutput(await self._run_batch(activity_input.hostnames, run_scripts, HostResult))
+
+    @activity.defn
+    async def perform_update_batch_activity(self,
+                                            activity_input: PerformUpdateBatchActivityInput) -> HostBatchActivityOutput:
+        async def perform_update(hostname: str) -> HostResult:
+            return HostResult(hostname, await self._perform_update(hostname, activity_input.updateCommand))
+
+        return HostBatchActivityOutput(await self._run_batch(activity_input.hostnames, perform_update, HostResult))
+
+    @activity.defn
+    async def check_service_health_batch_activity(self,
+                                                  activity_input: CheckServiceHealthBatchActivityInput) -> HostBatchActivityOutput:
+        async def check_service_health(hostname: str) -> HostResult:
+            return HostResult(hostname, await self._check_service_health(hostname, activity_input.serviceList))
+
+        return HostBatchActivityOutput(
+            await self._run_batch(activity_input.hostnames, check_service_health, HostResult)
+        )
+
+    @activity.defn
+    async def send_success_notification_batch_activity(self,
+                                                       activity_input: SendSuccessNotificationBatchActivityInput) -> HostBatchActivityOutput:
+        async def send_notification(hostname: str) -> HostResult:
+            return HostResult(hostname, await self._send_success_notification(hostname, activity_input.requesterEmail))
+
+        return HostBatchActivityOutput(await self._run_batch(activity_input.hostnames, send_notification, HostResult))
+
+    async def _run_batch(self, hostnames: List[str], host_operation: Callable[[str], Awaitable[T]],
+                         result_type: Type[T]) -> List[T]:
+        # The hosts completed by previous attempts are recorded in the heartbeat details,
+        # when the activity is retried only the hosts that failed are processed again.
+        details = activity.info().heartbeat_details
+        completed: Dict[str, T] = {}
+        if details:
+            completed = {hostname: result_type(**result) for hostname, result in details[0].items()}
+
+        async def run_host_operation(hostname: str) -> T:
+            result = await host_operation(hostname)
+            # recorded as soon as the host completes, if the activity is cancelled (e.g. worker shutdown)
+            # the retry doesn't process the host again
+            completed[hostname] = result
+            activity.heartbeat(completed)
+            return result
+
+        pending = [hostname for hostname in hostnames if hostname not in completed]
+        outcomes = await asyncio.gather(*[run_host_operation(hostname) for hostname in pending],
+                                        return_exceptions=True)
+
+        failed_hosts = []
+        for hostname, outcome in zip(pending, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                activity.logger.info("Host [%s] failed: %s", hostname, outcome)
+                failed_hosts.append(hostname)
+
+        if failed_hosts:
+            # the failed hosts are returned in the error details
+            raise ApplicationError("Batch failed for hosts " + str(failed_hosts), failed_hosts)
+
+        return [completed[hostname] for hostname in hostnames]
+
     async def simulate_activity_execution(self, min_execution_time_seconds: float = 0.1,
                                           max_execution_time_seconds: float = 0.5):
         # randon sleep to simulate activity execution
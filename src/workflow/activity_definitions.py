@@ -0,0 +1,124 @@
+from temporalio import activity
+
+from src.workflow.types import CheckPreconditionsActivityInput, VaultClientActivityInput, VaultResponse, \
+    SendApprovalRequestActivityInput, GetClusterHostsActivityInput, GetClusterHostsActivityOutput, \
+    CheckHostPreconditionsActivityInput, CheckHostPreconditionsActivityOutput, SendStartNotificationActivityInput, \
+    RunPreDowntimeScriptsActivityInput, SetMaintenanceModeActivityInput, StopServicesActivityInput, \
+    WaitForWorkloadDrainActivityInput, RunPreUpdateScriptsActivityInput, PerformUpdateActivityInput, \
+    StartServicesActivityInput, RunPostUpdateScriptsActivityInput, CheckServiceHealthActivityInput, \
+    SendSuccessNotificationActivityInput, SendFailureAlertActivityInput, SendFinalSuccessNotificationActivityInput, \
+    CheckHostPreconditionsBatchActivityInput, CheckHostPreconditionsBatchActivityOutput, \
+    RunPreDowntimeScriptsBatchActivityInput, HostBatchActivityOutput, PerformUpdateBatchActivityInput, \
+    CheckServiceHealthBatchActivityInput, SendSuccessNotificationBatchActivityInput
+
+# The activity interface of the workflows: the activity names (the method names) and their input and output types.
+#
+# The workflows reference the activities through these definitions, not through the activity modules (activities,
+# activities_v4, activities_v7) which import the vault client, the SSH pool and the checkpoints. This module only
+# imports the types, the sandbox passes it through (src/workflow/sandbox.py) without the implementations.
+#
+# The MyActivities classes of the activity modules implement these definitions, test/test_activity_definitions.py
+# checks their names and types match.
+
+
+class MyActivities:
+    @activity.defn
+    async def check_preconditions_activity(self, activity_input: CheckPreconditionsActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def vault_client_activity(self, activity_input: VaultClientActivityInput) -> VaultResponse:
+        ...
+
+    @activity.defn
+    async def send_approval_request_activity(self, activity_input: SendApprovalRequestActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def get_cluster_hosts_activity(self,
+                                         activity_input: GetClusterHostsActivityInput) -> GetClusterHostsActivityOutput:
+        ...
+
+    @activity.defn
+    async def check_host_preconditions_activity(
+            self, activity_input: CheckHostPreconditionsActivityInput) -> CheckHostPreconditionsActivityOutput:
+        ...
+
+    @activity.defn
+    async def send_start_notification_activity(self, activity_input: SendStartNotificationActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def run_pre_downtime_scripts_activity(self, activity_input: RunPreDowntimeScriptsActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def set_maintenance_mode_activity(self, activity_input: SetMaintenanceModeActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def stop_services_activity(self, activity_input: StopServicesActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def wait_for_workload_drain_activity(self, activity_input: WaitForWorkloadDrainActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def run_pre_update_scripts_activity(self, activity_input: RunPreUpdateScriptsActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def perform_update_activity(self, activity_input: PerformUpdateActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def start_services_activity(self, activity_input: StartServicesActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def run_post_update_scripts_activity(self, activity_input: RunPostUpdateScriptsActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def check_service_health_activity(self, activity_input: CheckServiceHealthActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def send_success_notification_activity(self, activity_input: SendSuccessNotificationActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def send_failure_alert_activity(self, activity_input: SendFailureAlertActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def send_final_success_notification_activity(
+            self, activity_input: SendFinalSuccessNotificationActivityInput) -> bool:
+        ...
+
+    @activity.defn
+    async def check_host_preconditions_batch_activity(
+            self,
+            activity_input: CheckHostPreconditionsBatchActivityInput) -> CheckHostPreconditionsBatchActivityOutput:
+        ...
+
+    @activity.defn
+    async def run_pre_downtime_scripts_batch_activity(
+            self, activity_input: RunPreDowntimeScriptsBatchActivityInput) -> HostBatchActivityOutput:
+        ...
+
+    @activity.defn
+    async def perform_update_batch_activity(self,
+                                            activity_input: PerformUpdateBatchActivityInput) -> HostBatchActivityOutput:
+        ...
+
+    @activity.defn
+    async def check_service_health_batch_activity(
+            self, activity_input: CheckServiceHealthBatchActivityInput) -> HostBatchActivityOutput:
+        ...
+
+    @activity.defn
+    async def send_success_notification_batch_activity(
+            self, activity_input: SendSuccessNotificationBatchActivityInput) -> HostBatchActivityOutput:
+        ...
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from temporalio import activity
+
+T = TypeVar("T")
+
+
+# Checkpoints of long running host operations, recorded in the activity heartbeat details.
+#
+# The operation is split in stages, each completed stage is heartbeated. When the activity is retried
+# (worker crash or shutdown, heartbeat timeout...) the stages completed by the previous attempts are skipped.
+# While a stage runs the checkpoint keeps heartbeating every `heartbeat_interval`, so a long stage doesn't hit
+# the heartbeat timeout of the activity, and heartbeats more frequent than that are throttled.
+#
+# The progress is heartbeated as a dict, {"completedStages": [...]}, that the JSON and msgpack payload
+# converters decode the same way without type hint.
+
+class ActivityCheckpoint:
+    def __init__(self, heartbeat_interval: timedelta = timedelta(seconds=1),
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.heartbeat_interval = heartbeat_interval
+        self.clock = clock
+        self.last_heartbeat: Optional[float] = None
+
+        details = activity.info().heartbeat_details
+        checkpoint = details[0] if details and isinstance(details[0], dict) else {}
+        self.completed_stages: List[str] = list(checkpoint.get("completedStages", []))
+
+    def is_completed(self, stage: str) -> bool:
+        return stage in self.completed_stages
+
+    async def run_stage(self, stage: str, operation: Callable[[], Awaitable[T]]) -> Optional[T]:
+        # returns None if the stage was completed by a previous attempt
+        if self.is_completed(stage):
+            activity.logger.info("Skipping stage [%s], completed by a previous attempt", stage)
+            return None
+
+        keep_alive = asyncio.create_task(self._keep_alive())
+        try:
+            result = await operation()
+        finally:
+            keep_alive.cancel()
+
+        self.completed_stages.append(stage)
+        self.heartbeat(force=True)
+        return result
+
+    def heartbeat(self, force: bool = False) -> None:
+        now = self.clock()
+        if not force and self.last_heartbeat is not None \
+                and now - self.last_heartbeat < self.heartbeat_interval.total_seconds():
+            return
+
+        self.last_heartbeat = now
+        activity.heartbeat({"completedStages": list(self.completed_stages)})
+
+    async def _keep_alive(self) -> None:
+        while True:
+            self.heartbeat()
+            await asyncio.sleep(self.heartbeat_interval.total_seconds())
@@ -0,0 +1,92 @@
+import time
+from datetime import timedelta
+from typing import Awaitable, Dict, Sequence
+
+from temporalio import activity, workflow
+from temporalio.exceptions import ActivityError
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+
+# Patch progress metrics, exported with the SDK metrics by the runtime of the worker (see init_runtime_with_prometheus
+# in temporal_worker_v8.py) and plotted by the "System Patch" Grafana dashboard
+# (grafana/deployment/grafana/provisioning/dashboards/system-patch.json).
+#
+# From the workflows (not recorded when a workflow is replayed):
+# - system_patch_hosts_patched{cluster}: hosts that passed the health check, rate() gives the hosts patched per second
+# - system_patch_step_latency{step}: milliseconds from scheduling a step to its result, queueing and retries included
+# - system_patch_step_failures{step}: steps that failed after all their retries
+# From the activities (PatchMetricsInterceptor):
+# - system_patch_activity_latency{step}: milliseconds of each attempt of a step
+# - system_patch_activity_failures{step}: failed attempts of a step
+
+HOSTS_PATCHED = "system_patch_hosts_patched"
+STEP_LATENCY = "system_patch_step_latency"
+STEP_FAILURES = "system_patch_step_failures"
+ACTIVITY_LATENCY = "system_patch_activity_latency"
+ACTIVITY_FAILURES = "system_patch_activity_failures"
+
+# the steps take seconds, the default buckets of the SDK stop at 10s
+LATENCY_BUCKETS: Sequence[float] = [100, 250, 500, 1000, 2500, 5000, 7500, 10000, 15000, 30000, 60000]
+HISTOGRAM_BUCKETS: Dict[str, Sequence[float]] = {
+    STEP_LATENCY: LATENCY_BUCKETS,
+    ACTIVITY_LATENCY: LATENCY_BUCKETS,
+}
+
+# activity name -> step, the single host and the host batch activities of a step have the same label
+STEPS = {
+    "check_host_preconditions_activity": "precondition",
+    "check_host_preconditions_batch_activity": "precondition",
+    "run_pre_downtime_scripts_activity": "pre_downtime",
+    "run_pre_downtime_scripts_batch_activity": "pre_downtime",
+    "perform_update_activity": "update",
+    "perform_update_batch_activity": "update",
+    "check_service_health_activity": "health_check",
+    "check_service_health_batch_activity": "health_check",
+}
+
+
+async def record_step(activity_name: str, result: Awaitable):
+    # the activities that are not patching steps (notifications, vault...) are not measured
+    step = STEPS.get(activity_name)
+    if step is None:
+        return await result
+
+    meter = workflow.metric_meter()
+    scheduled = workflow.now()
+    try:
+        value = await result
+    except ActivityError:
+        meter.create_counter(STEP_FAILURES, "Patch steps failed after all their retries").add(1, {"step": step})
+        raise
+
+    meter.create_histogram_timedelta(STEP_LATENCY, "Patch step latency, queueing and retries included", "ms") \
+        .record(workflow.now() - scheduled, {"step": step})
+    return value
+
+
+def record_hosts_patched(cluster: str, count: int) -> None:
+    workflow.metric_meter().create_counter(HOSTS_PATCHED, "Hosts patched").add(count, {"cluster": cluster})
+
+
+class PatchMetricsInterceptor(Interceptor):
+    # records the latency and the failures of every attempt of the patching steps
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _PatchMetricsActivityInboundInterceptor(next)
+
+
+class _PatchMetricsActivityInboundInterceptor(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput):
+        step = STEPS.get(activity.info().activity_type)
+        if step is None:
+            return await super().execute_activity(input)
+
+        meter = activity.metric_meter()
+        started = time.monotonic()
+        try:
+            return await super().execute_activity(input)
+        except Exception:
+            meter.create_counter(ACTIVITY_FAILURES, "Failed attempts of the patch steps").add(1, {"step": step})
+            raise
+        finally:
+            meter.create_histogram_timedelta(ACTIVITY_LATENCY, "Patch step attempt latency", "ms") \
+                .record(timedelta(seconds=time.monotonic() - started), {"step": step})
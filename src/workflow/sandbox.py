@@ -0,0 +1,29 @@
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner, SandboxRestrictions
+
+# The sandbox re-imports the modules of a workflow for every workflow run that is not in the worker cache
+# (new workflows, evicted workflows, replays...), the first workflow task pays for it.
+#
+# The workflows only use the modules below for their definitions: the frozen dataclasses in types.py, the activity
+# names and types in activity_definitions.py, the search attribute keys, the metric names and the wave planner.
+# The activity implementations (activities, activities_v4, activities_v7) are not imported by the workflows and not
+# passed through, with the vault client, SSH pool and checkpoint modules they import.
+# They are imported once outside of the sandbox and shared by all the workflow runs, the sandbox only re-imports the
+# workflow module itself.
+# Modules added here can't have state used by the workflows, it would be shared by all the runs.
+#
+# `python3 -m src.bench.cold_start_benchmark` measures the first workflow task of a fresh workflow
+# with and without it.
+
+PASSTHROUGH_MODULES = [
+    "src.workflow.types",
+    "src.workflow.search_attributes",
+    "src.workflow.metrics",
+    "src.workflow.waves",
+    "src.workflow.activity_definitions",
+]
+
+
+def workflow_runner() -> SandboxedWorkflowRunner:
+    return SandboxedWorkflowRunner(
+        restrictions=SandboxRestrictions.default.with_passthrough_modules(*PASSTHROUGH_MODULES)
+    )
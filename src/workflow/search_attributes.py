@@ -0,0 +1,8 @@
+from temporalio.common import SearchAttributeKey
+
+# Custom search attributes have to be registered in the namespace before they are used, e.g.
+#   temporal operator search-attribute create --name PatchCompletedSteps --type KeywordList
+# (sh_start_server.sh registers them in the dev server)
+
+# steps completed by SystemPatchWorkflow_V7, the same value returned by the query `get_completed_steps`
+PATCH_COMPLETED_STEPS = SearchAttributeKey.for_keyword_list("PatchCompletedSteps")
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from random import uniform
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+# The host activities run several commands on the same host one after the other
+# (pre-downtime scripts, stop services, update, start services...). Instead of opening an SSH
+# session per activity, the sessions are kept in a pool shared by all the activities of the worker
+# process, so consecutive steps on one host reuse the same transport.
+
+
+def import_asyncssh():
+    # asyncssh is an optional dependency, only needed to connect to real hosts.
+    # It is imported lazily to keep it out of the workflow sandbox, which imports this module.
+    try:
+        import asyncssh
+    except ImportError as e:
+        raise RuntimeError("asyncssh is required for ssh connections, install it with `pip install asyncssh`") from e
+    return asyncssh
+
+
+class SshConnection(ABC):
+    @abstractmethod
+    async def run(self, command: str) -> str:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+SshConnector = Callable[[str], Awaitable[SshConnection]]
+
+
+class SimulatedSshConnection(SshConnection):
+    async def run(self, command: str) -> str:
+        # random sleep to simulate the command execution
+        await asyncio.sleep(uniform(0.1, 0.5))
+        return command
+
+    def close(self) -> None:
+        pass
+
+
+class SimulatedSshConnector:
+    # Simulates the connection to the hosts of the workshop, which don't exist.
+
+    def __init__(self, handshake_seconds: float = 0.3) -> None:
+        self.handshake_seconds = handshake_seconds
+        self.connections = 0
+
+    async def __call__(self, host: str) -> SshConnection:
+        self.connections += 1
+        await asyncio.sleep(self.handshake_seconds)
+        return SimulatedSshConnection()
+
+
+class AsyncSshConnection(SshConnection):
+    def __init__(self, connection) -> None:
+        self.connection = connection
+
+    async def run(self, command: str) -> str:
+        result = await self.connection.run(command, check=True)
+        return result.stdout
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class AsyncSshConnector:
+    # Connects to real hosts with asyncssh, the options are passed to `asyncssh.connect`
+    # (e.g. port, username, client_keys, known_hosts).
+
+    def __init__(self, **connect_options) -> None:
+        self.connect_options = connect_options
+
+    async def __call__(self, host: str) -> SshConnection:
+        asyncssh = import_asyncssh()
+        return AsyncSshConnection(await asyncssh.connect(host, **self.connect_options))
+
+
+@dataclass
+class IdleConnection:
+    connection: SshConnection
+    idle_since: float
+
+
+class SshSessionPool:
+    # - sessions are keyed by host
+    # - at most `max_connections_per_host` sessions are open (in use or idle) per host,
+    #   callers wait for a session to be released when the limit is reached
+    # - sessions idle for more than `idle_timeout` are closed
+    # - the per-host state is dropped when the host has no sessions and no callers, the pool doesn't grow
+    #   with the number of hosts patched by the worker
+
+    def __init__(self,
+                 connector: SshConnector,
+                 max_connections_per_host: int = 2,
+                 idle_timeout: timedelta = timedelta(seconds=60),
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.connector = connector
+        self.max_connections_per_host = max_connections_per_host
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+
+        self.idle: Dict[str, List[IdleConnection]] = {}
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+        # callers using or waiting for a session, per host
+        self.callers: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def session(self, host: str) -> AsyncIterator[SshConnection]:
+        self.evict_idle()
+
+        host_slots = self.host_slots.get(host)
+        if host_slots is None:
+            host_slots = self.host_slots[host] = asyncio.Semaphore(self.max_connections_per_host)
+
+        self.callers[host] = self.callers.get(host, 0) + 1
+        try:
+            async with host_slots:
+                connection = self._pop_idle(host)
+                if connection is None:
+                    connection = await self.connector(host)
+
+                try:
+                    yield connection
+                except BaseException:
+                    # the session might be broken, don't reuse it
+                    connection.close()
+                    raise
+
+                self.idle.setdefault(host, []).append(IdleConnection(connection, self.clock()))
+        finally:
+            self.callers[host] -= 1
+            if not self.callers[host]:
+                del self.callers[host]
+                self._drop_host(host)
+
+    def evict_idle(self) -> None:
+        expired_before = self.clock() - self.idle_timeout.total_seconds()
+        for host in list(self.idle):
+            for idle_connection in self.idle[host]:
+                if idle_connection.idle_since <= expired_before:
+                    idle_connection.connection.close()
+            self.idle[host] = [c for c in self.idle[host] if c.idle_since > expired_before]
+            if not self.idle[host]:
+                del self.idle[host]
+                self._drop_host(host)
+
+    def close(self) -> None:
+        for idle_connections in self.idle.values():
+            for idle_connection in idle_connections:
+                idle_connection.connection.close()
+        self.idle.clear()
+        for host in list(self.host_slots):
+            self._drop_host(host)
+
+    def _drop_host(self, host: str) -> None:
+        if host not in self.callers and host not in self.idle:
+            self.host_slots.pop(host, None)
+
+    def _pop_idle(self, host: str) -> Optional[SshConnection]:
+        idle_connections = self.idle.get(host)
+        if not idle_connections:
+            return None
+
+        # the most recently used session is the less likely to be closed by the server
+        connection = idle_connections.pop().connection
+        if not idle_connections:
+            del self.idle[host]
+        return connection
+
+
+async def start_fake_ssh_server(host: str = "127.0.0.1", port: int = 0):
+    # In-process SSH server that accepts any client and echoes the commands,
+    # to run the pool against a real SSH transport without remote hosts.
+    asyncssh = import_asyncssh()
+
+    class FakeSshServer(asyncssh.SSHServer):
+        def begin_auth(self, username: str) -> bool:
+            # no authentication required
+            return False
+
+    def handle_command(process) -> None:
+        process.stdout.write(process.command or "")
+        process.exit(0)
+
+    return await asyncssh.create_server(
+        FakeSshServer, host, port,
+        server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")],
+        process_factory=handle_command,
+    )
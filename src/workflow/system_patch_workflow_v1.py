@@ -5,7 +5,7 @@ from temporalio import workflow
 from temporalio.common import RetryPolicy
 from temporalio.exceptions import FailureError, ActivityError
 
-from src.workflow.activities import MyActivities
+from src.workflow.activity_definitions import MyActivities
 from src.workflow.types import SystemPatchWorkflowInput, SendApprovalRequestActivityInput, VaultClientActivityInput, \
     GetClusterHostsActivityInput, CheckHostPreconditionsActivityInput, SendSuccessNotificationActivityInput, \
     SendFailureAlertActivityInput, RunPreDowntimeScriptsActivityInput, \
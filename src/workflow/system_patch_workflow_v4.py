@@ -6,7 +6,7 @@ from temporalio import workflow
 from temporalio.common import RetryPolicy
 from temporalio.exceptions import FailureError, ActivityError, ApplicationError
 
-from src.workflow.activities_v4 import MyActivities
+from src.workflow.activity_definitions import MyActivities
 from src.workflow.types import SystemPatchWorkflowInput, SendApprovalRequestActivityInput, VaultClientActivityInput, \
     GetClusterHostsActivityInput, CheckHostPreconditionsActivityInput, SendSuccessNotificationActivityInput, \
     SendFailureAlertActivityInput, RunPreDowntimeScriptsActivityInput, \
@@ -1,19 +1,55 @@
 import asyncio
-from dataclasses import dataclass
+import dataclasses
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import List
+from typing import Dict, List, Optional
 
 from temporalio import workflow
 from temporalio.common import RetryPolicy
 from temporalio.exceptions import ActivityError, ApplicationError, ChildWorkflowError, TemporalError
 
-from src.workflow.activities_v7 import MyActivities
+from src.workflow.activity_definitions import MyActivities
+from src.workflow.metrics import record_hosts_patched, record_step
+from src.workflow.search_attributes import PATCH_COMPLETED_STEPS
 from src.workflow.types import SystemPatchWorkflowInput, SendApprovalRequestActivityInput, VaultClientActivityInput, \
     GetClusterHostsActivityInput, CheckHostPreconditionsActivityInput, SendSuccessNotificationActivityInput, \
     SendFailureAlertActivityInput, RunPreDowntimeScriptsActivityInput, \
     SetMaintenanceModeActivityInput, StopServicesActivityInput, WaitForWorkloadDrainActivityInput, \
     RunPreUpdateScriptsActivityInput, PerformUpdateActivityInput, StartServicesActivityInput, \
-    RunPostUpdateScriptsActivityInput, CheckServiceHealthActivityInput, SendFinalSuccessNotificationActivityInput
+    RunPostUpdateScriptsActivityInput, CheckServiceHealthActivityInput, SendFinalSuccessNotificationActivityInput, \
+    CheckHostPreconditionsBatchActivityInput, RunPreDowntimeScriptsBatchActivityInput, PerformUpdateBatchActivityInput, \
+    CheckServiceHealthBatchActivityInput, SendSuccessNotificationBatchActivityInput
+from src.workflow.waves import Wave, allowed_failures, check_waves, plan_waves
+
+
+async def execute_activity(activity_task_queues: Dict[str, str], activity, arg, **options):
+    # Slow and fast activities can run in different task queues (see task_queues.py),
+    # the activities not in activity_task_queues run in the workflow task queue.
+    return await record_step(activity.__name__, workflow.execute_activity_method(
+        activity, arg, task_queue=activity_task_queues.get(activity.__name__), **options))
+
+
+async def execute_step(local_activities: List[str], activity_task_queues: Dict[str, str], activity, arg, **options):
+    # Short steps can run as local activities, in the same worker that runs the workflow task,
+    # skipping the schedule-to-start latency of the task queue.
+    if activity.__name__ in local_activities:
+        return await record_step(activity.__name__, workflow.execute_local_activity_method(activity, arg, **options))
+
+    return await execute_activity(activity_task_queues, activity, arg, **options)
+
+
+def rollout_waves(wave_sizes: List[int], success_thresholds: List[int], pilot_host_count: int) -> List[Wave]:
+    # invalid waves fail the workflow, a ValueError would fail (and retry) the workflow task forever
+    try:
+        check_waves(wave_sizes, success_thresholds)
+    except ValueError as e:
+        raise ApplicationError(str(e), non_retryable=True) from e
+    return plan_waves(wave_sizes, success_thresholds, pilot_host_count)
+
+
+def padded(counts: List[int], length: int) -> List[int]:
+    # counts of each wave, 0 for the waves without a count (first run)
+    return list(counts[:length]) + [0] * (length - len(counts))
 
 
 @workflow.defn
@@ -22,6 +58,8 @@ class SystemPatchWorkflow_V7:
         self.wf_input: SystemPatchWorkflowInput = None
         self.approval_request_received = False
         self.completed_steps = []
+        # progress published in PATCH_COMPLETED_STEPS: the completed steps and the completed clusters
+        self.published_steps = []
 
     @workflow.run
     async def run(self, wf_input: SystemPatchWorkflowInput) -> str:
@@ -29,10 +67,13 @@ class SystemPatchWorkflow_V7:
 
         workflow.logger.info("Workflow starts ")
 
+        # the cluster workflows plan the waves, the invalid ones fail the workflow before any host is patched
+        rollout_waves(wf_input.waveSizes, wf_input.waveSuccessThresholds, wf_input.pilotHostCount)
+
         # 2. Execute `SendApprovalRequestActivity`.
 
         await self.send_approval_request_activity()
-        self.completed_steps.append("send_approval_request_activity")
+        self._complete_step("send_approval_request_activity")
 
         try:
             # wait for approval
@@ -47,12 +88,12 @@ class SystemPatchWorkflow_V7:
             # https://github.com/temporalio/sdk-python/issues/798
             raise ApplicationError("Approval requested not received") from e
 
-        self.completed_steps.append("approval_request_received")
+        self._complete_step("approval_request_received")
 
         # 3. Execute `VaultClientActivity`.
         vault_client_response = await self.vault_client_activity()
 
-        self.completed_steps.append("vault_client_activity")
+        self._complete_step("vault_client_activity")
 
         clusters = wf_input.targetClusters
         workflow.logger.info("target_clusters %s", clusters)
@@ -65,7 +106,7 @@ class SystemPatchWorkflow_V7:
         await asyncio.gather(*tasks)
 
         await self.send_final_success_notification_activity()
-        self.completed_steps.append("send_final_success_notification_activity")
+        self._complete_step("send_final_success_notification_activity")
 
         workflow.logger.info("About to complete workflow")
 
@@ -79,8 +120,21 @@ class SystemPatchWorkflow_V7:
     def get_completed_steps(self) -> List[str]:
         return self.completed_steps
 
+    def _complete_step(self, step: str):
+        self.completed_steps.append(step)
+        self._publish_progress(step)
+
+    def _publish_progress(self, step: str):
+        if self.wf_input.publishProgress:
+            # Publish the progress in the visibility store, clients can follow many workflows
+            # with a single list request instead of querying (and loading in the worker) each workflow.
+            self.published_steps.append(step)
+            workflow.upsert_search_attributes([PATCH_COMPLETED_STEPS.value_set(self.published_steps)])
+
     async def send_final_success_notification_activity(self):
-        await workflow.execute_activity_method(
+        await execute_step(
+            self.wf_input.localActivities,
+            self.wf_input.activityTaskQueues,
             activity=MyActivities.send_final_success_notification_activity,
             arg=SendFinalSuccessNotificationActivityInput(
                 # ...
@@ -90,7 +144,9 @@ class SystemPatchWorkflow_V7:
         )
 
     async def vault_client_activity(self):
-        return await workflow.execute_activity_method(
+        return await execute_step(
+            self.wf_input.localActivities,
+            self.wf_input.activityTaskQueues,
             activity=MyActivities.vault_client_activity,
             arg=VaultClientActivityInput(
                 # ...
@@ -100,7 +156,9 @@ class SystemPatchWorkflow_V7:
         )
 
     async def send_approval_request_activity(self):
-        await workflow.execute_activity_method(
+        await execute_step(
+            self.wf_input.localActivities,
+            self.wf_input.activityTaskQueues,
             activity=MyActivities.send_approval_request_activity,
             arg=SendApprovalRequestActivityInput(
                 targetClusters=self.wf_input.targetClusters,
@@ -113,100 +171,276 @@ class SystemPatchWorkflow_V7:
 
     async def _process_target_cluster(self, target_cluster):
         workflow.logger.debug("processing target_cluster %s", target_cluster)
-        return await workflow.execute_child_workflow(
+        await workflow.execute_child_workflow(
             SystemPatchWorkflow_Cluster_V7.run,
             SystemPatchWorkflow_ClusterInput(
                 targetCluster=target_cluster,
-                pilotHostCount=self.wf_input.pilotHostCount
+                pilotHostCount=self.wf_input.pilotHostCount,
+                maxInFlightHosts=self.wf_input.maxInFlightHosts,
+                maxUnavailablePercentage=self.wf_input.maxUnavailablePercentage,
+                hostPageSize=self.wf_input.hostPageSize,
+                hostBatchSize=self.wf_input.hostBatchSize,
+                localActivities=self.wf_input.localActivities,
+                activityTaskQueues=self.wf_input.activityTaskQueues,
+                waveSizes=self.wf_input.waveSizes,
+                waveSuccessThresholds=self.wf_input.waveSuccessThresholds,
             ),
             id=workflow.info().workflow_id + "_SystemPatchWorkflow_Cluster_V7-target_cluster:" + target_cluster,
         )
+        # the completed clusters are only part of the published progress, not of get_completed_steps
+        self._publish_progress("_process_target_cluster " + target_cluster)
 
 
 @dataclass
 class SystemPatchWorkflow_ClusterInput:
     targetCluster: str
     pilotHostCount: int
+    # max number of host child workflows running at the same time, 0 means no limit
+    maxInFlightHosts: int = 0
+    # max percentage of the cluster hosts that can be under update at the same time, 0 means no limit
+    maxUnavailablePercentage: int = 0
+    # number of hosts processed per run before continuing as new, 0 means all the hosts in one run
+    hostPageSize: int = 0
+    # position of the first host to process in this run
+    cursor: int = 0
+    # number of hosts processed by the previous runs
+    processedHostCount: int = 0
+    # number of hosts patched by each host batch child workflow, 0 means one child workflow per host
+    hostBatchSize: int = 0
+    # activities (by name) that run as local activities
+    localActivities: List[str] = field(default_factory=list)
+    # activity name -> task queue, the other activities run in the workflow task queue
+    activityTaskQueues: Dict[str, str] = field(default_factory=dict)
+    # hosts of each rollout wave, the remaining hosts are the last wave; empty means the pilot hosts then the rest
+    waveSizes: List[int] = field(default_factory=list)
+    # percentage of the hosts of each wave (and of the remaining hosts) that have to be patched, 100 when not set
+    waveSuccessThresholds: List[int] = field(default_factory=list)
+    # number of hosts of the cluster (all the pages), 0 until the first page is fetched
+    clusterHostCount: int = 0
+    # number of hosts that failed in the previous runs, they stay unavailable
+    unavailableHostCount: int = 0
+    # patched and failed hosts of each wave in the previous runs, the gate of a wave spanning several pages
+    # applies to all its hosts
+    wavePatchedHostCounts: List[int] = field(default_factory=list)
+    waveFailedHostCounts: List[int] = field(default_factory=list)
 
 
 @workflow.defn
 class SystemPatchWorkflow_Cluster_V7:
 
     def __init__(self):
-        self.wf_input: SystemPatchWorkflowInput = None
+        self.wf_input: SystemPatchWorkflow_ClusterInput = None
+        self.host_slots: Optional[asyncio.Semaphore] = None
+        # max number of hosts under update or failed at the same time, 0 means no limit (maxUnavailablePercentage)
+        self.max_unavailable_hosts = 0
+        # hosts under update, and hosts under update or failed (with the ones carried from the previous runs)
+        self.in_flight_host_count = 0
+        self.unavailable_host_count = 0
+        # patched and failed hosts of each wave, with the ones of the previous runs
+        self.wave_patched_host_counts: List[int] = []
+        self.wave_failed_host_counts: List[int] = []
 
     @workflow.run
     async def run(self, wf_input: SystemPatchWorkflow_ClusterInput) -> None:
         self.wf_input = wf_input
 
         #  Get cluster hosts using `GetClusterHostsActivity`.
-        get_cluster_hosts_response = await workflow.execute_activity_method(
+        get_cluster_hosts_response = await execute_activity(
+            self.wf_input.activityTaskQueues,
             activity=MyActivities.get_cluster_hosts_activity,
             arg=GetClusterHostsActivityInput(
                 targetCluster=wf_input.targetCluster,
+                cursor=wf_input.cursor,
+                pageSize=wf_input.hostPageSize,
                 # ...
             ),
             start_to_close_timeout=timedelta(seconds=2),
             retry_policy=RetryPolicy(maximum_attempts=3)
         )
 
-        try:
-            # * Process **pilot hosts**:
-            pilot_hosts = get_cluster_hosts_response.hostnames[:self.wf_input.pilotHostCount]
-            await self._process_pilot_hosts(pilot_hosts)
+        hostnames = get_cluster_hosts_response.hostnames
+
+        # maxUnavailablePercentage applies to the hosts of the whole cluster, not to the current page
+        cluster_host_count = self.wf_input.clusterHostCount or get_cluster_hosts_response.totalHostCount
+        if not cluster_host_count:
+            # the activity doesn't report the cluster size, only the hosts seen so far are known
+            cluster_host_count = self.wf_input.processedHostCount + len(hostnames)
+        self.unavailable_host_count = self.wf_input.unavailableHostCount
+        if self.wf_input.maxUnavailablePercentage > 0:
+            # at least one host has to be processed to make progress
+            self.max_unavailable_hosts = max(1, cluster_host_count * self.wf_input.maxUnavailablePercentage // 100)
+            workflow.logger.debug("at most %s hosts unavailable at a time", self.max_unavailable_hosts)
+
+        window = self.wf_input.maxInFlightHosts
+        if window > 0 and self.wf_input.hostBatchSize > 0:
+            # in batch mode the window limits the number of host batches running at the same time
+            window = max(1, window // self.wf_input.hostBatchSize)
+        if window > 0:
+            workflow.logger.debug("processing at most %s hosts at a time", window)
+            self.host_slots = asyncio.Semaphore(window)
 
-            # * Process remaining hosts
-            remaining_hosts = get_cluster_hosts_response.hostnames[self.wf_input.pilotHostCount:]
-            await self._process_remaining_hosts(remaining_hosts)
+        try:
+            # * Process the waves, the first one is the **pilot hosts** without waveSizes.
+            # The waves can span several pages, the counts of the previous pages are carried by the input.
+            waves = rollout_waves(self.wf_input.waveSizes, self.wf_input.waveSuccessThresholds,
+                                  self.wf_input.pilotHostCount)
+            self.wave_patched_host_counts = padded(self.wf_input.wavePatchedHostCounts, len(waves))
+            self.wave_failed_host_counts = padded(self.wf_input.waveFailedHostCounts, len(waves))
+            for i, wave in enumerate(waves):
+                wave_hosts = wave.hosts(hostnames, self.wf_input.processedHostCount)
+                if wave_hosts:
+                    await self._process_wave(i, wave, wave_hosts, cluster_host_count)
 
         except TemporalError as e:
             workflow.logger.info("Simulating cleanup for cluster [%s] after error [%s]", wf_input.targetCluster, e)
             await asyncio.sleep(2)
-            pass
-
-    async def _process_pilot_hosts(self, pilot_hosts: List[str]):
-        workflow.logger.debug("processing pilot hosts %s", pilot_hosts)
-
-        await self._process_hosts(pilot_hosts)
-
-    async def _process_remaining_hosts(self, remaining_hosts: List[str]):
-        workflow.logger.debug("processing remaining hosts %s", remaining_hosts)
-
-        await self._process_hosts(remaining_hosts)
-
-    async def _process_hosts(self, hosts):
-        tasks = [asyncio.create_task(
-            workflow.execute_child_workflow(
-                SystemPatchWorkflow_Host_V7.run,
-                SystemPatchWorkflow_HostInput(
-                    host=host,
-                ),
-                id=workflow.info().workflow_id + "_SystemPatchWorkflow_Host_V7-host:" + host,
+            return
+
+        processed_host_count = self.wf_input.processedHostCount + len(hostnames)
+
+        if get_cluster_hosts_response.nextCursor is not None:
+            # Continue as new to process the next page, this keeps the event history
+            # (and the replay cost) bounded no matter how many hosts the cluster has.
+            workflow.continue_as_new(
+                dataclasses.replace(
+                    self.wf_input,
+                    cursor=get_cluster_hosts_response.nextCursor,
+                    processedHostCount=processed_host_count,
+                    clusterHostCount=cluster_host_count,
+                    unavailableHostCount=self.unavailable_host_count,
+                    wavePatchedHostCounts=self.wave_patched_host_counts,
+                    waveFailedHostCounts=self.wave_failed_host_counts,
+                )
             )
-        ) for host in hosts]
+
+        workflow.logger.info("Cluster [%s] completed, %s hosts processed", wf_input.targetCluster,
+                             processed_host_count)
+
+    async def _process_wave(self, i: int, wave: Wave, hosts: List[str], cluster_host_count: int):
+        # the hosts of the wave that failed in the previous pages use up part of the allowed failures
+        max_failures = allowed_failures(wave.size(cluster_host_count), wave.successThreshold)
+        max_failures -= self.wave_failed_host_counts[i]
+        workflow.logger.debug("processing wave %s, hosts %s, at most %s failed hosts", i, hosts, max_failures)
+
+        failed_host_count = await self._process_hosts(hosts, max_failures)
+        self.wave_failed_host_counts[i] += failed_host_count
+        self.wave_patched_host_counts[i] += len(hosts) - failed_host_count
+        if failed_host_count:
+            workflow.logger.info("Cluster [%s] wave %s: %s hosts patched, %s not patched",
+                                 self.wf_input.targetCluster, i, self.wave_patched_host_counts[i],
+                                 self.wave_failed_host_counts[i])
+
+    async def _process_hosts(self, hosts, max_failures: int = 0) -> int:
+        # returns the number of hosts not patched (failed, or skipped by their preconditions check),
+        # fails when there are more than max_failures
+        failed_host_count = 0
+
+        async def process_unit(process, unit, unit_host_count: int):
+            nonlocal failed_host_count
+            try:
+                patched_host_count = await self._run_in_window(process, unit, unit_host_count)
+            except ChildWorkflowError:
+                # all the hosts of a failed host batch are counted as failed
+                failed_host_count += unit_host_count
+                if failed_host_count > max_failures:
+                    raise
+                return
+            if patched_host_count is None:
+                # the child workflows started before they returned the patched hosts
+                patched_host_count = unit_host_count
+            failed_host_count += unit_host_count - patched_host_count
+            if failed_host_count > max_failures:
+                raise ApplicationError(f"{failed_host_count} hosts not patched, at most {max_failures} allowed")
+
+        if self.wf_input.hostBatchSize > 0:
+            batch_size = self.wf_input.hostBatchSize
+            # a new host batch child workflow is started as soon as one of the running ones completes
+            tasks = [asyncio.create_task(
+                process_unit(self._process_host_batch, hosts[i:i + batch_size], len(hosts[i:i + batch_size]))
+            ) for i in range(0, len(hosts), batch_size)]
+        else:
+            # a new host child workflow is started as soon as one of the running ones completes
+            tasks = [asyncio.create_task(
+                process_unit(self._process_host, host, 1)
+            ) for host in hosts]
 
         try:
             await asyncio.gather(*tasks)
-        except ChildWorkflowError as e:
+        except TemporalError as e:
             for t in tasks:
                 # cancel all remaining child workflows
                 t.cancel()
             await asyncio.gather(*tasks, return_exceptions=True)
             raise e
 
-    async def _process_host(self, host):
+        return failed_host_count
+
+    async def _run_in_window(self, process, hosts, host_count: int):
+        if self.host_slots is None:
+            return await self._run_unavailable(process, hosts, host_count)
+
+        async with self.host_slots:
+            return await self._run_unavailable(process, hosts, host_count)
+
+    async def _run_unavailable(self, process, hosts, host_count: int):
+        # the hosts are unavailable while they are under update, and stay unavailable if they fail
+        if self.max_unavailable_hosts > 0:
+            while not self._can_take_down(host_count):
+                await workflow.wait_condition(lambda: self._can_take_down(host_count))
+            failed_host_count = self.unavailable_host_count - self.in_flight_host_count
+            if failed_host_count >= self.max_unavailable_hosts:
+                raise ApplicationError(f"{failed_host_count} hosts failed, at most {self.max_unavailable_hosts} "
+                                       f"hosts can be unavailable")
+
+        self.in_flight_host_count += host_count
+        self.unavailable_host_count += host_count
+        try:
+            patched_host_count = await process(hosts)
+        finally:
+            self.in_flight_host_count -= host_count
+        # patched, or skipped by their preconditions check, the hosts are available again
+        self.unavailable_host_count -= host_count
+        return patched_host_count
+
+    def _can_take_down(self, host_count: int) -> bool:
+        # a unit bigger than the budget runs alone
+        return (self.unavailable_host_count + host_count <= self.max_unavailable_hosts
+                or self.in_flight_host_count == 0)
+
+    async def _process_host(self, host) -> int:
         return await workflow.execute_child_workflow(
             SystemPatchWorkflow_Host_V7.run,
             SystemPatchWorkflow_HostInput(
                 host=host,
+                targetCluster=self.wf_input.targetCluster,
+                localActivities=self.wf_input.localActivities,
+                activityTaskQueues=self.wf_input.activityTaskQueues,
             ),
-            id=workflow.info().workflow_id+"_SystemPatchWorkflow_Host_V7-host:" + host,
+            id=workflow.info().workflow_id + "_SystemPatchWorkflow_Host_V7-host:" + host,
+        )
+
+    async def _process_host_batch(self, hosts: List[str]) -> int:
+        return await workflow.execute_child_workflow(
+            SystemPatchWorkflow_HostBatch_V7.run,
+            SystemPatchWorkflow_HostBatchInput(
+                hosts=hosts,
+                targetCluster=self.wf_input.targetCluster,
+                localActivities=self.wf_input.localActivities,
+                activityTaskQueues=self.wf_input.activityTaskQueues,
+            ),
+            id=workflow.info().workflow_id + "_SystemPatchWorkflow_HostBatch_V7-host:" + hosts[0],
         )
 
 
 @dataclass
 class SystemPatchWorkflow_HostInput:
     host: str
+    # cluster of the host, label of the hosts patched metric
+    targetCluster: str = ""
+    # activities (by name) that run as local activities
+    localActivities: List[str] = field(default_factory=list)
+    # activity name -> task queue, the other activities run in the workflow task queue
+    activityTaskQueues: Dict[str, str] = field(default_factory=dict)
 
 
 @workflow.defn
@@ -216,7 +450,8 @@ class SystemPatchWorkflow_Host_V7:
         self.wf_input: SystemPatchWorkflow_HostInput = None
 
     @workflow.run
-    async def run(self, wf_input: SystemPatchWorkflow_HostInput) -> None:
+    async def run(self, wf_input: SystemPatchWorkflow_HostInput) -> int:
+        # returns the number of patched hosts, 0 when the host doesn't meet the preconditions
         self.wf_input = wf_input
         host = wf_input.host
 
@@ -225,19 +460,24 @@ class SystemPatchWorkflow_Host_V7:
         try:
 
             # Execute `CheckHostPreconditionsActivity`.
-            check_host_preconditions_activity_result = await workflow.execute_activity_method(
+            check_host_preconditions_activity_result = await execute_activity(
+                self.wf_input.activityTaskQueues,
                 activity=MyActivities.check_host_preconditions_activity,
                 arg=CheckHostPreconditionsActivityInput(
                     hostname=host,
                     # ...
                 ),
+                # check_host_preconditions_activity takes between 6 and 10 seconds, it times out (Exercise 6),
+                # SystemPatchWorkflow_HostBatch_V7 gives the batch check the time it needs
                 start_to_close_timeout=timedelta(seconds=5),
                 retry_policy=RetryPolicy(maximum_attempts=3)
             )
 
             if not check_host_preconditions_activity_result.preconditionsMet:
                 # If false, execute `SendFailureAlertActivity` and terminate.
-                await workflow.execute_activity_method(
+                await execute_step(
+                    self.wf_input.localActivities,
+                    self.wf_input.activityTaskQueues,
                     activity=MyActivities.send_failure_alert_activity,
                     arg=SendFailureAlertActivityInput(
                         hostname=host,
@@ -247,10 +487,11 @@ class SystemPatchWorkflow_Host_V7:
                     retry_policy=RetryPolicy(maximum_attempts=3)
                 )
 
-                return
+                return 0
 
             ## execute patching activities
-            await workflow.execute_activity_method(
+            await execute_activity(
+                self.wf_input.activityTaskQueues,
                 activity=MyActivities.run_pre_downtime_scripts_activity,
                 arg=RunPreDowntimeScriptsActivityInput(
                     hostname=host,
@@ -268,7 +509,8 @@ class SystemPatchWorkflow_Host_V7:
 
             #skip run_pre_update_scripts_activity
 
-            await workflow.execute_activity_method(
+            await execute_activity(
+                self.wf_input.activityTaskQueues,
                 activity=MyActivities.perform_update_activity,
                 arg=PerformUpdateActivityInput(
                     hostname=host,
@@ -283,7 +525,8 @@ class SystemPatchWorkflow_Host_V7:
 
             #skip run_post_update_scripts_activity
 
-            await workflow.execute_activity_method(
+            await execute_activity(
+                self.wf_input.activityTaskQueues,
                 activity=MyActivities.check_service_health_activity,
                 arg=CheckServiceHealthActivityInput(
                     hostname=host,
@@ -297,9 +540,13 @@ class SystemPatchWorkflow_Host_V7:
                 )
             )
 
+            record_hosts_patched(self.wf_input.targetCluster, 1)
+
         except ActivityError as e:
             # * If any patching activity fails, execute `SendFailureAlertActivity` and terminate.
-            await workflow.execute_activity_method(
+            await execute_step(
+                self.wf_input.localActivities,
+                self.wf_input.activityTaskQueues,
                 activity=MyActivities.send_failure_alert_activity,
                 arg=SendFailureAlertActivityInput(
                     hostname=host,
@@ -312,7 +559,9 @@ class SystemPatchWorkflow_Host_V7:
             raise e
 
         try:
-            await workflow.execute_activity_method(
+            await execute_step(
+                self.wf_input.localActivities,
+                self.wf_input.activityTaskQueues,
                 activity=MyActivities.send_success_notification_activity,
                 arg=SendSuccessNotificationActivityInput(
                     hostname=host,
@@ -324,3 +573,136 @@ class SystemPatchWorkflow_Host_V7:
         except ActivityError:
             # TODO ignore ?
             pass
+
+        return 1
+
+
+@dataclass
+class SystemPatchWorkflow_HostBatchInput:
+    hosts: List[str]
+    # cluster of the hosts, label of the hosts patched metric
+    targetCluster: str = ""
+    # activities (by name) that run as local activities
+    localActivities: List[str] = field(default_factory=list)
+    # activity name -> task queue, the other activities run in the workflow task queue
+    activityTaskQueues: Dict[str, str] = field(default_factory=dict)
+
+
+@workflow.defn
+class SystemPatchWorkflow_HostBatch_V7:
+    # Same steps as SystemPatchWorkflow_Host_V7, but each activity patches all the hosts in the batch,
+    # which reduces the number of activity round trips and history events per host.
+
+    def __init__(self):
+        self.wf_input: SystemPatchWorkflow_HostBatchInput = None
+
+    @workflow.run
+    async def run(self, wf_input: SystemPatchWorkflow_HostBatchInput) -> int:
+        # returns the number of patched hosts, the hosts that don't meet the preconditions are not patched
+        self.wf_input = wf_input
+        hosts = wf_input.hosts
+
+        workflow.logger.debug("processing host batch %s", hosts)
+
+        # Execute `CheckHostPreconditionsActivity`.
+        check_host_preconditions_activity_result = await execute_activity(
+            self.wf_input.activityTaskQueues,
+            activity=MyActivities.check_host_preconditions_batch_activity,
+            arg=CheckHostPreconditionsBatchActivityInput(
+                hostnames=hosts,
+                # ...
+            ),
+            # the hosts are checked concurrently, each check takes between 6 and 10 seconds
+            start_to_close_timeout=timedelta(seconds=30),
+            retry_policy=RetryPolicy(maximum_attempts=3)
+        )
+
+        # If false, execute `SendFailureAlertActivity` and terminate (the host).
+        await self._send_failure_alerts([result.hostname for result in check_host_preconditions_activity_result.results
+                                         if not result.preconditionsMet])
+
+        hosts = [result.hostname for result in check_host_preconditions_activity_result.results
+                 if result.preconditionsMet]
+        if not hosts:
+            return 0
+
+        try:
+            ## execute patching activities
+            await execute_activity(
+                self.wf_input.activityTaskQueues,
+                activity=MyActivities.run_pre_downtime_scripts_batch_activity,
+                arg=RunPreDowntimeScriptsBatchActivityInput(
+                    hostnames=hosts,
+                    # ...
+                ),
+                start_to_close_timeout=timedelta(seconds=10),
+                retry_policy=RetryPolicy(maximum_attempts=3)
+            )
+
+            await execute_activity(
+                self.wf_input.activityTaskQueues,
+                activity=MyActivities.perform_update_batch_activity,
+                arg=PerformUpdateBatchActivityInput(
+                    hostnames=hosts,
+                    # ...
+                ),
+                start_to_close_timeout=timedelta(seconds=30),
+                retry_policy=RetryPolicy(maximum_attempts=3)
+            )
+
+            await execute_activity(
+                self.wf_input.activityTaskQueues,
+                activity=MyActivities.check_service_health_batch_activity,
+                arg=CheckServiceHealthBatchActivityInput(
+                    hostnames=hosts,
+                    # ...
+                ),
+                start_to_close_timeout=timedelta(seconds=10),
+                retry_policy=RetryPolicy(
+                    maximum_attempts=10,
+                    initial_interval=timedelta(seconds=1),
+                    backoff_coefficient=1
+                )
+            )
+
+            record_hosts_patched(self.wf_input.targetCluster, len(hosts))
+
+        except ActivityError as e:
+            # * If any patching activity fails, execute `SendFailureAlertActivity` for the failed hosts and terminate.
+            failed_hosts = hosts
+            if isinstance(e.cause, ApplicationError) and e.cause.details:
+                failed_hosts = e.cause.details[0]
+            await self._send_failure_alerts(failed_hosts)
+
+            raise e
+
+        try:
+            await execute_step(
+                self.wf_input.localActivities,
+                self.wf_input.activityTaskQueues,
+                activity=MyActivities.send_success_notification_batch_activity,
+                arg=SendSuccessNotificationBatchActivityInput(
+                    hostnames=hosts,
+                    # ...
+                ),
+                start_to_close_timeout=timedelta(seconds=10),
+                retry_policy=RetryPolicy(maximum_attempts=3)
+            )
+        except ActivityError:
+            # TODO ignore ?
+            pass
+
+        return len(hosts)
+
+    async def _send_failure_alerts(self, hosts: List[str]):
+        await asyncio.gather(*[execute_step(
+            self.wf_input.localActivities,
+            self.wf_input.activityTaskQueues,
+            activity=MyActivities.send_failure_alert_activity,
+            arg=SendFailureAlertActivityInput(
+                hostname=host,
+                # ...
+            ),
+            start_to_close_timeout=timedelta(seconds=5),
+            retry_policy=RetryPolicy(maximum_attempts=3)
+        ) for host in hosts])
@@ -0,0 +1,46 @@
+from typing import Callable, Dict, List
+
+# Task queues of the SystemPatchWorkflow_V7 activities.
+#
+# By default the activities run in the task queue of the workflows. The slow activities (several seconds per host)
+# hold activity slots that the short ones (notifications, vault, cluster hosts) need, and the short ones wait
+# behind them. Routing each class to its own task queue, polled by its own worker pool with its own
+# concurrency limit, avoids that.
+#
+# SystemPatchWorkflowInput.activityTaskQueues = ACTIVITY_TASK_QUEUES routes the activities,
+# temporal_worker and temporal_worker_v8 --activity-task-queues run a worker pool for each task queue.
+
+slow_activities_queue = "system_patch-slow-activities-task-queue"
+fast_activities_queue = "system_patch-fast-activities-task-queue"
+
+slow_activities = [
+    "check_host_preconditions_activity",
+    "run_pre_downtime_scripts_activity",
+    "perform_update_activity",
+    "check_service_health_activity",
+    "check_host_preconditions_batch_activity",
+    "run_pre_downtime_scripts_batch_activity",
+    "perform_update_batch_activity",
+    "check_service_health_batch_activity",
+]
+
+fast_activities = [
+    "send_approval_request_activity",
+    "vault_client_activity",
+    "get_cluster_hosts_activity",
+    "send_success_notification_activity",
+    "send_failure_alert_activity",
+    "send_final_success_notification_activity",
+    "send_success_notification_batch_activity",
+]
+
+# activity name -> task queue
+ACTIVITY_TASK_QUEUES: Dict[str, str] = {
+    **{name: slow_activities_queue for name in slow_activities},
+    **{name: fast_activities_queue for name in fast_activities},
+}
+
+
+def activities_for_task_queue(activities: List[Callable], task_queue: str) -> List[Callable]:
+    # the activities (from `activities()`) routed to task_queue
+    return [a for a in activities if ACTIVITY_TASK_QUEUES.get(a.__name__) == task_queue]
@@ -1,19 +1,48 @@
+import dataclasses
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
-class MyVaultClient:
-    async def do_something(self) -> None:
-        print("doing something...")
+def frozen_dataclass(cls):
+    # Frozen dataclass with __slots__, the instances don't have a per-instance __dict__, which reduces
+    # the memory used by the workflows kept in the worker cache.
+    # Same as @dataclass(frozen=True, slots=True), that is only available from python 3.10.
+    cls = dataclass(frozen=True)(cls)
 
+    field_names = tuple(f.name for f in dataclasses.fields(cls))
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+    for field_name in field_names:
+        # the defaults are in the generated __init__, the class attributes would conflict with the slots
+        cls_dict.pop(field_name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
 
-@dataclass
+    # frozen instances with slots can't be unpickled with the default __setstate__
+    cls_dict["__getstate__"] = _frozen_getstate
+    cls_dict["__setstate__"] = _frozen_setstate
+
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+    return slotted_cls
+
+
+def _frozen_getstate(self):
+    return [getattr(self, f.name) for f in dataclasses.fields(self)]
+
+
+def _frozen_setstate(self, state):
+    for f, value in zip(dataclasses.fields(self), state):
+        object.__setattr__(self, f.name, value)
+
+
+@frozen_dataclass
 class VaultResponse:
     address: str = "address"
     token: str = "default-token"
 
 
-@dataclass
+@frozen_dataclass
 class DeployPostgresClusterWorkflowInput:
     clusterName: str = "default-cluster"
     version: str = "latest"
@@ -29,7 +58,7 @@ class DeployPostgresClusterWorkflowInput:
     secretPathPrefix: str = "default-prefix"
 
 
-@dataclass
+@frozen_dataclass
 class CheckPreconditionsActivityInput:
     clusterName: str = "default-cluster"
     nodeCount: int = 1
@@ -40,12 +69,12 @@ class CheckPreconditionsActivityInput:
     requesterEmail: str = "default@example.com"
 
 
-@dataclass
+@frozen_dataclass
 class VaultClientActivityInput:
     vaultAddress: str = "https://vault.example.com:8200"
 
 
-@dataclass
+@frozen_dataclass
 class ProvisionVirtualMachinesActivityInput:
     clusterName: str = "default-cluster"
     nodeCount: int = 1
@@ -55,7 +84,7 @@ class ProvisionVirtualMachinesActivityInput:
     openstackProject: str = "default-project"
 
 
-@dataclass
+@frozen_dataclass
 class InstallPostgresSoftwareActivityInput:
     vmAddresses: List[str] = field(default_factory=list)
     version: str = "latest"
@@ -63,7 +92,7 @@ class InstallPostgresSoftwareActivityInput:
     sshKeyPaths: dict = field(default_factory=dict)
 
 
-@dataclass
+@frozen_dataclass
 class ConfigurePostgresClusterActivityInput:
     vmAddresses: List[str] = field(default_factory=list)
     clusterName: str = "default-cluster"
@@ -71,14 +100,14 @@ class ConfigurePostgresClusterActivityInput:
     adminPasswordPath: str = "default-admin-password-path"
 
 
-@dataclass
+@frozen_dataclass
 class PerformInitialBackupActivityInput:
     vmAddresses: List[str] = field(default_factory=list)
     clusterName: str = "default-cluster"
     vaultClient: VaultResponse = field(default_factory=VaultResponse)
 
 
-@dataclass
+@frozen_dataclass
 class NotifyDeploymentCompletionActivityInput:
     clusterName: str = "default-cluster"
     vmAddresses: List[str] = field(default_factory=list)
@@ -89,7 +118,7 @@ class NotifyDeploymentCompletionActivityInput:
     backupMetadataPath: str = "default-backup-metadata-path"
 
 
-@dataclass
+@frozen_dataclass
 class HandleFailureActivityInput:
     clusterName: str = "default-cluster"
     requesterEmail: str = "default@example.com"
@@ -101,7 +130,7 @@ class HandleFailureActivityInput:
 
 # SystemPatchWorkflow
 
-@dataclass
+@frozen_dataclass
 class SystemPatchWorkflowInput:
     targetClusters: List[str] = field(default_factory=list)
     pilotHostCount: int = 0
@@ -112,8 +141,29 @@ class SystemPatchWorkflowInput:
     secretPathPrefix: str = "default-prefix"
     updateCommand: str = "default-update-command"
     serviceList: List[str] = field(default_factory=list)
-
-@dataclass
+    # max number of host child workflows running at the same time per cluster, 0 means no limit
+    maxInFlightHosts: int = 0
+    # max percentage of the cluster hosts that can be under update at the same time, 0 means no limit
+    maxUnavailablePercentage: int = 0
+    # number of hosts processed per cluster workflow run before continuing as new, 0 means all the hosts in one run
+    hostPageSize: int = 0
+    # number of hosts patched by each host batch child workflow, 0 means one child workflow per host
+    hostBatchSize: int = 0
+    # activities (by name) that run as local activities, e.g. ["vault_client_activity"]
+    localActivities: List[str] = field(default_factory=list)
+    # upsert the completed steps to the `PatchCompletedSteps` search attribute, it has to be registered in the namespace
+    publishProgress: bool = False
+    # activity name -> task queue, e.g. ACTIVITY_TASK_QUEUES in task_queues.py, the other activities run in the
+    # workflow task queue
+    activityTaskQueues: Dict[str, str] = field(default_factory=dict)
+    # hosts of each rollout wave per cluster, e.g. [1, 5, 25], the remaining hosts are the last wave (see waves.py),
+    # empty means the pilotHostCount hosts then the rest
+    waveSizes: List[int] = field(default_factory=list)
+    # percentage of the hosts of each wave (and of the remaining hosts) that have to be patched to start the next wave
+    # and complete the cluster, 100 when not set
+    waveSuccessThresholds: List[int] = field(default_factory=list)
+
+@frozen_dataclass
 class SendApprovalRequestActivityInput:
     targetClusters: List[str] = field(default_factory=list)
     approverEmails: List[str] = field(default_factory=list)
@@ -121,92 +171,100 @@ class SendApprovalRequestActivityInput:
 
 
 
-@dataclass
+@frozen_dataclass
 class GetClusterHostsActivityInput:
     targetCluster: str = "default-cluster"
+    # position of the first host to return
+    cursor: int = 0
+    # max number of hosts to return, 0 means all the hosts
+    pageSize: int = 0
 
 
 
-@dataclass
+@frozen_dataclass
 class GetClusterHostsActivityOutput:
     hostnames: List[str] = field(default_factory=list)
+    # cursor of the next page, None if there are no more hosts
+    nextCursor: Optional[int] = None
+    # number of hosts of the cluster (all the pages), None if not reported
+    totalHostCount: Optional[int] = None
 
 
 
-@dataclass
+@frozen_dataclass
 class CheckHostPreconditionsActivityInput:
     hostname: str = "default-hostname"
 
 
 
-@dataclass
+@frozen_dataclass
 class CheckHostPreconditionsActivityOutput:
     preconditionsMet: bool = False
     sshPrivateKey: str = "default-ssh-key"
 
 
 
-@dataclass
+@frozen_dataclass
 class SendStartNotificationActivityInput:
     hostname: str = "default-hostname"
     requesterEmail: str = "default@example.com"
 
 
 
-@dataclass
+@frozen_dataclass
 class RunPreDowntimeScriptsActivityInput:
     hostname: str = "default-hostname"
 
 
 
-@dataclass
+@frozen_dataclass
 class SetMaintenanceModeActivityInput:
     hostname: str = "default-hostname"
 
 
 
-@dataclass
+@frozen_dataclass
 class StopServicesActivityInput:
     hostname: str = "default-hostname"
     serviceList: List[str] = field(default_factory=list)
 
 
 
-@dataclass
+@frozen_dataclass
 class WaitForWorkloadDrainActivityInput:
     hostname: str = "default-hostname"
 
 
 
-@dataclass
+@frozen_dataclass
 class RunPreUpdateScriptsActivityInput:
     hostname: str = "default-hostname"
     preUpdateScripts: Optional[List[str]] = None
 
 
 
-@dataclass
+@frozen_dataclass
 class PerformUpdateActivityInput:
     hostname: str = "default-hostname"
     updateCommand: str = "default-update-command"
 
 
 
-@dataclass
+@frozen_dataclass
 class StartServicesActivityInput:
     hostname: str = "default-hostname"
     serviceList: List[str] = field(default_factory=list)
 
 
 
-@dataclass
+@frozen_dataclass
 class RunPostUpdateScriptsActivityInput:
     hostname: str = "default-hostname"
     postUpdateScripts: Optional[List[str]] = None
 
 
 
-@dataclass
+@frozen_dataclass
 class CheckServiceHealthActivityInput:
     hostname: str = "default-hostname"
     serviceList: List[str] = field(default_factory=list)
@@ -216,19 +274,72 @@ class CheckServiceHealthActivityInput:
 
 
 
-@dataclass
+@frozen_dataclass
 class SendSuccessNotificationActivityInput:
     hostname: str = "default-hostname"
     requesterEmail: str = "default@example.com"
 
 
 
-@dataclass
+@frozen_dataclass
 class SendFinalSuccessNotificationActivityInput:
     pass
 
-@dataclass
+@frozen_dataclass
 class SendFailureAlertActivityInput:
     hostname: str = "default-hostname"
     failureDetails: str = "default-failure-details"
     requesterEmail: str = "default@example.com"
+
+
+# Batch variants, each activity invocation processes a list of hosts
+
+@frozen_dataclass
+class HostResult:
+    hostname: str = "default-hostname"
+    success: bool = False
+
+
+@frozen_dataclass
+class HostBatchActivityOutput:
+    results: List[HostResult] = field(default_factory=list)
+
+
+@frozen_dataclass
+class HostPreconditionsResult:
+    hostname: str = "default-hostname"
+    preconditionsMet: bool = False
+    sshPrivateKey: str = "default-ssh-key"
+
+
+@frozen_dataclass
+class CheckHostPreconditionsBatchActivityInput:
+    hostnames: List[str] = field(default_factory=list)
+
+
+@frozen_dataclass
+class CheckHostPreconditionsBatchActivityOutput:
+    results: List[HostPreconditionsResult] = field(default_factory=list)
+
+
+@frozen_dataclass
+class RunPreDowntimeScriptsBatchActivityInput:
+    hostnames: List[str] = field(default_factory=list)
+
+
+@frozen_dataclass
+class PerformUpdateBatchActivityInput:
+    hostnames: List[str] = field(default_factory=list)
+    updateCommand: str = "default-update-command"
+
+
+@frozen_dataclass
+class CheckServiceHealthBatchActivityInput:
+    hostnames: List[str] = field(default_factory=list)
+    serviceList: List[str] = field(default_factory=list)
+
+
+@frozen_dataclass
+class SendSuccessNotificationBatchActivityInput:
+    hostnames: List[str] = field(default_factory=list)
+    requesterEmail: str = "default@example.com"
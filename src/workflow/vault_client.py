@@ -0,0 +1,102 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from random import uniform
+from typing import Callable, Dict, Optional
+
+from temporalio.common import MetricMeter
+
+from src.workflow.types import VaultResponse
+
+
+@dataclass
+class CachedToken:
+    response: VaultResponse
+    expires_at: float
+
+
+class MyVaultClient:
+    # One instance is shared by all the activities running in the worker process (see `activities(vault_client)`),
+    # so the tokens fetched by one activity are reused by the others until they expire.
+    #
+    # - tokens are evicted `token_ttl` after they were fetched
+    # - a token that is used `refresh_ahead` before it expires is refreshed in the background,
+    #   the caller gets the cached token without waiting
+    # - concurrent requests for a token that is not cached wait for the same vault request (single flight)
+
+    def __init__(self,
+                 token_ttl: timedelta = timedelta(minutes=5),
+                 refresh_ahead: timedelta = timedelta(seconds=30),
+                 metric_meter: Optional[MetricMeter] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.token_ttl = token_ttl
+        self.refresh_ahead = refresh_ahead
+        self.clock = clock
+
+        self.tokens: Dict[str, CachedToken] = {}
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+        self.hits_counter = None
+        self.misses_counter = None
+        if metric_meter:
+            self.hits_counter = metric_meter.create_counter(
+                "vault_token_cache_hits", "Vault tokens served from the cache")
+            self.misses_counter = metric_meter.create_counter(
+                "vault_token_cache_misses", "Vault tokens fetched from vault")
+
+    async def do_something(self) -> None:
+        print("doing something...")
+
+    async def get_token(self, address: str) -> VaultResponse:
+        cached_token = self.tokens.get(address)
+        now = self.clock()
+
+        if cached_token and now < cached_token.expires_at:
+            self.hits += 1
+            if self.hits_counter:
+                self.hits_counter.add(1)
+
+            refresh_at = cached_token.expires_at - self.refresh_ahead.total_seconds()
+            if now >= refresh_at and address not in self.in_flight:
+                # refresh ahead of expiry, without making the caller wait
+                self.refreshes += 1
+                self._fetch_token(address)
+
+            return cached_token.response
+
+        self.misses += 1
+        if self.misses_counter:
+            self.misses_counter.add(1)
+
+        # evict the expired token
+        self.tokens.pop(address, None)
+
+        # shield the shared request, cancelling one of the callers must not cancel it for the others
+        return await asyncio.shield(self._fetch_token(address))
+
+    def _fetch_token(self, address: str) -> asyncio.Future:
+        in_flight = self.in_flight.get(address)
+        if in_flight:
+            return in_flight
+
+        fetch = asyncio.ensure_future(self._request_token(address))
+        self.in_flight[address] = fetch
+
+        def on_done(f: asyncio.Future) -> None:
+            del self.in_flight[address]
+            if not f.cancelled() and f.exception() is None:
+                self.tokens[address] = CachedToken(f.result(), self.clock() + self.token_ttl.total_seconds())
+
+        fetch.add_done_callback(on_done)
+        return fetch
+
+    async def _request_token(self, address: str) -> VaultResponse:
+        # simulate the request to vault
+        await asyncio.sleep(uniform(0.1, 0.3))
+        return VaultResponse(address=address, token=str(uuid.uuid4()))
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Rollout waves of a cluster: the hosts are patched in waves of growing size (e.g. 1, 5, 25, then the remaining hosts),
+# a wave starts when the previous one completed with enough patched hosts. Each cluster workflow gates its own waves,
+# a cluster doesn't wait for the waves of the other clusters.
+#
+# Without wave sizes the waves are the pilot hosts and the remaining hosts, and all the hosts of a wave have to be
+# patched (the rollout of the cluster stops at the first failed host).
+
+# percentage of the hosts of a wave that have to be patched to start the next wave, when not set
+DEFAULT_SUCCESS_THRESHOLD = 100
+
+
+@dataclass
+class Wave:
+    # positions of the hosts of the wave in the cluster, the last wave has no end (the remaining hosts)
+    start: int
+    end: Optional[int]
+    # percentage of the hosts of the wave that have to be patched
+    successThreshold: int
+
+    def hosts(self, hostnames: List[str], first_position: int) -> List[str]:
+        # the hosts of the wave in a page of the cluster hosts, first_position is the position of the page
+        start = max(0, self.start - first_position)
+        if self.end is None:
+            return hostnames[start:]
+        return hostnames[start:max(0, self.end - first_position)]
+
+    def size(self, host_count: int) -> int:
+        # number of hosts of the wave in a cluster of host_count hosts (the wave can span several pages)
+        end = host_count if self.end is None else min(self.end, host_count)
+        return max(0, end - self.start)
+
+
+def check_waves(wave_sizes: List[int], success_thresholds: List[int]) -> None:
+    # ValueError if a wave has no hosts or a threshold is not a percentage
+    for size in wave_sizes:
+        if size <= 0:
+            raise ValueError(f"invalid wave size {size}, the waves need at least one host")
+    for threshold in success_thresholds:
+        if not 0 <= threshold <= 100:
+            raise ValueError(f"invalid wave success threshold {threshold}, it is a percentage (0 to 100)")
+
+
+def plan_waves(wave_sizes: List[int], success_thresholds: List[int], pilot_host_count: int = 0) -> List[Wave]:
+    # success_thresholds[i] applies to the wave i, the remaining hosts are the wave len(wave_sizes)
+    check_waves(wave_sizes, success_thresholds)
+    sizes = wave_sizes or [pilot_host_count]
+    waves = []
+    start = 0
+    for i in range(len(sizes) + 1):
+        threshold = success_thresholds[i] if i < len(success_thresholds) else DEFAULT_SUCCESS_THRESHOLD
+        end = start + sizes[i] if i < len(sizes) else None
+        waves.append(Wave(start=start, end=end, successThreshold=threshold))
+        start = end
+    return waves
+
+
+def allowed_failures(host_count: int, success_threshold: int) -> int:
+    # failed hosts that still let `success_threshold` percent of the hosts be patched
+    return host_count * (100 - success_threshold) // 100
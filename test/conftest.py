@@ -0,0 +1,53 @@
+from typing import List, Tuple
+
+import pytest
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+
+
+def pytest_addoption(parser):
+    parser.addoption("--record-histories", action="store_true",
+                     help="save the histories recorded by test_replay.py in test/histories")
+    parser.addoption("--max-replay-ms-per-event", type=float, default=10,
+                     help="fail the replay tests if a history takes longer to replay (per event)")
+    parser.addoption("--temporal-address",
+                     help="run the workflows on this server (e.g. localhost:7233 for `temporal server start-dev`) "
+                          "instead of the time-skipping test server, to record the histories of a real server")
+
+
+@pytest.fixture
+async def env(request):
+    address = request.config.getoption("--temporal-address")
+    if address:
+        yield WorkflowEnvironment.from_client(await Client.connect(address))
+        return
+
+    # the time-skipping test server is downloaded on first use, the tests that need it are skipped without it
+    try:
+        env = await WorkflowEnvironment.start_time_skipping()
+    except RuntimeError as e:
+        pytest.skip("time-skipping test environment not available: " + str(e))
+
+    try:
+        yield env
+    finally:
+        await env.shutdown()
+
+
+# (history, number of events, replay seconds) of the histories replayed by test_replay.py
+_replay_timings: List[Tuple[str, int, float]] = []
+
+
+@pytest.fixture
+def replay_timings() -> List[Tuple[str, int, float]]:
+    return _replay_timings
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _replay_timings:
+        return
+
+    terminalreporter.section("replay time per history")
+    terminalreporter.write_line(f"{'history':<90} {'events':>7} {'ms':>9} {'ms/event':>9}")
+    for name, events, seconds in sorted(_replay_timings, key=lambda timing: timing[1]):
+        terminalreporter.write_line(f"{name:<90} {events:>7} {seconds * 1000:>9.2f} {seconds * 1000 / events:>9.3f}")
@@ -0,0 +1,27 @@
+import inspect
+import typing
+
+import pytest
+
+from src.bench import mock_activities
+from src.workflow import activities, activities_v4, activities_v7, activity_definitions
+
+
+def activity_types(activities_class) -> typing.Dict[str, typing.Dict[str, type]]:
+    # name and type hints of the activities of the class
+    return {
+        name: typing.get_type_hints(method)
+        for name, method in inspect.getmembers(activities_class, inspect.isfunction)
+        if hasattr(method, "__temporal_activity_definition")
+    }
+
+
+@pytest.mark.parametrize("activities_class", [activities.MyActivities, activities_v4.MyActivities,
+                                              activities_v7.MyActivities, mock_activities.MockActivities])
+def test_activities_implement_the_definitions(activities_class):
+    definitions = activity_types(activity_definitions.MyActivities)
+    implementations = activity_types(activities_class)
+
+    # the batch activities are only implemented by activities_v7 and the mock ones
+    assert implementations.items() <= definitions.items()
+    assert set(definitions) - set(implementations) <= {name for name in definitions if "_batch_" in name}
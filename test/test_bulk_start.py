@@ -0,0 +1,50 @@
+import asyncio
+from typing import Dict, List
+
+from temporalio.service import RPCError, RPCStatusCode
+
+from src.temporal_client_v8 import bulk_start_workflows
+from src.workflow.types import SystemPatchWorkflowInput
+
+
+class StartedWorkflow:
+    def __init__(self, workflow_id: str) -> None:
+        self.id = workflow_id
+
+
+class RateLimitedClient:
+    # accepts the start requests after a few milliseconds, rejects the first attempts of some of them
+    def __init__(self, rejected_attempts: Dict[str, int], failing: List[str]) -> None:
+        self.rejected_attempts = rejected_attempts
+        self.failing = failing
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def start_workflow(self, workflow, wf_input, id: str, **options) -> StartedWorkflow:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if id in self.failing:
+                raise RPCError("invalid argument", RPCStatusCode.INVALID_ARGUMENT, b"")
+            if self.rejected_attempts.get(id, 0) > 0:
+                self.rejected_attempts[id] -= 1
+                raise RPCError("too many requests", RPCStatusCode.RESOURCE_EXHAUSTED, b"")
+            return StartedWorkflow(id)
+        finally:
+            self.in_flight -= 1
+
+
+async def test_bulk_start_bounds_requests_and_skips_failed_starts():
+    client = RateLimitedClient(rejected_attempts={"wf1": 2}, failing=["wf3"])
+    wf_input = SystemPatchWorkflowInput(targetClusters=["cluster1"], pilotHostCount=1)
+    failed = []
+
+    started = [handle.id async for handle in bulk_start_workflows(
+        client, [("wf" + str(i), wf_input) for i in range(10)], concurrency=3,
+        on_start_failed=lambda workflow_id, e: failed.append((workflow_id, e.status)))]
+
+    # the rate limited start is retried, the failed one doesn't stop the others
+    assert sorted(started) == sorted("wf" + str(i) for i in range(10) if i != 3)
+    assert failed == [("wf3", RPCStatusCode.INVALID_ARGUMENT)]
+    assert client.max_in_flight == 3
@@ -0,0 +1,94 @@
+import asyncio
+import dataclasses
+from datetime import timedelta
+from typing import List
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+
+from src.workflow.activities_v7 import MyActivities
+from src.workflow.checkpoint import ActivityCheckpoint
+from src.workflow.ssh import SshConnection, SshSessionPool
+from src.workflow.types import PerformUpdateActivityInput
+from src.workflow.vault_client import MyVaultClient
+
+
+class RecordingSshConnection(SshConnection):
+    def __init__(self, commands: List[str], block_on: str = "") -> None:
+        self.commands = commands
+        self.block_on = block_on
+
+    async def run(self, command: str) -> str:
+        self.commands.append(command)
+        if command == self.block_on:
+            # the worker dies while the command runs
+            await asyncio.Event().wait()
+        return command
+
+    def close(self) -> None:
+        pass
+
+
+def activities_recording(commands: List[str], block_on: str = "") -> MyActivities:
+    async def connector(host: str) -> SshConnection:
+        return RecordingSshConnection(commands, block_on)
+
+    return MyActivities(MyVaultClient(), SshSessionPool(connector))
+
+
+async def test_perform_update_resumes_from_last_checkpoint():
+    activity_input = PerformUpdateActivityInput(hostname="cluster1_host1", updateCommand="apt-get upgrade -y")
+
+    # first attempt, killed while installing
+    first_commands: List[str] = []
+    heartbeats = []
+    env = ActivityEnvironment()
+    env.on_heartbeat = lambda *details: heartbeats.append(details)
+    first_attempt = asyncio.create_task(
+        env.run(activities_recording(first_commands, block_on="apt-get upgrade -y").perform_update_activity,
+                activity_input))
+    while "apt-get upgrade -y" not in first_commands:
+        await asyncio.sleep(0.01)
+    env.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first_attempt
+
+    assert first_commands == ["apt-get upgrade -y --download-only", "apt-get upgrade -y"]
+    assert heartbeats[-1] == ({"completedStages": ["download"]},)
+
+    # retry, with the heartbeat details recorded by the first attempt
+    retry_commands: List[str] = []
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(env.info, attempt=2, heartbeat_details=list(heartbeats[-1]))
+    assert await env.run(activities_recording(retry_commands).perform_update_activity, activity_input)
+
+    assert retry_commands == ["apt-get upgrade -y", "apt-get upgrade -y --verify"]
+
+
+async def test_perform_update_first_attempt_runs_all_stages():
+    commands: List[str] = []
+    env = ActivityEnvironment()
+    assert await env.run(activities_recording(commands).perform_update_activity,
+                         PerformUpdateActivityInput(hostname="cluster1_host1", updateCommand="update"))
+
+    assert commands == ["update --download-only", "update", "update --verify"]
+
+
+async def test_heartbeats_are_throttled():
+    now = [0.0]
+    heartbeats = []
+    env = ActivityEnvironment()
+    env.on_heartbeat = lambda *details: heartbeats.append(details)
+
+    def send_heartbeats():
+        checkpoint = ActivityCheckpoint(heartbeat_interval=timedelta(seconds=1), clock=lambda: now[0])
+        checkpoint.heartbeat()
+        now[0] = 0.5
+        checkpoint.heartbeat()
+        checkpoint.heartbeat(force=True)
+        now[0] = 2
+        checkpoint.heartbeat()
+
+    env.run(send_heartbeats)
+
+    assert len(heartbeats) == 3
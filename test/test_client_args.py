@@ -0,0 +1,22 @@
+import pytest
+
+from src.temporal_client_v8 import parse_args
+
+
+@pytest.mark.parametrize("argv", [
+    ["--rate", "0"],
+    ["--rate", "-2"],
+    ["--concurrency", "0"],
+    ["--count", "-1"],
+    ["--count", "0"],
+], ids=["zero-rate", "negative-rate", "zero-concurrency", "negative-count", "zero-count"])
+def test_invalid_load_arguments(argv):
+    # argparse error, the load generator would divide by zero, hang, or start nothing
+    with pytest.raises(SystemExit):
+        parse_args(argv)
+
+
+def test_load_arguments():
+    args = parse_args(["--rate", "0.5", "--concurrency", "1", "--count", "1"])
+
+    assert (args.rate, args.concurrency, args.count) == (0.5, 1, 1)
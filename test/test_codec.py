@@ -0,0 +1,48 @@
+import os
+
+from temporalio.api.common.v1 import Payload
+
+from src.codec import CompressionCodec
+
+
+def json_payload(data: bytes) -> Payload:
+    return Payload(metadata={"encoding": b"json/plain", "messageType": b"GetClusterHostsActivityOutput"}, data=data)
+
+
+async def test_small_payload_is_not_compressed():
+    codec = CompressionCodec("zlib", threshold_bytes=1024)
+    payload = json_payload(b'{"hostnames": ["host1"]}')
+
+    assert await codec.encode([payload]) == [payload]
+
+
+async def test_incompressible_payload_is_not_wrapped():
+    codec = CompressionCodec("zlib", threshold_bytes=16)
+    payload = Payload(metadata={"encoding": b"binary/plain"}, data=os.urandom(4096))
+
+    assert await codec.encode([payload]) == [payload]
+
+
+async def test_encode_decode_round_trip():
+    codec = CompressionCodec("zlib", threshold_bytes=16)
+    payload = json_payload(b'{"hostnames": [' + b", ".join(b'"host%d"' % i for i in range(500)) + b"]}")
+
+    encoded = await codec.encode([payload])
+    assert encoded[0].metadata["encoding"] == b"binary/zlib"
+    assert len(encoded[0].data) < len(payload.data)
+
+    decoded = await codec.decode(encoded)
+    assert decoded == [payload]
+    assert decoded[0].data == payload.data
+    assert dict(decoded[0].metadata) == dict(payload.metadata)
+
+
+async def test_payload_not_encoded_by_the_codec_is_decoded_as_is():
+    codec = CompressionCodec("zlib")
+    payloads = [
+        json_payload(b'{"hostnames": ["host1"]}'),
+        Payload(metadata={"encoding": b"binary/plain"}, data=b"\x00\x01"),
+        Payload(metadata={"encoding": b"binary/msgpack"}, data=b"\x91\xa5host1"),
+    ]
+
+    assert await codec.decode(payloads) == payloads
@@ -0,0 +1,73 @@
+import dataclasses
+
+import pytest
+from temporalio.api.common.v1 import Payload
+
+from src.bench.converter_benchmark import sample, types_module_dataclasses
+from src.converter import MsgPackPayloadConverter
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_ClusterInput, \
+    SystemPatchWorkflow_HostBatchInput, SystemPatchWorkflow_HostInput
+from src.workflow.types import CheckHostPreconditionsBatchActivityOutput, GetClusterHostsActivityOutput, \
+    HostPreconditionsResult, RunPreUpdateScriptsActivityInput, SystemPatchWorkflowInput
+
+# optional dependency (poetry group msgpack)
+msgpack = pytest.importorskip("msgpack")
+
+
+def round_trip(value):
+    payload_converter = MsgPackPayloadConverter()
+    payloads = payload_converter.to_payloads([value])
+    # the dataclasses are encoded by the msgpack converter, not by the JSON fallback
+    assert payloads[0].metadata["encoding"] == b"binary/msgpack"
+    return payload_converter.from_payloads(payloads, [type(value)])[0]
+
+
+@pytest.mark.parametrize("cls", types_module_dataclasses(), ids=lambda cls: cls.__name__)
+def test_types_round_trip(cls):
+    value = sample(cls)
+
+    assert round_trip(value) == value
+
+
+@pytest.mark.parametrize("value", [
+    # Optional
+    GetClusterHostsActivityOutput(hostnames=["host1", "host2"]),
+    GetClusterHostsActivityOutput(hostnames=["host1", "host2"], nextCursor=2, totalHostCount=10),
+    RunPreUpdateScriptsActivityInput(hostname="host1"),
+    RunPreUpdateScriptsActivityInput(hostname="host1", preUpdateScripts=["drain.sh", "backup.sh"]),
+    # Dict
+    SystemPatchWorkflowInput(targetClusters=["cluster1"], activityTaskQueues={"perform_update_activity": "slow"}),
+    # nested list of dataclasses
+    CheckHostPreconditionsBatchActivityOutput(results=[
+        HostPreconditionsResult(hostname="host1", preconditionsMet=True, sshPrivateKey="key1"),
+        HostPreconditionsResult(hostname="host2", preconditionsMet=False, sshPrivateKey="key2"),
+    ]),
+    # workflow inputs (not frozen)
+    SystemPatchWorkflow_ClusterInput(targetCluster="cluster1", pilotHostCount=1, hostPageSize=2, cursor=2,
+                                     activityTaskQueues={"get_cluster_hosts_activity": "fast"}, waveSizes=[1, 5],
+                                     wavePatchedHostCounts=[1, 0], waveFailedHostCounts=[0, 1]),
+    SystemPatchWorkflow_HostInput(host="host1", targetCluster="cluster1", localActivities=["vault_client_activity"]),
+    SystemPatchWorkflow_HostBatchInput(hosts=["host1", "host2"], targetCluster="cluster1"),
+], ids=lambda value: type(value).__name__)
+def test_round_trip(value):
+    decoded = round_trip(value)
+
+    assert type(decoded) is type(value)
+    assert decoded == value
+
+
+def test_frozen_slots_round_trip():
+    decoded = round_trip(HostPreconditionsResult(hostname="host1", preconditionsMet=True))
+
+    assert not hasattr(decoded, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        decoded.hostname = "host2"
+
+
+def test_payload_without_the_new_fields():
+    # encoded before totalHostCount was added, the missing field gets its default value
+    payload = Payload(metadata={"encoding": b"binary/msgpack"}, data=msgpack.packb([["host1"], 1]))
+
+    decoded = MsgPackPayloadConverter().from_payloads([payload], [GetClusterHostsActivityOutput])[0]
+
+    assert decoded == GetClusterHostsActivityOutput(hostnames=["host1"], nextCursor=1)
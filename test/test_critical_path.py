@@ -0,0 +1,129 @@
+from typing import List
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+from temporalio.api.common.v1 import ActivityType, WorkflowExecution, WorkflowType
+from temporalio.api.history.v1 import ActivityTaskCompletedEventAttributes, ActivityTaskScheduledEventAttributes, \
+    ActivityTaskStartedEventAttributes, ChildWorkflowExecutionCompletedEventAttributes, \
+    ChildWorkflowExecutionStartedEventAttributes, HistoryEvent, StartChildWorkflowExecutionInitiatedEventAttributes, \
+    WorkflowExecutionCompletedEventAttributes, WorkflowExecutionStartedEventAttributes, \
+    WorkflowTaskCompletedEventAttributes, WorkflowTaskScheduledEventAttributes, WorkflowTaskStartedEventAttributes
+from temporalio.client import WorkflowHistory
+
+from src.bench.critical_path import parallelism, run_spans, step_latencies
+from src.tracing import critical_path, top_contributors
+
+
+class HistoryBuilder:
+    def __init__(self, workflow_id: str, workflow_type: str, run_id: str, parent_run_id: str = "") -> None:
+        self.workflow_id = workflow_id
+        self.events: List[HistoryEvent] = []
+        self.run_id = run_id
+        self.workflow_type = workflow_type
+        self.parent_run_id = parent_run_id
+
+    def add(self, time: float, **attributes) -> int:
+        event_time = Timestamp()
+        event_time.FromMicroseconds(round(time * 1_000_000))
+        self.events.append(HistoryEvent(event_id=len(self.events) + 1, event_time=event_time, **attributes))
+        return len(self.events)
+
+    def started(self, time: float) -> "HistoryBuilder":
+        self.add(time, workflow_execution_started_event_attributes=WorkflowExecutionStartedEventAttributes(
+            workflow_type=WorkflowType(name=self.workflow_type),
+            original_execution_run_id=self.run_id,
+            parent_workflow_execution=WorkflowExecution(run_id=self.parent_run_id),
+        ))
+        return self
+
+    def workflow_task(self, scheduled: float, started: float, completed: float) -> "HistoryBuilder":
+        scheduled_id = self.add(scheduled,
+                                workflow_task_scheduled_event_attributes=WorkflowTaskScheduledEventAttributes())
+        self.add(started, workflow_task_started_event_attributes=WorkflowTaskStartedEventAttributes(
+            scheduled_event_id=scheduled_id))
+        self.add(completed, workflow_task_completed_event_attributes=WorkflowTaskCompletedEventAttributes(
+            scheduled_event_id=scheduled_id))
+        return self
+
+    def activity(self, name: str, scheduled: float, started: float, completed: float) -> "HistoryBuilder":
+        scheduled_id = self.add(scheduled, activity_task_scheduled_event_attributes=
+                                ActivityTaskScheduledEventAttributes(activity_type=ActivityType(name=name)))
+        self.add(started, activity_task_started_event_attributes=ActivityTaskStartedEventAttributes(
+            scheduled_event_id=scheduled_id))
+        self.add(completed, activity_task_completed_event_attributes=ActivityTaskCompletedEventAttributes(
+            scheduled_event_id=scheduled_id))
+        return self
+
+    def child_workflow_started(self, workflow_type: str, initiated: float, started: float) -> "HistoryBuilder":
+        initiated_id = self.add(initiated, start_child_workflow_execution_initiated_event_attributes=
+                                StartChildWorkflowExecutionInitiatedEventAttributes(
+                                    workflow_type=WorkflowType(name=workflow_type)))
+        self.add(started, child_workflow_execution_started_event_attributes=
+                 ChildWorkflowExecutionStartedEventAttributes(initiated_event_id=initiated_id))
+        return self
+
+    def child_workflow_completed(self, time: float) -> "HistoryBuilder":
+        self.add(time, child_workflow_execution_completed_event_attributes=
+                 ChildWorkflowExecutionCompletedEventAttributes())
+        return self
+
+    def completed(self, time: float) -> WorkflowHistory:
+        self.add(time, workflow_execution_completed_event_attributes=WorkflowExecutionCompletedEventAttributes())
+        return WorkflowHistory(self.workflow_id, self.events)
+
+
+def rollout_histories() -> List[WorkflowHistory]:
+    # a cluster workflow that gets its hosts and patches one host in a child workflow
+    cluster = HistoryBuilder("cluster", "Cluster", "cluster-run").started(0) \
+        .workflow_task(0, 0.5, 0.6) \
+        .activity("get_cluster_hosts_activity", 0.6, 1, 2) \
+        .workflow_task(2, 2.1, 2.2) \
+        .child_workflow_started("Host", 2.2, 2.5) \
+        .workflow_task(2.5, 2.6, 2.7) \
+        .child_workflow_completed(8) \
+        .workflow_task(8, 8.1, 8.2) \
+        .completed(8.2)
+    host = HistoryBuilder("cluster_host1", "Host", "host-run", parent_run_id="cluster-run").started(2.5) \
+        .workflow_task(2.5, 3, 3.1) \
+        .activity("perform_update_activity", 3.1, 4, 7.5) \
+        .workflow_task(7.5, 7.6, 7.7) \
+        .completed(7.7)
+    return [cluster, host]
+
+
+def test_critical_path_of_histories():
+    spans = run_spans(rollout_histories())
+
+    path = critical_path(spans)
+
+    assert [(step.span.name, step.depth) for step in path] == [
+        ("RunWorkflow:Cluster", 0),
+        ("ScheduleToStart:WorkflowTask", 1), ("Run:WorkflowTask", 1),
+        ("ScheduleToStart:get_cluster_hosts_activity", 1), ("RunActivity:get_cluster_hosts_activity", 1),
+        ("ScheduleToStart:WorkflowTask", 1), ("Run:WorkflowTask", 1),
+        ("StartWorkflow:Host", 1),
+        ("RunWorkflow:Host", 1),
+        ("ScheduleToStart:WorkflowTask", 2), ("Run:WorkflowTask", 2),
+        ("ScheduleToStart:perform_update_activity", 2), ("RunActivity:perform_update_activity", 2),
+        ("ScheduleToStart:WorkflowTask", 2), ("Run:WorkflowTask", 2),
+        ("ScheduleToStart:WorkflowTask", 1), ("Run:WorkflowTask", 1),
+    ]
+    # the cluster workflow waits 0.3s between the completion of the host workflow and its next workflow task
+    assert path[0].selfTime == pytest.approx(0.3)
+    assert top_contributors(path, 3) == [
+        ("RunActivity:perform_update_activity", pytest.approx(3.5)),
+        ("ScheduleToStart:WorkflowTask", pytest.approx(1.3)),
+        ("RunActivity:get_cluster_hosts_activity", pytest.approx(1)),
+    ]
+
+
+def test_step_latencies_and_parallelism_of_histories():
+    spans = run_spans(rollout_histories())
+
+    steps = step_latencies(spans)
+
+    assert steps["perform_update_activity"] == (pytest.approx([0.9]), pytest.approx([3.5]))
+    assert steps["Host"] == (pytest.approx([0.3]), pytest.approx([5.2]))
+
+    activities = [span for span in spans if span.name.startswith("RunActivity:")]
+    assert parallelism(activities, 0, 8.2, 2) == [(pytest.approx(1.1 / 4.1), 1), (pytest.approx(3.4 / 4.1), 1)]
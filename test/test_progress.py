@@ -0,0 +1,43 @@
+import asyncio
+from typing import List
+
+from temporalio.client import WorkflowExecutionStatus
+from temporalio.common import SearchAttributePair, TypedSearchAttributes
+from temporalio.service import RPCError, RPCStatusCode
+
+from src.temporal_progress import ProgressSubscriber
+from src.workflow.search_attributes import PATCH_COMPLETED_STEPS
+
+
+class ListedExecution:
+    def __init__(self, workflow_id: str, completed_steps: List[str], status: WorkflowExecutionStatus) -> None:
+        self.id = workflow_id
+        self.run_id = "run"
+        self.status = status
+        self.typed_search_attributes = TypedSearchAttributes(
+            [SearchAttributePair(PATCH_COMPLETED_STEPS, completed_steps)])
+
+
+class UnavailableVisibilityClient:
+    # the first list requests fail, then the workflow is listed completed
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.requests = 0
+
+    async def list_workflows(self, query: str):
+        self.requests += 1
+        if self.requests <= self.failures:
+            raise RPCError("visibility unavailable", RPCStatusCode.UNAVAILABLE, b"")
+        yield ListedExecution("wf1", ["send_approval_request_activity"], WorkflowExecutionStatus.COMPLETED)
+
+
+async def test_progress_is_polled_again_after_a_failed_list_request():
+    client = UnavailableVisibilityClient(failures=2)
+    subscriber = ProgressSubscriber(client, interval=0.001)
+    progress = []
+
+    subscriber.subscribe("wf1", lambda workflow_id, steps, status: progress.append((workflow_id, steps, status)))
+    await asyncio.wait_for(subscriber.task, timeout=5)
+
+    assert progress == [("wf1", ["send_approval_request_activity"], WorkflowExecutionStatus.COMPLETED)]
+    assert client.requests == 3
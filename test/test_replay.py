@@ -0,0 +1,119 @@
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+import pytest
+from temporalio.client import WorkflowHistory
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Replayer, Worker
+
+from src.bench.histories import fetch_histories
+from src.bench.mock_activities import mock_activities
+from src.temporal_worker import workflows
+from src.workflow.sandbox import workflow_runner
+from src.workflow.system_patch_workflow_v1 import SystemPatchWorkflow_V1
+from src.workflow.system_patch_workflow_v2 import SystemPatchWorkflow_V2
+from src.workflow.system_patch_workflow_v3 import SystemPatchWorkflow_V3
+from src.workflow.system_patch_workflow_v4 import SystemPatchWorkflow_V4
+from src.workflow.system_patch_workflow_v5 import SystemPatchWorkflow_V5
+from src.workflow.system_patch_workflow_v6 import SystemPatchWorkflow_V6
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_V7
+from src.workflow.types import SystemPatchWorkflowInput
+
+# Replay tests of every version of the patch workflows.
+#
+# - test_recorded_histories_replay runs each scenario in the time-skipping test environment (with mock activities),
+#   and replays the histories of the workflow and all its child workflows against the workflow code.
+#   Non-deterministic code (e.g. random values, iterating a set) fails the replay.
+# - test_stored_histories_replay replays the histories saved in test/histories against the current code.
+#   A change that is not compatible with the running workflows fails the replay.
+#   `python -m pytest test/test_replay.py --record-histories` saves the histories of the current code.
+#
+# Both fail if the replay takes longer than --max-replay-ms-per-event, the replay time of each history is
+# reported at the end of the run.
+
+HISTORIES_DIR = Path(__file__).parent / "histories"
+
+
+def input_for(**options) -> SystemPatchWorkflowInput:
+    return SystemPatchWorkflowInput(targetClusters=["cluster1", "cluster2"], pilotHostCount=2, **options)
+
+
+# (scenario, workflow, input), all the versions except V1 wait for the approval signal
+SCENARIOS = [
+    ("v1", SystemPatchWorkflow_V1, input_for()),
+    ("v2", SystemPatchWorkflow_V2, input_for()),
+    ("v3", SystemPatchWorkflow_V3, input_for()),
+    ("v4", SystemPatchWorkflow_V4, input_for()),
+    ("v5", SystemPatchWorkflow_V5, input_for()),
+    ("v6", SystemPatchWorkflow_V6, input_for()),
+    ("v7", SystemPatchWorkflow_V7, input_for()),
+    ("v7-max-in-flight-hosts", SystemPatchWorkflow_V7, input_for(maxInFlightHosts=2)),
+    ("v7-host-pages", SystemPatchWorkflow_V7, input_for(hostPageSize=2)),
+    ("v7-host-batches", SystemPatchWorkflow_V7, input_for(hostBatchSize=2)),
+    ("v7-local-activities", SystemPatchWorkflow_V7,
+     input_for(localActivities=["vault_client_activity", "send_success_notification_activity"])),
+]
+
+
+async def run_scenario(env: WorkflowEnvironment, workflow, wf_input: SystemPatchWorkflowInput) -> List[WorkflowHistory]:
+    task_queue = "replay-" + str(uuid.uuid4())
+    async with Worker(env.client, task_queue=task_queue, workflows=workflows, activities=mock_activities(),
+                      workflow_runner=workflow_runner()):
+        handle = await env.client.start_workflow(
+            workflow.run,
+            wf_input,
+            id="replay-" + workflow.__name__ + "-" + str(uuid.uuid4()),
+            task_queue=task_queue,
+            start_signal=None if workflow is SystemPatchWorkflow_V1 else "approve_request",
+        )
+        await handle.result()
+
+    return await fetch_histories(env.client, handle.id, handle.result_run_id)
+
+
+async def replay(history: WorkflowHistory, name: str, replay_timings, max_ms_per_event: float) -> None:
+    replayer = Replayer(workflows=workflows, workflow_runner=workflow_runner())
+    # first replay to warm up the sandbox (imports of the workflow modules), not measured
+    await replayer.replay_workflow(history)
+
+    started = time.perf_counter()
+    await replayer.replay_workflow(history)
+    elapsed = time.perf_counter() - started
+
+    events = len(history.events)
+    replay_timings.append((name, events, elapsed))
+    assert elapsed * 1000 / events <= max_ms_per_event, \
+        f"{name}: replay took {elapsed * 1000:.2f}ms for {events} events"
+
+
+def history_file_name(history: WorkflowHistory) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", history.workflow_id) + ".json"
+
+
+@pytest.mark.parametrize("scenario, workflow, wf_input", SCENARIOS, ids=[scenario[0] for scenario in SCENARIOS])
+async def test_recorded_histories_replay(env, request, replay_timings, scenario, workflow, wf_input):
+    histories = await run_scenario(env, workflow, wf_input)
+    max_ms_per_event = request.config.getoption("--max-replay-ms-per-event")
+
+    for history in histories:
+        await replay(history, scenario + "/" + history.workflow_id, replay_timings, max_ms_per_event)
+
+    if request.config.getoption("--record-histories"):
+        scenario_dir = HISTORIES_DIR / scenario
+        scenario_dir.mkdir(parents=True, exist_ok=True)
+        for old_history in scenario_dir.glob("*.json"):
+            old_history.unlink()
+        for history in histories:
+            (scenario_dir / history_file_name(history)).write_text(history.to_json())
+
+
+@pytest.mark.parametrize("path", sorted(HISTORIES_DIR.glob("*/*.json")),
+                         ids=lambda path: path.parent.name + "/" + path.stem)
+async def test_stored_histories_replay(request, replay_timings, path):
+    history = WorkflowHistory.from_json(path.stem, path.read_text())
+
+    await replay(history, path.parent.name + "/" + path.stem, replay_timings,
+                 request.config.getoption("--max-replay-ms-per-event"))
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import timedelta
+from typing import List
+
+import pytest
+
+from src.workflow.ssh import AsyncSshConnector, SshConnection, SshSessionPool, start_fake_ssh_server
+
+# the pool runs against the in-process SSH server, asyncssh is an optional dependency
+pytest.importorskip("asyncssh")
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingConnector:
+    # connects to the fake SSH server, whatever the host, and keeps the opened connections
+    def __init__(self, port: int) -> None:
+        self.connector = AsyncSshConnector(port=port, username="patch", known_hosts=None, client_keys=None)
+        self.connections: List[SshConnection] = []
+
+    async def __call__(self, host: str) -> SshConnection:
+        connection = await self.connector("127.0.0.1")
+        self.connections.append(connection)
+        return connection
+
+
+@pytest.fixture
+async def connector():
+    server = await start_fake_ssh_server()
+    port = server.sockets[0].getsockname()[1]
+    connector = CountingConnector(port)
+    try:
+        yield connector
+    finally:
+        for connection in connector.connections:
+            connection.close()
+        server.close()
+        await server.wait_closed()
+
+
+async def test_consecutive_sessions_reuse_the_connection(connector):
+    pool = SshSessionPool(connector)
+
+    async with pool.session("host1") as session:
+        assert await session.run("apt-get update") == "apt-get update"
+    async with pool.session("host1") as session:
+        assert await session.run("apt-get upgrade -y") == "apt-get upgrade -y"
+    async with pool.session("host2") as session:
+        await session.run("uptime")
+
+    assert len(connector.connections) == 2
+
+
+async def test_sessions_per_host_are_limited(connector):
+    pool = SshSessionPool(connector, max_connections_per_host=1)
+    running = []
+
+    async def run(host: str, command: str) -> None:
+        async with pool.session(host) as session:
+            running.append(host)
+            await session.run(command)
+            await asyncio.sleep(0.05)
+            running.remove(host)
+
+    async def watch() -> int:
+        # max number of sessions running at the same time on host1
+        peak = 0
+        while len(connector.connections) < 2 or running:
+            peak = max(peak, running.count("host1"))
+            await asyncio.sleep(0.005)
+        return peak
+
+    peak, *_ = await asyncio.gather(watch(), run("host1", "a"), run("host1", "b"), run("host2", "c"))
+
+    assert peak == 1
+    # the second session of host1 waited for the first one and reused its connection
+    assert len(connector.connections) == 2
+
+
+async def test_broken_session_is_not_reused(connector):
+    pool = SshSessionPool(connector)
+
+    with pytest.raises(ConnectionResetError):
+        async with pool.session("host1"):
+            raise ConnectionResetError()
+    async with pool.session("host1") as session:
+        await session.run("uptime")
+
+    assert len(connector.connections) == 2
+
+
+async def test_idle_sessions_and_hosts_are_evicted(connector):
+    clock = Clock()
+    pool = SshSessionPool(connector, idle_timeout=timedelta(seconds=60), clock=clock)
+
+    async with pool.session("host1") as session:
+        await session.run("uptime")
+    assert list(pool.idle) == ["host1"]
+    assert list(pool.host_slots) == ["host1"]
+
+    clock.now = 60
+    pool.evict_idle()
+
+    assert pool.idle == {}
+    # nothing is kept for the hosts that are done
+    assert pool.host_slots == {}
+    assert pool.callers == {}
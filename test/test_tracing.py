@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+from temporalio.client import Client
+from temporalio.worker import Worker
+
+from src.bench.mock_activities import mock_activities
+from src.temporal_worker_v8 import workflows
+from src.tracing import InMemorySpanExporter, LatencyTracingInterceptor, Span, critical_path, top_contributors
+from src.workflow.sandbox import workflow_runner
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_V7
+from src.workflow.types import SystemPatchWorkflowInput
+
+
+def span(span_id: str, parent_id, name: str, start: float, end: float) -> Span:
+    return Span(traceId="trace", spanId=span_id, parentId=parent_id, name=name, startTime=start, endTime=end)
+
+
+def test_critical_path_follows_the_last_child_to_complete():
+    spans = [
+        span("request", None, "StartWorkflowRequest:Parent", 0, 0.3),
+        span("start", None, "StartWorkflow:Parent", 0, 0.2),
+        span("parent", None, "RunWorkflow:Parent", 0.2, 10),
+        span("parent:first-workflow-task", "parent", "FirstWorkflowTask:Parent", 0.2, 0.5),
+        span("a1", "parent", "ScheduleToStart:get_hosts", 0.5, 1),
+        span("a2", "parent", "RunActivity:get_hosts", 1, 2),
+        # two hosts in parallel, host2 completes last
+        span("host1:start", "parent", "StartWorkflow:Host", 2, 2.5),
+        span("host1", "parent", "RunWorkflow:Host", 2.5, 6),
+        span("host2:start", "parent", "StartWorkflow:Host", 2, 3),
+        span("host2", "parent", "RunWorkflow:Host", 3, 9),
+        span("h2", "host2", "ScheduleToStart:update", 3.5, 5.5),
+        span("h3", "host2", "RunActivity:update", 5.5, 8.5),
+    ]
+
+    path = critical_path(spans)
+
+    assert [(step.span.spanId, step.depth) for step in path] == [
+        ("start", 0), ("parent", 0),
+        ("parent:first-workflow-task", 1), ("a1", 1), ("a2", 1), ("host2:start", 1), ("host2", 1),
+        ("h2", 2), ("h3", 2),
+    ]
+    assert [step.selfTime for step in path] == pytest.approx([0.2, 1, 0.3, 0.5, 1, 1, 1, 2, 3])
+    assert top_contributors(path, 2) == [("RunActivity:update", 3), ("ScheduleToStart:update", 2)]
+
+
+async def test_traced_workflow_spans(env):
+    exporter = InMemorySpanExporter()
+    # the worker uses the interceptors of its client that are also worker interceptors
+    client = Client(**{**env.client.config(), "interceptors": [LatencyTracingInterceptor(exporter)]})
+    task_queue = "tracing-" + str(uuid.uuid4())
+
+    async with Worker(client, task_queue=task_queue, workflows=workflows, activities=mock_activities(),
+                      workflow_runner=workflow_runner()):
+        handle = await client.start_workflow(
+            SystemPatchWorkflow_V7.run,
+            SystemPatchWorkflowInput(targetClusters=["cluster1", "cluster2"], pilotHostCount=1),
+            id="tracing-" + str(uuid.uuid4()),
+            task_queue=task_queue,
+            start_signal="approve_request",
+        )
+        await handle.result()
+
+    assert {span.traceId for span in exporter.spans} == {exporter.spans[0].traceId}
+    names = {span.name for span in exporter.spans}
+    assert {"StartWorkflowRequest:SystemPatchWorkflow_V7", "StartWorkflow:SystemPatchWorkflow_V7",
+            "RunWorkflow:SystemPatchWorkflow_V7", "StartWorkflow:SystemPatchWorkflow_Cluster_V7",
+            "RunWorkflow:SystemPatchWorkflow_Host_V7", "FirstWorkflowTask:SystemPatchWorkflow_Host_V7",
+            "ScheduleToStart:perform_update_activity", "RunActivity:perform_update_activity"} <= names
+
+    # the workflow spans use the skipped time of the test server, the activity spans the real time
+    assert "RunWorkflow:SystemPatchWorkflow_V7" in {step.span.name for step in critical_path(exporter.spans)}
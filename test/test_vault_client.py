@@ -0,0 +1,110 @@
+import asyncio
+from datetime import timedelta
+from typing import List
+
+import pytest
+
+from src.workflow.types import VaultResponse
+from src.workflow.vault_client import MyVaultClient
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ControlledVaultClient(MyVaultClient):
+    # each vault request waits until the test completes it, the tokens are numbered by request
+    def __init__(self, clock: Clock) -> None:
+        super().__init__(token_ttl=timedelta(seconds=60), refresh_ahead=timedelta(seconds=10), clock=clock)
+        self.requests: List[asyncio.Future] = []
+
+    async def _request_token(self, address: str) -> VaultResponse:
+        request = asyncio.get_running_loop().create_future()
+        self.requests.append(request)
+        await request
+        return VaultResponse(address=address, token="token" + str(len(self.requests)))
+
+    async def complete_requests(self) -> None:
+        for request in self.requests:
+            if not request.done():
+                request.set_result(None)
+        # let the completed requests cache their token
+        await run_pending_tasks()
+
+
+async def run_pending_tasks() -> None:
+    # the tasks run until they wait for something else than the event loop
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def get_token(vault_client: ControlledVaultClient, address: str = "vault1") -> VaultResponse:
+    task = asyncio.create_task(vault_client.get_token(address))
+    await run_pending_tasks()
+    await vault_client.complete_requests()
+    return await task
+
+
+async def test_tokens_are_cached_until_they_expire():
+    clock = Clock()
+    vault_client = ControlledVaultClient(clock)
+
+    assert (await get_token(vault_client)).token == "token1"
+    clock.now = 49
+    assert (await get_token(vault_client)).token == "token1"
+    clock.now = 60
+    assert (await get_token(vault_client)).token == "token2"
+
+    assert (vault_client.hits, vault_client.misses, vault_client.refreshes) == (1, 2, 0)
+    assert len(vault_client.requests) == 2
+
+
+async def test_concurrent_misses_share_one_request():
+    vault_client = ControlledVaultClient(Clock())
+
+    callers = [asyncio.create_task(vault_client.get_token("vault1")) for _ in range(3)]
+    await run_pending_tasks()
+    await vault_client.complete_requests()
+
+    assert [response.token for response in await asyncio.gather(*callers)] == ["token1"] * 3
+    assert len(vault_client.requests) == 1
+    assert vault_client.misses == 3
+
+
+async def test_token_is_refreshed_ahead_of_expiry():
+    clock = Clock()
+    vault_client = ControlledVaultClient(clock)
+    await get_token(vault_client)
+
+    # within refresh_ahead of the expiry the cached token is returned right away and refreshed in the background
+    clock.now = 55
+    assert (await vault_client.get_token("vault1")).token == "token1"
+    assert (await vault_client.get_token("vault1")).token == "token1"
+    await run_pending_tasks()
+    assert len(vault_client.requests) == 2
+    assert vault_client.refreshes == 1
+
+    await vault_client.complete_requests()
+    clock.now = 70
+    assert (await vault_client.get_token("vault1")).token == "token2"
+    assert (vault_client.hits, vault_client.misses, vault_client.refreshes) == (3, 1, 1)
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_request():
+    vault_client = ControlledVaultClient(Clock())
+
+    cancelled = asyncio.create_task(vault_client.get_token("vault1"))
+    waiting = asyncio.create_task(vault_client.get_token("vault1"))
+    await run_pending_tasks()
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    await vault_client.complete_requests()
+
+    assert (await waiting).token == "token1"
+    assert vault_client.tokens["vault1"].response.token == "token1"
@@ -0,0 +1,231 @@
+from typing import List, Optional
+
+import pytest
+import temporalio.converter
+from google.protobuf.duration_pb2 import Duration
+from google.protobuf.timestamp_pb2 import Timestamp
+from temporalio.api.common.v1 import ActivityType, Payloads, WorkflowExecution, WorkflowType
+from temporalio.api.enums.v1 import EventType
+from temporalio.api.failure.v1 import ApplicationFailureInfo, Failure
+from temporalio.api.history.v1 import ActivityTaskCompletedEventAttributes, ActivityTaskScheduledEventAttributes, \
+    ActivityTaskStartedEventAttributes, ChildWorkflowExecutionCompletedEventAttributes, \
+    ChildWorkflowExecutionFailedEventAttributes, \
+    ChildWorkflowExecutionStartedEventAttributes, HistoryEvent, StartChildWorkflowExecutionInitiatedEventAttributes, \
+    TimerStartedEventAttributes, WorkflowExecutionStartedEventAttributes, WorkflowTaskCompletedEventAttributes, \
+    WorkflowTaskScheduledEventAttributes, WorkflowTaskStartedEventAttributes
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.client import WorkflowHistory
+from temporalio.worker import Replayer
+
+from src.workflow.sandbox import workflow_runner
+from src.workflow.system_patch_workflow_v7 import SystemPatchWorkflow_Cluster_V7, SystemPatchWorkflow_ClusterInput, \
+    SystemPatchWorkflow_Host_V7
+from src.workflow.types import GetClusterHostsActivityOutput
+from src.workflow.waves import Wave, allowed_failures, plan_waves
+
+
+def test_plan_waves():
+    assert plan_waves([1, 5, 25], [100, 100, 90, 80]) == [
+        Wave(start=0, end=1, successThreshold=100),
+        Wave(start=1, end=6, successThreshold=100),
+        Wave(start=6, end=31, successThreshold=90),
+        Wave(start=31, end=None, successThreshold=80),
+    ]
+    # without wave sizes, the pilot hosts then the remaining hosts
+    assert plan_waves([], [], pilot_host_count=2) == [
+        Wave(start=0, end=2, successThreshold=100),
+        Wave(start=2, end=None, successThreshold=100),
+    ]
+
+
+@pytest.mark.parametrize("wave_sizes, success_thresholds", [
+    ([1, 0, 25], []),
+    ([-1], []),
+    ([1, 5], [100, -10]),
+    ([1, 5], [100, 101]),
+], ids=["empty-wave", "negative-size", "negative-threshold", "threshold-above-100"])
+def test_invalid_waves(wave_sizes, success_thresholds):
+    with pytest.raises(ValueError):
+        plan_waves(wave_sizes, success_thresholds)
+
+
+def test_wave_hosts_in_a_page():
+    hostnames = ["host" + str(i) for i in range(10, 20)]
+
+    # the page has the hosts at positions 10 to 19 of the cluster
+    assert Wave(start=6, end=31, successThreshold=100).hosts(hostnames, 10) == hostnames
+    assert Wave(start=12, end=15, successThreshold=100).hosts(hostnames, 10) == ["host12", "host13", "host14"]
+    assert Wave(start=15, end=None, successThreshold=100).hosts(hostnames, 10) == hostnames[5:]
+    assert Wave(start=0, end=6, successThreshold=100).hosts(hostnames, 10) == []
+
+
+def test_wave_size():
+    assert Wave(start=1, end=6, successThreshold=100).size(20) == 5
+    assert Wave(start=1, end=6, successThreshold=100).size(4) == 3
+    assert Wave(start=6, end=None, successThreshold=100).size(20) == 14
+    assert Wave(start=6, end=31, successThreshold=100).size(4) == 0
+
+
+def test_allowed_failures():
+    assert allowed_failures(25, 100) == 0
+    assert allowed_failures(25, 90) == 2
+    assert allowed_failures(1, 0) == 1
+
+
+def pilot_history(success_threshold: int, next_events: List[HistoryEvent],
+                  pilot_result: Optional[Payloads] = None,
+                  cluster_input: Optional[SystemPatchWorkflow_ClusterInput] = None,
+                  hosts: Optional[GetClusterHostsActivityOutput] = None) -> WorkflowHistory:
+    # a cluster of 3 hosts, the pilot host (wave of 1 host) fails, or completes with pilot_result when it is set,
+    # next_events are the commands of the next workflow task, the replay fails if the workflow doesn't send the same
+    # commands
+    # cluster_input and hosts replace the cluster of 3 hosts, the first host is the only one started first
+    if cluster_input is None:
+        cluster_input = SystemPatchWorkflow_ClusterInput(
+            targetCluster="cluster1", pilotHostCount=0, waveSizes=[1], waveSuccessThresholds=[success_threshold])
+    if hosts is None:
+        hosts = GetClusterHostsActivityOutput(hostnames=["cluster1_host1", "cluster1_host2", "cluster1_host3"])
+    workflow_id = "cluster"
+    converter = temporalio.converter.default().payload_converter
+    events = []
+
+    def add(**attributes) -> int:
+        event_time = Timestamp()
+        event_time.FromMicroseconds(len(events) * 1_000_000)
+        # workflow_task_scheduled_event_attributes -> EVENT_TYPE_WORKFLOW_TASK_SCHEDULED
+        event_type = EventType.Value("EVENT_TYPE_" + next(iter(attributes)).replace("_event_attributes", "").upper())
+        events.append(HistoryEvent(event_id=len(events) + 1, event_time=event_time, event_type=event_type,
+                                   **attributes))
+        return len(events)
+
+    def workflow_task(completed: bool = True) -> None:
+        scheduled_id = add(workflow_task_scheduled_event_attributes=WorkflowTaskScheduledEventAttributes(
+            task_queue=TaskQueue(name="waves"), start_to_close_timeout=Duration(seconds=10), attempt=1))
+        started_id = add(workflow_task_started_event_attributes=WorkflowTaskStartedEventAttributes(
+            scheduled_event_id=scheduled_id))
+        if completed:
+            add(workflow_task_completed_event_attributes=WorkflowTaskCompletedEventAttributes(
+                scheduled_event_id=scheduled_id, started_event_id=started_id))
+
+    add(workflow_execution_started_event_attributes=WorkflowExecutionStartedEventAttributes(
+        workflow_type=WorkflowType(name=SystemPatchWorkflow_Cluster_V7.__name__),
+        input=Payloads(payloads=converter.to_payloads([cluster_input])),
+        task_queue=TaskQueue(name="waves"),
+        workflow_task_timeout=Duration(seconds=10),
+        original_execution_run_id="cluster-run",
+        first_execution_run_id="cluster-run",
+        attempt=1,
+    ))
+    workflow_task()
+    activity_id = add(activity_task_scheduled_event_attributes=ActivityTaskScheduledEventAttributes(
+        activity_id="1", activity_type=ActivityType(name="get_cluster_hosts_activity")))
+    add(activity_task_started_event_attributes=ActivityTaskStartedEventAttributes(scheduled_event_id=activity_id))
+    add(activity_task_completed_event_attributes=ActivityTaskCompletedEventAttributes(
+        scheduled_event_id=activity_id,
+        result=Payloads(payloads=converter.to_payloads([hosts])),
+    ))
+    workflow_task()
+    child_execution = WorkflowExecution(workflow_id=host_workflow_id(workflow_id, hosts.hostnames[0]),
+                                        run_id="pilot")
+    initiated_id = add(start_child_workflow_execution_initiated_event_attributes=
+                       StartChildWorkflowExecutionInitiatedEventAttributes(
+                           workflow_id=child_execution.workflow_id,
+                           workflow_type=WorkflowType(name=SystemPatchWorkflow_Host_V7.__name__)))
+    started_id = add(child_workflow_execution_started_event_attributes=ChildWorkflowExecutionStartedEventAttributes(
+        initiated_event_id=initiated_id, workflow_execution=child_execution,
+        workflow_type=WorkflowType(name=SystemPatchWorkflow_Host_V7.__name__)))
+    workflow_task()
+    if pilot_result is None:
+        add(child_workflow_execution_failed_event_attributes=ChildWorkflowExecutionFailedEventAttributes(
+            initiated_event_id=initiated_id, started_event_id=started_id, workflow_execution=child_execution,
+            workflow_type=WorkflowType(name=SystemPatchWorkflow_Host_V7.__name__),
+            failure=Failure(message="update failed", application_failure_info=ApplicationFailureInfo())))
+    else:
+        add(child_workflow_execution_completed_event_attributes=ChildWorkflowExecutionCompletedEventAttributes(
+            initiated_event_id=initiated_id, started_event_id=started_id, workflow_execution=child_execution,
+            workflow_type=WorkflowType(name=SystemPatchWorkflow_Host_V7.__name__), result=pilot_result))
+    workflow_task()
+    for attributes in next_events:
+        add(**attributes)
+    # the replay checks the commands of the completed workflow tasks
+    workflow_task(completed=False)
+
+    return WorkflowHistory(workflow_id, events)
+
+
+def host_workflow_id(workflow_id: str, host: str) -> str:
+    return workflow_id + "_SystemPatchWorkflow_Host_V7-host:" + host
+
+
+def start_host(host: str) -> dict:
+    return dict(start_child_workflow_execution_initiated_event_attributes=
+                StartChildWorkflowExecutionInitiatedEventAttributes(
+                    workflow_id=host_workflow_id("cluster", host),
+                    workflow_type=WorkflowType(name=SystemPatchWorkflow_Host_V7.__name__)))
+
+
+@pytest.mark.parametrize("success_threshold, next_events", [
+    # the pilot host may fail, the next wave starts
+    (0, [start_host("cluster1_host2"), start_host("cluster1_host3")]),
+    # the pilot host has to be patched, the rollout of the cluster stops (the cleanup timer)
+    (100, [dict(timer_started_event_attributes=TimerStartedEventAttributes(timer_id="1"))]),
+], ids=["next-wave", "gate-closed"])
+async def test_wave_gate_after_failed_pilot_host(success_threshold, next_events):
+    replayer = Replayer(workflows=[SystemPatchWorkflow_Cluster_V7], workflow_runner=workflow_runner())
+
+    await replayer.replay_workflow(pilot_history(success_threshold, next_events))
+
+
+def patched_host_count(count: Optional[int]) -> Payloads:
+    return Payloads(payloads=temporalio.converter.default().payload_converter.to_payloads([count]))
+
+
+@pytest.mark.parametrize("success_threshold, pilot_result, next_events", [
+    # the pilot host didn't meet the preconditions, it is not patched
+    (100, patched_host_count(0), [dict(timer_started_event_attributes=TimerStartedEventAttributes(timer_id="1"))]),
+    (0, patched_host_count(0), [start_host("cluster1_host2"), start_host("cluster1_host3")]),
+    (100, patched_host_count(1), [start_host("cluster1_host2"), start_host("cluster1_host3")]),
+    # the host child workflows started before they returned the patched hosts count them all as patched
+    (100, patched_host_count(None), [start_host("cluster1_host2"), start_host("cluster1_host3")]),
+], ids=["not-patched-gate-closed", "not-patched-next-wave", "patched", "no-patched-host-count"])
+async def test_wave_gate_counts_the_patched_hosts(success_threshold, pilot_result, next_events):
+    replayer = Replayer(workflows=[SystemPatchWorkflow_Cluster_V7], workflow_runner=workflow_runner())
+
+    await replayer.replay_workflow(pilot_history(success_threshold, next_events, pilot_result))
+
+
+@pytest.mark.parametrize("unavailable_host_count, next_events", [
+    # 1 failed host of the 5 allowed (50% of the 10 hosts of the cluster, not of the 3 hosts of the page)
+    (0, [start_host("cluster1_host2"), start_host("cluster1_host3")]),
+    # 4 failed hosts with the ones of the previous pages, one more host can be updated
+    (3, [start_host("cluster1_host2")]),
+    # 5 failed hosts, no more host can be updated, the rollout of the cluster stops (the cleanup timer)
+    (4, [dict(timer_started_event_attributes=TimerStartedEventAttributes(timer_id="1"))]),
+], ids=["cluster-budget", "carried-failed-hosts", "budget-used-by-failed-hosts"])
+async def test_max_unavailable_hosts_of_the_cluster(unavailable_host_count, next_events):
+    replayer = Replayer(workflows=[SystemPatchWorkflow_Cluster_V7], workflow_runner=workflow_runner())
+    cluster_input = SystemPatchWorkflow_ClusterInput(
+        targetCluster="cluster1", pilotHostCount=0, waveSizes=[1], waveSuccessThresholds=[0],
+        maxUnavailablePercentage=50, hostPageSize=3, unavailableHostCount=unavailable_host_count)
+    hosts = GetClusterHostsActivityOutput(hostnames=["cluster1_host1", "cluster1_host2", "cluster1_host3"],
+                                          nextCursor=3, totalHostCount=10)
+
+    await replayer.replay_workflow(pilot_history(0, next_events, cluster_input=cluster_input, hosts=hosts))
+
+
+@pytest.mark.parametrize("failed_host_count, next_events", [
+    # 1 failed host of the 3 hosts of the wave, 50% of them are patched, the next wave starts
+    (0, [start_host("cluster1_host4")]),
+    # with the failed host of the first page, only 1 host of the 3 can be patched, the rollout of the cluster stops
+    (1, [dict(timer_started_event_attributes=TimerStartedEventAttributes(timer_id="1"))]),
+], ids=["next-wave", "gate-closed"])
+async def test_wave_gate_of_a_wave_spanning_two_pages(failed_host_count, next_events):
+    replayer = Replayer(workflows=[SystemPatchWorkflow_Cluster_V7], workflow_runner=workflow_runner())
+    # second page of a cluster of 4 hosts, pages of 2 hosts: host3 is the last host of the first wave (3 hosts)
+    cluster_input = SystemPatchWorkflow_ClusterInput(
+        targetCluster="cluster1", pilotHostCount=0, waveSizes=[3], waveSuccessThresholds=[50], hostPageSize=2,
+        cursor=2, processedHostCount=2, clusterHostCount=4,
+        wavePatchedHostCounts=[2 - failed_host_count, 0], waveFailedHostCounts=[failed_host_count, 0])
+    hosts = GetClusterHostsActivityOutput(hostnames=["cluster1_host3", "cluster1_host4"], totalHostCount=4)
+
+    await replayer.replay_workflow(pilot_history(0, next_events, cluster_input=cluster_input, hosts=hosts))
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from src.worker_tuning import LatencyFeedbackSlotSupplier
+
+
+def slot_supplier(limit: int) -> LatencyFeedbackSlotSupplier:
+    supplier = LatencyFeedbackSlotSupplier(minimum_slots=5, maximum_slots=20,
+                                           target_schedule_to_start_latency=timedelta(seconds=1), step=5)
+    supplier.limit = limit
+    return supplier
+
+
+def reserve_slots(supplier: LatencyFeedbackSlotSupplier, count: int) -> None:
+    for _ in range(count):
+        assert supplier.try_reserve_slot(None)
+
+
+def test_limit_is_raised_when_all_slots_are_used_and_tasks_wait():
+    supplier = slot_supplier(limit=10)
+    reserve_slots(supplier, 10)
+    supplier.record_schedule_to_start_latency(timedelta(seconds=3))
+
+    supplier.adjust(cpu_usage=0.5, memory_usage=0.5)
+
+    assert supplier.limit == 15
+    assert supplier.try_reserve_slot(None)
+
+
+def test_limit_is_lowered_when_host_usage_is_above_target():
+    for cpu_usage, memory_usage in [(0.95, 0.5), (0.5, 0.85)]:
+        supplier = slot_supplier(limit=10)
+        reserve_slots(supplier, 10)
+        supplier.record_schedule_to_start_latency(timedelta(seconds=3))
+
+        supplier.adjust(cpu_usage, memory_usage)
+
+        assert supplier.limit == 5
+
+
+def test_limit_is_lowered_when_slots_are_not_used():
+    supplier = slot_supplier(limit=15)
+    reserve_slots(supplier, 7)
+
+    supplier.adjust(cpu_usage=None, memory_usage=None)
+
+    assert supplier.limit == 10
+
+
+def test_limit_stays_between_minimum_and_maximum():
+    supplier = slot_supplier(limit=20)
+    reserve_slots(supplier, 20)
+    supplier.record_schedule_to_start_latency(timedelta(seconds=3))
+    supplier.adjust(cpu_usage=0.5, memory_usage=0.5)
+    assert supplier.limit == 20
+
+    supplier = slot_supplier(limit=5)
+    supplier.adjust(cpu_usage=1.0, memory_usage=1.0)
+    assert supplier.limit == 5
+
+
+def test_limit_is_kept_when_the_slots_are_used_without_waiting():
+    supplier = slot_supplier(limit=10)
+    reserve_slots(supplier, 10)
+    supplier.record_schedule_to_start_latency(timedelta(milliseconds=100))
+
+    supplier.adjust(cpu_usage=0.5, memory_usage=0.5)
+
+    assert supplier.limit == 10
+    # the latencies are measured again for the next adjustment
+    assert supplier.latencies == []